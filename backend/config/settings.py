@@ -11,12 +11,18 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_bool(name, default=False):
+    """Read a boolean flag (1/true/yes) from the environment."""
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -38,6 +44,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Postgres-only index/lookup support (e.g. operator classes); a no-op elsewhere.
+    'django.contrib.postgres',
 
     # 3rd party apps ----------------
     'rest_framework',
@@ -51,15 +59,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so it times the whole stack (no-op unless enabled below).
+    'core.middleware.PerformanceMiddleware',
+    # Before anything that reads the DB (no-op unless there are read replicas).
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # The `Lean...` ones are Django's, skipped for API requests (see below).
+    'core.middleware.LeanSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.LeanCsrfViewMiddleware',
+    'core.middleware.LeanAuthenticationMiddleware',
+    # Buffers the last-seen timestamps of authenticated users (see below).
+    'core.middleware.ActivityMiddleware',
+    'core.middleware.LeanMessageMiddleware',
+    'core.middleware.LeanXFrameOptionsMiddleware',
 ]
 
+# Requests under these paths without a session cookie (token clients of the
+# API) skip the session, CSRF, authentication, messages & clickjacking
+# middleware: DRF authenticates them & they don't render pages. The admin, the
+# API docs (a page, which mustn't be framed), & staff browsing the API while
+# logged in keep the full stack.
+LEAN_MIDDLEWARE_PATHS = ['/api/user/'] if env_bool('LEAN_API_MIDDLEWARE', True) else []
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -86,15 +108,91 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # Set DB_ENGINE=sqlite3 (& DB_NAME to a file path) to run locally without Postgres.
+        'ENGINE': 'django.db.backends.' + os.environ.get('DB_ENGINE', 'postgresql'),
         # These variables come from the `web` service's environment variables.
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Keep connections open across requests instead of paying the
+        # connect/auth handshake every time (seconds; 0 = close per request).
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Ping a persistent connection before reusing it in a new request.
+        'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
+    }
+}
+
+# Optional psycopg 3 connection pool (needs `psycopg[pool]`; Django prefers
+# psycopg 3 over psycopg2 when both are installed). A pool replaces persistent
+# connections, so `CONN_MAX_AGE` must be 0.
+if env_bool('DB_POOL'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        # Seconds to wait for a free connection before erroring out.
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Seconds an idle connection (above `min_size`) is kept around.
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    }
+
+
+def extra_databases(prefix, hosts):
+    """
+    `{alias: settings}` of databases like `default` on each of `hosts` (file
+    paths with SQLite), as `<prefix>1`, `<prefix>2`, ...
+    """
+    key = 'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') else 'HOST'
+    return {
+        f'{prefix}{index}': {
+            **DATABASES['default'],
+            key: host,
+            'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        }
+        for index, host in enumerate(filter(None, hosts.split(',')), 1)
     }
+
+
+# Read replicas (see `core.replicas`): DB_REPLICAS lists their hosts, comma
+# separated. Reads of safe-method requests go to them, unless the client wrote
+# in the last `STICKY_SECONDS`.
+replica_databases = extra_databases('replica', os.environ.get('DB_REPLICAS', ''))
+for replica in replica_databases.values():
+    # Tests read through `default`.
+    replica['TEST'] = {'MIRROR': 'default'}
+DATABASES.update(replica_databases)
+READ_REPLICAS = {
+    'ALIASES': list(replica_databases),
+    # Seconds a client reads from the primary after writing.
+    'STICKY_SECONDS': int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 10)),
+    # Seconds an unreachable replica is left alone before it's tried again.
+    'RETRY_SECONDS': float(os.environ.get('DB_REPLICA_RETRY_SECONDS', 30)),
+    'PIN_COOKIE': 'primary_pin',
+    # The Django cache (shared by the workers) pinning the users who wrote.
+    'ALIAS': os.environ.get('DB_REPLICA_PIN_CACHE_ALIAS', 'default'),
 }
 
+# Users & their tokens sharded by email hash (see `core.shards`) across
+# `default` & the databases on the DB_SHARDS hosts (comma separated). The
+# shards need every table (`migrate --database=shardN`): a user's groups &
+# permissions are on their shard, next to copies of the groups (which are
+# managed on `default`). The other models stay on `default`. Run
+# `manage.py rebalance_user_shards` after changing the list.
+shard_databases = extra_databases('shard', os.environ.get('DB_SHARDS', ''))
+DATABASES.update(shard_databases)
+USER_SHARDS = ['default', *shard_databases]
+
+DATABASE_ROUTERS = ['core.shards.ShardRouter', 'core.replicas.ReplicaRouter']
+
+if DATABASES['default']['ENGINE'].endswith('sqlite3') and DATABASES['default']['NAME']:
+    # A file rather than the in-memory default, whose connections never close
+    # (so the tests can tell persistent connections apart). Set after the
+    # replicas & shards copied `default`, so they don't share it.
+    name = Path(DATABASES['default']['NAME'])
+    DATABASES['default']['TEST'] = {'NAME': str(name.with_name(f'test_{name.name}'))}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -141,6 +239,137 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ===================================================================== #
 AUTH_USER_MODEL = 'core.User'
 
+AUTHENTICATION_BACKENDS = [
+    'core.backends.EmailBackend',
+]
+
+# The browsable API is a development tool; production only negotiates the
+# machine formats.
+API_BROWSABLE = env_bool('API_BROWSABLE', DEBUG)
+# MessagePack (`application/msgpack`) next to JSON, when `msgpack` is installed.
+API_MSGPACK = env_bool('API_MSGPACK', True) and find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON through orjson (stdlib json without it), see `core.renderers`.
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        *(['core.renderers.MessagePackRenderer'] if API_MSGPACK else []),
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if API_BROWSABLE else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        *(['core.parsers.MessagePackParser'] if API_MSGPACK else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Reverse proxies in front of the app: the per-IP limits trust that many
+    # `X-Forwarded-For` hops & no more (0: `REMOTE_ADDR` only, the header is
+    # whatever the client sent).
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # Login & signup limits (`user.throttles`); `None` turns a limit off.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP', '30/min'),
+        'login_email': os.environ.get('THROTTLE_LOGIN_EMAIL', '10/min'),
+        'signup_ip': os.environ.get('THROTTLE_SIGNUP_IP', '20/hour'),
+        'signup_email': os.environ.get('THROTTLE_SIGNUP_EMAIL', '5/hour'),
+    },
 }
+
+# Token -> user cache used by `user.authentication.CachedTokenAuthentication`.
+# 'local': LRU per process; 'shared': the Django cache named by `ALIAS`.
+TOKEN_AUTH_CACHE = {
+    'BACKEND': os.environ.get('TOKEN_AUTH_CACHE_BACKEND', 'local'),
+    'ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS', 'default'),
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    # Seconds.
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 300)),
+}
+
+# Per-process cache of the users' permission sets (see `core.permissions`).
+PERMISSION_CACHE = {
+    'MAX_SIZE': int(os.environ.get('PERMISSION_CACHE_SIZE', 10000)),
+    # Seconds.
+    'TTL': int(os.environ.get('PERMISSION_CACHE_TTL', 300)),
+    # The Django cache telling the processes about changes; it has to be
+    # shared by them (e.g. Redis/Memcached) for a revoked permission to stop
+    # working everywhere right away.
+    'ALIAS': os.environ.get('PERMISSION_CACHE_ALIAS', 'default'),
+}
+
+# Password hashing pool (see `core.hashing`).
+PASSWORD_HASHING = {
+    # 0 runs hashing inline on the request thread.
+    'MAX_WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 4)),
+    # Hashes allowed to wait for a worker before requests get a 503.
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_PENDING', 16)),
+    # Seconds a queued hash may wait for a worker before it's dropped (a 503).
+    'QUEUE_TIMEOUT': float(os.environ.get('PASSWORD_HASHING_QUEUE_TIMEOUT', 0.5)),
+}
+
+# Last-seen tracking (see `core.activity`): the user of every authenticated
+# request is buffered in memory & written in batches, at most once per
+# `RESOLUTION` seconds per user.
+ACTIVITY_TRACKING = {
+    'ENABLED': env_bool('ACTIVITY_TRACKING', True),
+    # Seconds between two flushes of a process's buffer (0: only when it's full).
+    'FLUSH_INTERVAL': float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 10)),
+    # Users buffered before a flush is triggered early.
+    'MAX_USERS': int(os.environ.get('ACTIVITY_MAX_USERS', 1000)),
+    # Precision of `User.last_seen`, in seconds.
+    'RESOLUTION': int(os.environ.get('ACTIVITY_RESOLUTION', 60)),
+}
+
+# Most users `/api/user/create/batch/` creates in one request.
+USER_BATCH_MAX_SIZE = int(os.environ.get('USER_BATCH_MAX_SIZE', 100))
+
+# Serve the user API with the native async views (`user.async_views`)
+# instead of the DRF ones; meant for ASGI deployments.
+USER_API_ASYNC = env_bool('USER_API_ASYNC')
+
+# Per-request timings (`core.middleware.PerformanceMiddleware`).
+PERF_INSTRUMENTATION = {
+    'ENABLED': env_bool('PERF_INSTRUMENTATION'),
+    # Requests slower than this are logged (with their queries) to `core.perf`.
+    'SLOW_REQUEST_MS': float(os.environ.get('PERF_SLOW_REQUEST_MS', 500)),
+}
+
+# OpenAPI schema served from memory by `core.schema.CachedSchemaView`.
+# The schema is rebuilt only when the code version (or a setting it depends on,
+# see `core.schema.SCHEMA_SETTINGS`) changes; set CODE_VERSION (e.g. to the git
+# commit) at build time, otherwise the sources are hashed.
+CODE_VERSION = os.environ.get('CODE_VERSION')
+# Written by `manage.py generate_schema` (and on first use if missing/stale).
+SCHEMA_CACHE_FILE = os.environ.get('SCHEMA_CACHE_FILE', BASE_DIR / 'openapi-schema.json')
+
+# The user admin estimates its row count from the Postgres statistics once the
+# (estimated) count reaches this many rows; smaller results are counted exactly.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000))
+
+# What `/api/user/token/` hands out: 'opaque' `authtoken` keys (a DB lookup per
+# request, cached) or 'signed' stateless access & refresh tokens (`user.tokens`).
+AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'opaque')
+SIGNED_TOKENS = {
+    # Seconds.
+    'ACCESS_TTL': int(os.environ.get('SIGNED_TOKEN_ACCESS_TTL', 300)),
+    'REFRESH_TTL': int(os.environ.get('SIGNED_TOKEN_REFRESH_TTL', 14 * 24 * 3600)),
+}
+
+# Lifetime of the opaque `authtoken` keys in seconds (0 = they never expire).
+# Logging in again after that hands out a new key; `manage.py purge_tokens`
+# deletes the expired ones.
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 30 * 24 * 3600))
+
+# Where the rate limit counters live (see `core.throttling`): 'local' (per
+# process), 'cache' (the Django cache named by `ALIAS`) or 'shared_memory' (a
+# memory-mapped file at `PATH`, shared by the workers of one host).
+THROTTLE_STORE = {
+    'BACKEND': os.environ.get('THROTTLE_STORE_BACKEND', 'local'),
+    'ALIAS': os.environ.get('THROTTLE_STORE_ALIAS', 'default'),
+    'MAX_SIZE': int(os.environ.get('THROTTLE_STORE_SIZE', 100000)),
+    'PATH': os.environ.get('THROTTLE_STORE_PATH', '/tmp/throttle-counters.bin'),
+    'SLOTS': int(os.environ.get('THROTTLE_STORE_SLOTS', 65536)),
+}
+
+# Runs the tests with the rate limits off (`core.test_runner`).
+TEST_RUNNER = 'core.test_runner.TestRunner'
@@ -18,11 +18,17 @@ from django.contrib import admin
 from django.urls import path, include
 
 # https://www.django-rest-framework.org/topics/documenting-your-api/
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
+
+from core import views as core_views
+from core.schema import CachedSchemaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs')
+    # Precomputed once per code version (see `core.schema`).
+    path('api/schema/', CachedSchemaView.as_view(), name='api-schema'),
+    path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
+    path('api/stats/db/', core_views.DatabaseStatsView.as_view(), name='db-stats'),
+    path('api/stats/hashing/', core_views.HashingStatsView.as_view(), name='hashing-stats'),
 ]
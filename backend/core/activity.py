@@ -0,0 +1,228 @@
+"""
+Last-seen tracking without a write per request.
+
+`ActivityMiddleware` records the user of every authenticated request in the
+process's `ActivityBuffer`: a dict of user id -> when they were last seen,
+rounded down to `RESOLUTION` seconds. A background thread flushes it every
+`FLUSH_INTERVAL` seconds (sooner once it holds `MAX_USERS` users) with one
+`UPDATE ... WHERE id IN (...)` per distinct timestamp (& shard, see
+`core.shards`). So a user making a request a second costs one write per
+`RESOLUTION`, and the users seen in the same window share it.
+
+Timestamps never go backwards: the updates skip the rows that are already
+more recent (e.g. written by another process). What's still buffered is
+flushed when the process exits, so a graceful shutdown doesn't lose it; a
+crash loses at most `FLUSH_INTERVAL` seconds of activity, which is fine for
+a "last seen" date.
+"""
+
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections
+from django.db.models import Q
+from django.dispatch import receiver
+
+from core import shards
+from core.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """
+    In-memory last-seen timestamps, written in batches by `flush()`.
+    With a `flush_interval` of 0 there's no background thread: it's flushed
+    when it's full (on the recording thread) or explicitly.
+    """
+
+    # Users per `UPDATE` (bound parameters are limited, on SQLite especially).
+    BATCH_SIZE = 500
+    # Users remembered as written, so they aren't written again in the same window.
+    WRITTEN_CACHE_SIZE = 10_000
+
+    def __init__(self, flush_interval, max_users, resolution):
+        self.flush_interval = flush_interval
+        self.max_users = max_users
+        self.resolution = resolution
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._written = LRUCache(max_size=self.WRITTEN_CACHE_SIZE, ttl=max(resolution, 1))
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.recorded = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.updates = 0
+        self.users_written = 0
+
+    def now(self):
+        """The current time, rounded down to `resolution` seconds."""
+        timestamp = time.time()
+        if self.resolution:
+            timestamp = math.floor(timestamp / self.resolution) * self.resolution
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+    def record(self, user_id, when=None):
+        """Note that the user `user_id` was seen (now, or at `when`)."""
+        if self._add(user_id, when):
+            self.flush()
+
+    async def arecord(self, user_id, when=None):
+        """See record(); doesn't block the event loop when it has to flush."""
+        if self._add(user_id, when):
+            await sync_to_async(self.flush)()
+
+    def _add(self, user_id, when):
+        """Buffer `user_id`; return whether the caller has to flush."""
+        when = when or self.now()
+        self._start_thread()
+        with self._lock:
+            self.recorded += 1
+            latest = self._seen.get(user_id) or self._written.get(user_id)
+            if latest is not None and latest >= when:
+                # Already buffered or written for this window.
+                self.coalesced += 1
+                return False
+            self._seen[user_id] = when
+            full = len(self._seen) >= self.max_users
+        if full and self._thread is not None:
+            self._wake.set()
+            return False
+        return full
+
+    def flush(self):
+        """Write the buffered timestamps; return how many users were written."""
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        if not seen:
+            return 0
+
+        # One `UPDATE` per (shard, timestamp) & `BATCH_SIZE` users.
+        groups = defaultdict(list)
+        for user_id, when in seen.items():
+            groups[shards.db_for_user_id(user_id) or DEFAULT_DB_ALIAS, when].append(user_id)
+        users = get_user_model().objects
+        try:
+            for (using, when), user_ids in groups.items():
+                ids = iter(user_ids)
+                while batch := list(islice(ids, self.BATCH_SIZE)):
+                    # `using()`: straight to the primary, whatever the routers say.
+                    users.using(using).filter(
+                        Q(last_seen__isnull=True) | Q(last_seen__lt=when), pk__in=batch,
+                    ).update(last_seen=when)
+                    self.updates += 1
+        except DatabaseError:
+            # Keep them for the next flush (unless they've been seen since).
+            with self._lock:
+                for user_id, when in seen.items():
+                    self._seen.setdefault(user_id, when)
+            raise
+
+        for user_id, when in seen.items():
+            self._written.set(user_id, when)
+        self.flushes += 1
+        self.users_written += len(seen)
+        return len(seen)
+
+    def _start_thread(self):
+        """Start the flushing thread on first use in this process (or forked child)."""
+        if self.flush_interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker inherits the buffer but not the parent's thread.
+            self._seen = {}
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='activity-flush', daemon=True,
+            )
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # Like a request would: drop connections that are broken or too old.
+            close_old_connections()
+            self._flush_logged()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except DatabaseError:
+            logger.warning('Could not flush the last-seen timestamps', exc_info=True)
+
+    def stop(self):
+        """Stop the flushing thread, then flush what's left."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.stop)
+        self._flush_logged()
+
+    def stats(self):
+        """Counters of this process (how much the buffer saved)."""
+        with self._lock:
+            return {
+                'buffered': len(self._seen),
+                'recorded': self.recorded,
+                'coalesced': self.coalesced,
+                'flushes': self.flushes,
+                'updates': self.updates,
+                'users_written': self.users_written,
+            }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the process-wide buffer configured by `ACTIVITY_TRACKING`."""
+    global _buffer
+    if _buffer is None:
+        conf = settings.ACTIVITY_TRACKING
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityBuffer(
+                    conf['FLUSH_INTERVAL'], conf['MAX_USERS'], conf['RESOLUTION'],
+                )
+    return _buffer
+
+
+@receiver(setting_changed)
+def _reset_buffer(*, setting, **kwargs):
+    global _buffer
+    if setting == 'ACTIVITY_TRACKING' and _buffer is not None:
+        _buffer.stop()
+        _buffer = None
+
+
+def record(user_id):
+    """Note that the user `user_id` was just seen (if tracking is enabled)."""
+    if settings.ACTIVITY_TRACKING['ENABLED']:
+        get_buffer().record(user_id)
+
+
+async def arecord(user_id):
+    """See record()."""
+    if settings.ACTIVITY_TRACKING['ENABLED']:
+        await get_buffer().arecord(user_id)
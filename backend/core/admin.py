@@ -2,28 +2,133 @@
 Django Admin Customization.
 """
 
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import cached_property
 
 from django.utils.translation import gettext_lazy as _
 
 
-from core import models
+from core import models, shards
+from core.db import estimate_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the row count from the planner's statistics instead of
+    running `SELECT COUNT(*)` over the whole table.
+    Below `ADMIN_ESTIMATED_COUNT_THRESHOLD` rows (or off Postgres) it counts
+    exactly: that's cheap there & estimates of small tables are way off.
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        self.estimated = True
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist with "next page" links that continue after the last `id` shown
+    (`?id__gt=...`) instead of using `OFFSET`, which has to walk past every
+    skipped row and gets slower the deeper you go.
+    """
+    keyset_param = 'id__gt'
+
+    @property
+    def keyset(self):
+        """Keyset links only make sense in the default (`id`) ordering."""
+        return ORDER_VAR not in self.params
+
+    @property
+    def keyset_first_url(self):
+        if self.keyset_param in self.params or PAGE_VAR in self.params:
+            return self.get_query_string(remove=[self.keyset_param, PAGE_VAR])
+        return None
+
+    @property
+    def keyset_next_url(self):
+        # `result_list` is already evaluated by the time the paginator renders.
+        results = list(self.result_list)
+        if len(results) < self.list_per_page:
+            return None
+        return self.get_query_string({self.keyset_param: results[-1].pk}, [PAGE_VAR])
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """
+    The shard whose users are listed (see `core.shards`): `default` unless
+    another one is picked. There's no "All": a page is read from one database.
+    """
+    title = _('shard')
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shards.aliases()]
+
+    def choices(self, changelist):
+        selected = self.value() or DEFAULT_DB_ALIAS
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': lookup == selected,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        using = self.value() or DEFAULT_DB_ALIAS
+        if using not in shards.aliases():
+            raise IncorrectLookupParameters(f'Unknown shard: {using}')
+        return queryset.using(using)
 
 
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users."""
     ordering = ['id']
     list_display = ['email', 'name']
+    # Prefix matches only, so they can use the `UPPER(...)` indexes on `User`.
+    search_fields = ['^email', '^name']
+
+    paginator = EstimatedCountPaginator
+    # Don't count the unfiltered table next to the filtered results.
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if shards.enabled():
+            list_filter = [ShardFilter, *list_filter]
+        return list_filter
+
+    def get_object(self, request, object_id, from_field=None):
+        if not shards.enabled() or from_field is not None:
+            return super().get_object(request, object_id, from_field)
+        # On the user's shard.
+        try:
+            using = shards.db_for_user_id(object_id)
+            return self.get_queryset(request).using(using).get(pk=object_id)
+        except (self.model.DoesNotExist, ValueError):
+            return None
 
     # Only the fields that we've implemented in our custom `User` model.
     # in core/models/User
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Permissions'), {'fields': ('is_active', 'is_staff', 'is_superuser')}),
-        (_('Important Dates'), {'fields': ('last_login',)}),
+        (_('Important Dates'), {'fields': ('last_login', 'last_seen')}),
     )
-    readonly_fields = ['last_login']
+    readonly_fields = ['last_login', 'last_seen']
 
     add_fieldsets = (
         (None, {
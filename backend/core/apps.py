@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Start counting connections from the very first one.
+        from core import db  # noqa: F401
+        # Connect the permission cache's invalidation receivers.
+        from core import permissions  # noqa: F401
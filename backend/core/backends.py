@@ -0,0 +1,116 @@
+"""
+Authentication backends.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+
+from core import shards
+from core.permissions import get_permission_cache
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate users by email & password.
+    The email is matched regardless of case through the manager's natural key
+    lookup, which uses the `LOWER(email)` unique index (on the user's shard, see
+    `core.shards`).
+    Permissions are cached across requests (`core.permissions`).
+    """
+
+    def get_user(self, user_id):
+        user_model = get_user_model()
+        try:
+            user = user_model._default_manager.using(
+                shards.db_for_user_id(user_id)
+            ).get(pk=user_id)
+        except user_model.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        """See get_user()."""
+        user_model = get_user_model()
+        try:
+            user = await user_model._default_manager.using(
+                shards.db_for_user_id(user_id)
+            ).aget(pk=user_id)
+        except user_model.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    @staticmethod
+    def _checks_permissions(user_obj, obj):
+        return user_obj.is_active and not user_obj.is_anonymous and obj is None
+
+    @staticmethod
+    def _versions(user_obj):
+        """The user's permission cache versions, read once per instance (request)."""
+        if not hasattr(user_obj, '_perm_cache_versions'):
+            user_obj._perm_cache_versions = get_permission_cache().versions(user_obj.pk)
+        return user_obj._perm_cache_versions
+
+    @staticmethod
+    async def _aversions(user_obj):
+        """See _versions()."""
+        if not hasattr(user_obj, '_perm_cache_versions'):
+            versions = await get_permission_cache().aversions(user_obj.pk)
+            user_obj._perm_cache_versions = versions
+        return user_obj._perm_cache_versions
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if self._checks_permissions(user_obj, obj) and not hasattr(user_obj, '_perm_cache'):
+            # Read before the permissions, so a change made meanwhile voids them.
+            versions = self._versions(user_obj)
+            perms = get_permission_cache().get(user_obj.pk, versions)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj)
+                get_permission_cache().set(user_obj.pk, perms, versions)
+            user_obj._perm_cache = perms
+        return super().get_all_permissions(user_obj, obj)
+
+    async def aget_all_permissions(self, user_obj, obj=None):
+        """See get_all_permissions()."""
+        if self._checks_permissions(user_obj, obj) and not hasattr(user_obj, '_perm_cache'):
+            versions = await self._aversions(user_obj)
+            perms = get_permission_cache().get(user_obj.pk, versions)
+            if perms is None:
+                perms = await super().aget_all_permissions(user_obj)
+                await get_permission_cache().aset(user_obj.pk, perms, versions)
+            user_obj._perm_cache = perms
+        return await super().aget_all_permissions(user_obj, obj)
+
+    def has_perm(self, user_obj, perm, obj=None):
+        # Straight from the cached mask, without building the set.
+        if self._checks_permissions(user_obj, obj) and not hasattr(user_obj, '_perm_cache'):
+            versions = self._versions(user_obj)
+            cached = get_permission_cache().has_perm(user_obj.pk, perm, versions)
+            if cached is not None:
+                return cached
+        return super().has_perm(user_obj, perm, obj)
+
+    def _get_group_permissions(self, user_obj):
+        # On the user's shard, with the copies of their groups (see `core.shards`).
+        return Permission.objects.using(user_obj._state.db).filter(
+            group__in=user_obj.groups.all()
+        )
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Same as `ModelBackend.aauthenticate`, but the timing-attack mitigation for
+        unknown users hashes on the pool instead of blocking the event loop.
+        """
+        user_model = get_user_model()
+        if username is None:
+            username = kwargs.get(user_model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await user_model._default_manager.aget_by_natural_key(username)
+        except user_model.DoesNotExist:
+            await user_model().aset_password(password)
+        else:
+            if await user.acheck_password(password) and self.user_can_authenticate(user):
+                return user
+        return None
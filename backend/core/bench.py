@@ -0,0 +1,155 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+BENCH_EMAIL_DOMAIN = 'bench.example.com'
+BENCH_PASSWORD = 'BenchPass!'
+
+
+def percentile(values, pct):
+    """Return the `pct` percentile of `values` (nearest-rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed=None):
+    """
+    Summarize a list of latencies (seconds) into a report in milliseconds.
+    `elapsed`: wall time of the whole run; defaults to the sum of latencies.
+    """
+    elapsed = sum(latencies) if elapsed is None else elapsed
+    count = len(latencies)
+    return {
+        'requests': count,
+        'throughput': round(count / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(1000 * sum(latencies) / count, 3) if count else 0.0,
+        'p50_ms': round(1000 * percentile(latencies, 50), 3),
+        'p95_ms': round(1000 * percentile(latencies, 95), 3),
+        'p99_ms': round(1000 * percentile(latencies, 99), 3),
+    }
+
+
+def timed(func, repeat):
+    """Call `func()` `repeat` times; return the list of latencies (seconds)."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_concurrently(func, requests, concurrency):
+    """
+    Call `func(i)` for i in range(`requests`) from `concurrency` threads.
+    `func` returns a label (e.g. endpoint name); latencies are grouped by it.
+    Returns `({label: [latency, ...]}, elapsed)`.
+    """
+    counter = itertools.count()
+    latencies = defaultdict(list)
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while (i := next(counter)) < requests:
+                start = time.perf_counter()
+                label = func(i)
+                latency = time.perf_counter() - start
+                with lock:
+                    latencies[label].append(latency)
+        finally:
+            # Every thread opened its own DB connection.
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict(latencies), time.perf_counter() - start
+
+
+async def arun_concurrently(coro_func, requests, concurrency):
+    """
+    Async counterpart of `run_concurrently()`: awaits `coro_func(i)` for
+    i in range(`requests`) with at most `concurrency` in flight.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = defaultdict(list)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            label = await coro_func(i)
+            latencies[label].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return dict(latencies), time.perf_counter() - start
+
+
+@contextmanager
+def test_client_environment():
+    """Let the in-process test clients talk to the app (e.g. `testserver` host)."""
+    setup_test_environment()
+    try:
+        yield
+    finally:
+        teardown_test_environment()
+
+
+@contextmanager
+def seeded_users(count, prefix='bench'):
+    """
+    Insert `count` throwaway users (all with `BENCH_PASSWORD`) & yield them.
+    The password is hashed once, so seeding stays cheap for large counts.
+    Users are deleted again on exit.
+    """
+    user_model = get_user_model()
+    password = make_password(BENCH_PASSWORD)
+    users = user_model.objects.bulk_create(
+        [
+            user_model(
+                email=f'{prefix}{i}@{BENCH_EMAIL_DOMAIN}',
+                name=f'{prefix} user {i}',
+                password=password,
+            )
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+    try:
+        yield users
+    finally:
+        user_model.objects.filter(
+            email__startswith=prefix, email__endswith=BENCH_EMAIL_DOMAIN,
+        ).delete()
+
+
+def write_report(command, report, as_json=False):
+    """Print `report` from a management command, either as JSON or as a table."""
+    if as_json:
+        command.stdout.write(json.dumps(report, indent=2))
+        return
+    for name, results in report.items():
+        command.stdout.write(command.style.MIGRATE_HEADING(name))
+        for key, value in results.items():
+            command.stdout.write(f'  {key:<20} {value}')
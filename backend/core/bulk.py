@@ -0,0 +1,115 @@
+"""
+Bulk insert helpers used by `UserManager.bulk_import()`.
+
+- `hashing_pool()`: a process pool for password hashing. PBKDF2 takes a
+  good fraction of a second per password, so hashing is what limits a bulk
+  import; processes use every core (the `core.hashing` threads are capped).
+- `copy_insert()`: insert rows with Postgres `COPY ... FROM STDIN`, which
+  skips the per-statement overhead of `INSERT` (even batched ones).
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.contrib.auth import hashers
+from django.db import connections
+
+
+class ImportResult:
+    """What a bulk import did: counts plus the rows it skipped & why."""
+
+    def __init__(self):
+        self.created = 0
+        # `(line, email)` of rows whose email was taken (or repeated).
+        self.duplicates = []
+        # `(line, message)` of invalid rows.
+        self.errors = []
+
+    def __repr__(self):
+        return (
+            f'<ImportResult created={self.created} duplicates={len(self.duplicates)} '
+            f'errors={len(self.errors)}>'
+        )
+
+
+class InlineExecutor:
+    """Executor-like stand-in running `map()` in the calling process."""
+
+    def map(self, func, *iterables, chunksize=1):
+        return map(func, *iterables)
+
+
+@contextmanager
+def hashing_pool(workers=None):
+    """
+    Yield an executor to `map()` password hashes on: `workers` processes
+    (default: one per CPU), or the calling process if `workers` is 0.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    if workers == 0:
+        yield InlineExecutor()
+        return
+    # `django.setup()` for start methods that don't fork (the settings
+    # module is passed on through the environment).
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        yield pool
+
+
+def hash_passwords(pool, passwords):
+    """
+    Start hashing `passwords` on `pool`; return an iterator of the hashes.
+    The work is submitted right away, so the caller can do something else
+    (e.g. insert the previous batch) while it runs.
+    """
+    chunksize = max(len(passwords) // (4 * (os.cpu_count() or 1)), 1)
+    return pool.map(hashers.make_password, passwords, chunksize=chunksize)
+
+
+def _copy_value(value):
+    """Format `value` for `COPY`'s text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def copy_insert(objs, using='default'):
+    """
+    Insert the (unsaved) model instances `objs` with Postgres `COPY`.
+    Like `bulk_create()` it doesn't send signals; unlike it, it doesn't set
+    the primary keys of `objs` (those set beforehand are inserted).
+    """
+    if not objs:
+        return
+    connection = connections[using]
+    meta = objs[0]._meta
+    # Sharded users come with their pk (see `core.shards`).
+    with_pk = objs[0].pk is not None
+    fields = [field for field in meta.concrete_fields if with_pk or not field.primary_key]
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write('\t'.join(
+            _copy_value(field.get_db_prep_save(field.pre_save(obj, True), connection))
+            for field in fields
+        ))
+        buffer.write('\n')
+
+    quote = connection.ops.quote_name
+    sql = 'COPY %s (%s) FROM STDIN' % (
+        quote(meta.db_table), ', '.join(quote(field.column) for field in fields),
+    )
+    # Raw cursor methods: translate driver errors (e.g. `IntegrityError`) ourselves.
+    with connection.cursor() as cursor, connection.wrap_database_errors:
+        if hasattr(cursor.cursor, 'copy_expert'):  # psycopg2
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
@@ -0,0 +1,78 @@
+"""
+Small in-process caches shared by the project apps.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds.
+    Keeps hit/miss counters so callers can report how well it's doing.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for `key` (or `default` if missing/expired)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """Store `value` under `key`, evicting the least recently used entries."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Drop `key` from the cache; missing keys are ignored."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_if(self, predicate):
+        """Drop every entry whose value satisfies `predicate`; returns how many."""
+        with self._lock:
+            doomed = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in doomed:
+                del self._data[key]
+        return len(doomed)
+
+    def clear(self):
+        """Drop every entry & reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return the hit/miss counters as a dictionary."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+        }
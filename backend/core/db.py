@@ -0,0 +1,83 @@
+"""
+Database connection bookkeeping.
+"""
+
+import json
+import threading
+from collections import Counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_opened = Counter()
+_opened_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def _count_connection(sender, connection, **kwargs):
+    """Count every connection this process opens (or checks out of a pool)."""
+    with _opened_lock:
+        _opened[connection.alias] += 1
+
+
+def connections_opened(alias='default'):
+    """Number of connections opened for `alias` by this process so far."""
+    return _opened[alias]
+
+
+def connection_stats():
+    """
+    Return per-alias connection settings & counters for this process, plus the
+    psycopg pool statistics when pooling is enabled.
+    """
+    stats = {}
+    for alias in connections:
+        conn = connections[alias]
+        entry = {
+            'vendor': conn.vendor,
+            'conn_max_age': conn.settings_dict['CONN_MAX_AGE'],
+            'health_checks': conn.settings_dict['CONN_HEALTH_CHECKS'],
+            'connections_opened': connections_opened(alias),
+            'pool': None,
+        }
+        pool = getattr(conn, 'pool', None)
+        if pool is not None:
+            entry['pool'] = pool.get_stats()
+        stats[alias] = entry
+    return stats
+
+
+def warm_pool(alias, count, timeout):
+    """
+    Make the connection pool of `alias` hold at least `count` open connections
+    (capped by its `max_size`), waiting at most `timeout` seconds.
+    Returns how many connections were warmed; 0 when `alias` has no pool.
+    """
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return 0
+
+    pool.open(wait=True, timeout=timeout)
+    # Check out `count` connections at once so the pool has to open them.
+    borrowed = []
+    try:
+        for _ in range(min(count, pool.max_size)):
+            borrowed.append(pool.getconn(timeout=timeout))
+    finally:
+        for conn in borrowed:
+            pool.putconn(conn)
+    return len(borrowed)
+
+
+def estimate_count(queryset):
+    """
+    Return the planner's row estimate for `queryset`, or None when the
+    database can't give one (anything but Postgres).
+    `EXPLAIN` reads the table statistics instead of scanning the rows, so this
+    costs the same on a million-row table as on an empty one.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
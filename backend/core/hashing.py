@@ -0,0 +1,268 @@
+"""
+Password hashing & verification on a bounded worker pool.
+
+PBKDF2 (the default hasher) spends its time in `hashlib`, which releases the
+GIL, so a small thread pool caps how many CPU cores hashing can take without
+blocking the rest of the worker. When the pool & its queue are full, or a
+queued hash doesn't start within `QUEUE_TIMEOUT`, we shed the work
+(`HashingPoolSaturated`) instead of letting requests pile up.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from core import perf
+
+
+class HashingPoolSaturated(Exception):
+    """Every worker is busy & the queue is full (or the queue was too slow)."""
+
+    def __init__(self, retry_after=1):
+        super().__init__(retry_after)
+        # Seconds after which the pool should have room again (a hint).
+        self.retry_after = retry_after
+
+
+class HashingExecutor:
+    """
+    Thread pool running at most `max_workers` hashes, with `max_pending` queued.
+    A queued hash that hasn't started after `queue_timeout` seconds is dropped.
+    """
+
+    # Weight of the latest hash in the average duration (EWMA).
+    SMOOTHING = 0.2
+
+    def __init__(self, max_workers, max_pending, queue_timeout=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hashing')
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.shed_full = 0
+        self.shed_expired = 0
+        self.avg_duration = None
+
+    @property
+    def queue_depth(self):
+        """Hashes admitted but still waiting for a worker."""
+        return self.in_flight - self.running
+
+    def retry_after(self):
+        """Rough seconds until the work ahead of a new request is done."""
+        duration = self.avg_duration or 0
+        return max(1, math.ceil(self.in_flight / self.max_workers * duration))
+
+    def _shed(self, reason):
+        with self._lock:
+            setattr(self, reason, getattr(self, reason) + 1)
+        raise HashingPoolSaturated(self.retry_after())
+
+    def _job(self, func, args, deadline):
+        """
+        Run `func(*args)` on a worker, unless it waited past `deadline` (the
+        futures of `submit()`, which no one waits for with a timeout).
+        """
+        if deadline is not None and time.monotonic() > deadline:
+            self._shed('shed_expired')
+        with self._lock:
+            self.running += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.avg_duration = duration if self.avg_duration is None else (
+                    self.SMOOTHING * duration + (1 - self.SMOOTHING) * self.avg_duration
+                )
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def submit(self, func, *args):
+        """Schedule `func(*args)` on the pool & return its future."""
+        return self._submit(func, args)[0]
+
+    def _submit(self, func, args):
+        """submit() returning `(future, deadline)`."""
+        if not self._slots.acquire(blocking=False):
+            self._shed('shed_full')
+        deadline = None
+        if self.queue_timeout is not None:
+            deadline = time.monotonic() + self.queue_timeout
+        with self._lock:
+            self.in_flight += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            future = self._pool.submit(self._job, func, args, deadline)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future, deadline
+
+    def _expire(self, future):
+        """Drop `future` if it's still queued at its deadline."""
+        # Once it has started it runs to the end, & is waited for.
+        if future.cancel():
+            self._shed('shed_expired')
+
+    def run(self, func, *args):
+        """
+        Run `func(*args)` on the pool & wait for its result; shed at the
+        deadline if it's still queued then.
+        """
+        future, deadline = self._submit(func, args)
+        if deadline is not None:
+            try:
+                return future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                self._expire(future)
+        return future.result()
+
+    async def arun(self, func, *args):
+        """See run(); doesn't block the event loop."""
+        future, deadline = self._submit(func, args)
+        waiter = asyncio.wrap_future(future)
+        if deadline is not None:
+            timeout = max(0, deadline - time.monotonic())
+            done, _ = await asyncio.wait([waiter], timeout=timeout)
+            if not done:
+                self._expire(future)
+        return await waiter
+
+    def stats(self):
+        """Queue depth, shed counts & hash timings of this process."""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'queue_timeout': self.queue_timeout,
+                'in_flight': self.in_flight,
+                'running': self.running,
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'completed': self.completed,
+                'shed_full': self.shed_full,
+                'shed_expired': self.shed_expired,
+                'avg_hash_ms': (
+                    None if self.avg_duration is None else round(1000 * self.avg_duration, 3)
+                ),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the process-wide executor configured by `PASSWORD_HASHING`,
+    or None if hashing should run inline (`MAX_WORKERS` = 0).
+    """
+    global _executor
+    conf = settings.PASSWORD_HASHING
+    if _executor is None and conf['MAX_WORKERS'] > 0:
+        with _executor_lock:
+            if _executor is None:
+                _executor = HashingExecutor(
+                    conf['MAX_WORKERS'], conf['MAX_PENDING'], conf.get('QUEUE_TIMEOUT'),
+                )
+    return _executor
+
+
+@receiver(setting_changed)
+def _reset_executor(*, setting, **kwargs):
+    global _executor
+    if setting == 'PASSWORD_HASHING' and _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def _run(func, *args):
+    executor = get_executor()
+    with perf.timer('hash'):
+        if executor is None:
+            return func(*args)
+        return executor.run(func, *args)
+
+
+async def _arun(func, *args):
+    executor = get_executor()
+    with perf.timer('hash'):
+        if executor is None:
+            return await sync_to_async(func, thread_sensitive=False)(*args)
+        return await executor.arun(func, *args)
+
+
+def make_password(raw_password):
+    """Pooled `django.contrib.auth.hashers.make_password`."""
+    return _run(hashers.make_password, raw_password)
+
+
+def check_password(raw_password, encoded, setter=None):
+    """
+    Pooled `django.contrib.auth.hashers.check_password`.
+    Only the hash runs on the pool: `setter` (which saves the upgraded hash)
+    stays on the calling thread & its DB connection.
+    """
+    is_correct, must_update = _run(hashers.verify_password, raw_password, encoded)
+    if setter and is_correct and must_update:
+        setter(raw_password)
+    return is_correct
+
+
+def make_passwords(raw_passwords):
+    """
+    Pooled make_password() for many passwords, hashed in parallel.
+    At most `MAX_WORKERS` of them are on the pool at once, so a batch doesn't
+    take the queue slots of the single requests (nor shed itself).
+    """
+    executor = get_executor()
+    with perf.timer('hash'):
+        if executor is None:
+            return [hashers.make_password(raw_password) for raw_password in raw_passwords]
+        encoded, window = [], deque()
+        for raw_password in raw_passwords:
+            if len(window) == executor.max_workers:
+                encoded.append(window.popleft().result())
+            window.append(executor.submit(hashers.make_password, raw_password))
+        encoded.extend(future.result() for future in window)
+        return encoded
+
+
+async def amake_password(raw_password):
+    """See make_password()."""
+    return await _arun(hashers.make_password, raw_password)
+
+
+async def acheck_password(raw_password, encoded, setter=None):
+    """See check_password(); `setter` is a coroutine function."""
+    is_correct, must_update = await _arun(hashers.verify_password, raw_password, encoded)
+    if setter and is_correct and must_update:
+        await setter(raw_password)
+    return is_correct
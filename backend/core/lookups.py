@@ -0,0 +1,20 @@
+"""
+Custom ORM lookups.
+"""
+
+from django.db import models
+
+
+@models.EmailField.register_lookup
+class LowerExact(models.Lookup):
+    """
+    `email__ciexact=value`: case-insensitive equality compiled to
+    `LOWER(email) = LOWER(value)`, so it can use the `LOWER(email)` unique
+    index on `User` (`iexact` compiles to `UPPER(...)`, or `LIKE`, instead).
+    """
+    lookup_name = 'ciexact'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'LOWER({lhs}) = LOWER({rhs})', (*lhs_params, *rhs_params)
@@ -0,0 +1,25 @@
+"""
+Django custom command to pre-generate the OpenAPI schema served at /api/schema/.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import SchemaCache, code_version, generate_schema
+
+
+class Command(BaseCommand):
+    """Generate the schema for the current code version into `SCHEMA_CACHE_FILE`."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=settings.SCHEMA_CACHE_FILE,
+            help='Where to write the schema (defaults to SCHEMA_CACHE_FILE).',
+        )
+
+    def handle(self, *args, **options):
+        version = code_version()
+        SchemaCache(version, generate_schema()).save(options['file'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Schema for version {version} written to {options["file"]}'
+        ))
@@ -3,26 +3,114 @@ Django custom command to make sure app waits till the DB is ready.
 """
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
 
-from psycopg2 import OperationalError as Psycopg2OpErr
+from core.db import warm_pool
+
+
+class DatabaseTimeout(Exception):
+    """The overall deadline passed before the database was ready."""
 
 
 class Command(BaseCommand):
     """Wait for DB till it's up and running."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up (and exit with an error) after this many seconds.',
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.05,
+            help='First retry delay in seconds; doubles after every failure.',
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=1.0,
+            help='Upper bound for the retry delay in seconds.',
+        )
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database alias to wait for (repeatable). Defaults to all of them.',
+        )
+        parser.add_argument(
+            '--warm', type=int, default=0,
+            help='Open this many pooled connections per database before exiting.',
+        )
+        parser.add_argument(
+            '--check-migrations', action='store_true',
+            help='Also wait until every migration has been applied.',
+        )
+
     def handle(self, *args, **options):
         """Entrypoint for command."""
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while not db_up:
+        self.options = options
+        self.deadline = time.monotonic() + options['timeout']
+        aliases = options['databases'] or list(settings.DATABASES)
+        start = time.monotonic()
+
+        # Every database gets its own thread (and its own retry loop).
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            futures = [executor.submit(self.wait_for, alias) for alias in aliases]
             try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2OpErr, OperationalError):
-                self.stdout.write('Database unavailable, waiting for 1 second...')
-                time.sleep(2)
+                for future in futures:
+                    future.result()
+            except DatabaseTimeout as exc:
+                raise CommandError(
+                    f'Database {exc} not ready after {options["timeout"]:g} seconds.'
+                )
+
+        elapsed_ms = 1000 * (time.monotonic() - start)
+        self.stdout.write(
+            self.style.SUCCESS(f'+++ Database Available! +++ ({elapsed_ms:.0f}ms)')
+        )
+
+    def retry(self, alias, attempt, reason):
+        """Sleep before the next attempt (exponential backoff) or time out."""
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise DatabaseTimeout(alias)
+        delay = min(self.options['initial_delay'] * 2 ** attempt, self.options['max_delay'])
+        delay = min(delay, remaining)
+        self.stdout.write(f'{reason} ({alias}), retrying in {1000 * delay:.0f}ms...')
+        time.sleep(delay)
+
+    def wait_for(self, alias):
+        """Block until `alias` accepts connections (and is migrated, if asked)."""
+        try:
+            # Django wraps most driver errors, not all (whichever driver:
+            # psycopg2, psycopg 3...).
+            driver_error = connections[alias].Database.OperationalError
+            attempt = 0
+            while True:
+                try:
+                    self.check(databases=[alias])
+                    break
+                except (driver_error, OperationalError):
+                    self.retry(alias, attempt, 'Database unavailable')
+                    attempt += 1
+
+            if self.options['warm']:
+                remaining = self.deadline - time.monotonic()
+                warmed = warm_pool(alias, self.options['warm'], remaining)
+                self.stdout.write(f'Warmed {warmed} pooled connection(s) ({alias}).')
+
+            if self.options['check_migrations']:
+                attempt = 0
+                while self.unapplied_migrations(alias):
+                    self.retry(alias, attempt, 'Unapplied migrations')
+                    attempt += 1
+        finally:
+            # This thread's connection is of no use to anyone after we're done.
+            connections[alias].close()
 
-        self.stdout.write(self.style.SUCCESS('+++ Database Available! +++'))
+    def unapplied_migrations(self, alias):
+        """Return how many migrations still have to be applied on `alias`."""
+        executor = MigrationExecutor(connections[alias])
+        return len(executor.migration_plan(executor.loader.graph.leaf_nodes()))
@@ -0,0 +1,255 @@
+"""
+Project middleware.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.functional import SimpleLazyObject, empty
+
+from core import activity, perf, replicas
+
+logger = logging.getLogger('core.perf')
+
+
+class SyncAsyncMiddleware:
+    """
+    Base of the middleware below, which work both ways like Django's own: under
+    ASGI with async views (`USER_API_ASYNC`) they're coroutines calling
+    `__acall__()`, so the views aren't run through a thread; otherwise
+    `__call__()` is a plain function.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class PerformanceMiddleware(SyncAsyncMiddleware):
+    """
+    Time every request (total, DB queries, password hashing, serializers),
+    report it in a `Server-Timing` header & log slow requests with their
+    queries. Removed from the stack entirely unless `PERF_INSTRUMENTATION`
+    is enabled.
+    """
+
+    def __init__(self, get_response):
+        conf = settings.PERF_INSTRUMENTATION
+        if not conf['ENABLED']:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.slow_request_ms = conf['SLOW_REQUEST_MS']
+
+    @staticmethod
+    def wrap_queries(timings):
+        """Time the queries of this thread's connections until the stack is closed."""
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(timings.record_query))
+        return stack
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = perf.RequestTimings()
+        token = perf.activate(timings)
+        start = time.perf_counter()
+        try:
+            with self.wrap_queries(timings):
+                response = self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        return self.report(request, response, time.perf_counter() - start, timings)
+
+    async def __acall__(self, request):
+        timings = perf.RequestTimings()
+        token = perf.activate(timings)
+        start = time.perf_counter()
+        try:
+            # The async ORM queries on the (per request) `sync_to_async` thread,
+            # so that's the one whose connections get wrapped.
+            stack = await sync_to_async(self.wrap_queries)(timings)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            perf.deactivate(token)
+        return self.report(request, response, time.perf_counter() - start, timings)
+
+    def report(self, request, response, total, timings):
+        response['Server-Timing'] = timings.server_timing(total)
+        if 1000 * total >= self.slow_request_ms:
+            self.log_slow_request(request, total, timings)
+        return response
+
+    def log_slow_request(self, request, total, timings):
+        match = request.resolver_match
+        logger.warning(
+            'Slow request: %s %s (view %s) took %.1fms, %d queries:\n%s',
+            request.method,
+            request.path,
+            match.view_name if match else None,
+            1000 * total,
+            len(timings.queries),
+            '\n'.join(
+                f'  [{1000 * seconds:.1f}ms] {sql}' for sql, seconds in timings.queries
+            ),
+        )
+
+
+class ReplicaRoutingMiddleware(SyncAsyncMiddleware):
+    """
+    Let safe-method requests read from the read replicas (`core.replicas`).
+    A request that writes sets a cookie pinning the client, & pins the user it
+    acted for, to the primary for `STICKY_SECONDS`, long enough for the
+    replicas to catch up, so it reads its own writes (e.g. a profile fetched
+    right after signing up). Removed from the stack entirely when there are no
+    replicas.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        conf = settings.READ_REPLICAS
+        if not conf['ALIASES']:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.cookie = conf['PIN_COOKIE']
+        self.sticky_seconds = conf['STICKY_SECONDS']
+
+    def is_pinned(self, request):
+        return request.method not in self.SAFE_METHODS or self.cookie in request.COOKIES
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replicas.routing(pinned=self.is_pinned(request)) as state:
+            response = self.get_response(request)
+        if state.wrote and state.user_id is not None:
+            replicas.pin_user(state.user_id)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        # The routing state is a context variable: the async ORM's threads
+        # (`sync_to_async`) see it too.
+        with replicas.routing(pinned=self.is_pinned(request)) as state:
+            response = await self.get_response(request)
+        if state.wrote and state.user_id is not None:
+            await replicas.apin_user(state.user_id)
+        return self.pin(request, response, state)
+
+    def pin(self, request, response, state):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie, '1', max_age=self.sticky_seconds,
+                secure=request.is_secure(), httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ActivityMiddleware(SyncAsyncMiddleware):
+    """
+    Record the user of every authenticated request in the last-seen buffer
+    (`core.activity`), once the response is ready. Removed from the stack
+    entirely unless `ACTIVITY_TRACKING` is enabled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.ACTIVITY_TRACKING['ENABLED']:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    @staticmethod
+    def seen_user_id(request):
+        """The id of the user authenticated for `request`, if any."""
+        # DRF & the async views set the user they authenticated on the request.
+        user = getattr(request, 'user', None)
+        if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            # The session user nobody asked for; not worth a query.
+            return None
+        if user is not None and user.is_authenticated:
+            return user.pk
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user_id = self.seen_user_id(request)
+        if user_id is not None:
+            activity.record(user_id)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user_id = self.seen_user_id(request)
+        if user_id is not None:
+            await activity.arecord(user_id)
+        return response
+
+
+def is_lean(request):
+    """
+    Whether `request` skips the browser-only middleware: it's for one of the
+    `LEAN_MIDDLEWARE_PATHS` (the token-authenticated API) & has no session
+    cookie. Staff using the API from a logged-in browser (session
+    authentication, the browsable API) get the full stack.
+    """
+    lean = request.__dict__.get('_lean_middleware')
+    if lean is None:
+        lean = request._lean_middleware = (
+            request.path_info.startswith(tuple(settings.LEAN_MIDDLEWARE_PATHS))
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        )
+    return lean
+
+
+class LeanPathsMixin:
+    """
+    Skip the middleware altogether (straight to the next one) for the
+    requests of `is_lean()`. Mixed into subclasses of Django's middleware,
+    so `MIDDLEWARE` still names what the admin's checks look for.
+    """
+
+    def __call__(self, request):
+        if is_lean(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class LeanSessionMiddleware(LeanPathsMixin, SessionMiddleware):
+    pass
+
+
+class LeanCsrfViewMiddleware(LeanPathsMixin, CsrfViewMiddleware):
+    # DRF views are exempt anyway; its session authentication checks the token itself.
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_lean(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class LeanAuthenticationMiddleware(LeanPathsMixin, AuthenticationMiddleware):
+    pass
+
+
+class LeanMessageMiddleware(LeanPathsMixin, MessageMiddleware):
+    pass
+
+
+class LeanXFrameOptionsMiddleware(LeanPathsMixin, XFrameOptionsMiddleware):
+    pass
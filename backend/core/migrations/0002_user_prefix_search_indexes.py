@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+import core.models
+import django.db.models.functions.text
+from django.db import migrations
+
+INDEXES = [
+    core.models.PrefixSearchIndex(django.db.models.functions.text.Upper('email'), name='core_user_email_prefix_idx'),
+    core.models.PrefixSearchIndex(django.db.models.functions.text.Upper('name'), name='core_user_name_prefix_idx'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    """
+    On Postgres build the indexes CONCURRENTLY, so a big `core_user` table
+    stays writable meanwhile. If a build fails it's left INVALID: drop the
+    index & migrate again.
+    """
+    model = apps.get_model('core', 'User')
+    concurrently = schema_editor.connection.vendor == 'postgresql'
+    for index in INDEXES:
+        if concurrently:
+            schema_editor.add_index(model, index, concurrently=True)
+        else:
+            schema_editor.add_index(model, index)
+
+
+def drop_indexes(apps, schema_editor):
+    model = apps.get_model('core', 'User')
+    concurrently = schema_editor.connection.vendor == 'postgresql'
+    for index in INDEXES:
+        if concurrently:
+            schema_editor.remove_index(model, index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(create_indexes, drop_indexes)],
+            state_operations=[
+                migrations.AddIndex(model_name='user', index=index) for index in INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+CONSTRAINT = models.UniqueConstraint(
+    django.db.models.functions.text.Lower('email'),
+    name='core_user_email_ci_unique',
+    violation_error_message='User with this email already exists.',
+)
+
+
+def create_index(apps, schema_editor):
+    """
+    On Postgres build the index CONCURRENTLY, so a big `core_user` table stays
+    writable meanwhile. If it fails (e.g. emails differing only in case) it's
+    left INVALID: fix the data, drop the index & migrate again.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "core_user_email_ci_unique" '
+            'ON "core_user" (LOWER("email"))'
+        )
+    else:
+        schema_editor.add_constraint(apps.get_model('core', 'User'), CONSTRAINT)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS "core_user_email_ci_unique"')
+    else:
+        schema_editor.remove_constraint(apps.get_model('core', 'User'), CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0002_user_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(create_index, drop_index)],
+            state_operations=[migrations.AddConstraint(model_name='user', constraint=CONSTRAINT)],
+        ),
+    ]
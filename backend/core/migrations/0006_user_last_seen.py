@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,7 +2,13 @@
 Database models.
 """
 
-from django.db import models
+import copy
+from collections import defaultdict
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models.functions import Lower, Upper
 
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -10,10 +16,38 @@ from django.contrib.auth.models import (
     BaseUserManager
 )
 
+from core import bulk, hashing, lookups, shards  # noqa: F401 (registers `email__ciexact`)
+
+
+class PrefixSearchIndex(models.Index):
+    """
+    Expression index for `LIKE 'abc%'` lookups such as `istartswith`.
+    Postgres only uses a btree for those with the `text_pattern_ops` operator
+    class (unless the DB collation is "C"), so it's added there; other
+    databases get a plain expression index.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        index = self
+        if schema_editor.connection.vendor == 'postgresql':
+            from django.contrib.postgres.indexes import OpClass
+
+            index = copy.copy(self)
+            index.expressions = [
+                OpClass(expression, name='text_pattern_ops')
+                for expression in self.expressions
+            ]
+        return super(PrefixSearchIndex, index).create_sql(
+            model, schema_editor, using=using, **kwargs
+        )
+
 
 class UserManager(BaseUserManager):
     """Custom User Manager."""
 
+    # The string fields of a `bulk_import()` row.
+    IMPORT_FIELDS = ('email', 'name', 'password')
+
     def create_user(self, email, password, **extra_fields):
         """Create, save & return a new user."""
         if not email:
@@ -26,6 +60,183 @@ class UserManager(BaseUserManager):
 
         return user
 
+    async def acreate_user(self, email, password, **extra_fields):
+        """See create_user()."""
+        if not email:
+            raise ValueError('Email cannot be blank!')
+        user = self.model(email=self.normalize_email(email), **extra_fields)
+        await user.aset_password(password)
+        await user.asave(using=self._db)
+
+        return user
+
+    @property
+    def write_db(self):
+        """The database writes go to (`db` is the one reads come from)."""
+        return self._db or router.db_for_write(self.model)
+
+    # Emails are unique regardless of case (see `User.Meta.constraints`), so
+    # logins & natural key lookups ignore it too, through the same index.
+    def get_by_natural_key(self, email):
+        return self.for_email(email).get(email__ciexact=email)
+
+    async def aget_by_natural_key(self, email):
+        return await self.for_email(email).aget(email__ciexact=email)
+
+    def for_email(self, email):
+        """The users of the shard `email` belongs to (see `core.shards`)."""
+        return self.get_queryset().using(self._db or shards.db_for_email(email))
+
+    def bulk_import(
+        self, rows, batch_size=1000, workers=None, method=None, numbered=False,
+    ):
+        """
+        Create users from `rows` (an iterable of dicts with `email`, `name` &
+        `password`; a missing password makes it unusable) & return a
+        `core.bulk.ImportResult`. Rows are reported by their position in
+        `rows`, or with `numbered` given as `(line, row)` pairs (e.g. the
+        line numbers in a file).
+        Invalid rows (including ones that aren't dicts, or whose fields aren't
+        strings) & emails already taken (or repeated in `rows`) are skipped
+        & reported. Passwords are hashed on `workers` processes
+        (see `core.bulk.hashing_pool()`) while the previous batch is written,
+        with Postgres `COPY` (`method='copy'`, the default there) or
+        `bulk_create()` (`method='bulk'`). No signals are sent.
+        """
+        if method is None:
+            method = 'copy' if connections[self.write_db].vendor == 'postgresql' else 'bulk'
+        result = bulk.ImportResult()
+        seen = set()
+        rows = self._import_candidates(rows if numbered else enumerate(rows, 1), result)
+        pending = None
+
+        with bulk.hashing_pool(workers) as pool:
+            while batch := list(islice(rows, batch_size)):
+                batch = self._skip_duplicates(batch, seen, result)
+                hashes = bulk.hash_passwords(pool, [password for _, _, password in batch])
+                if pending:
+                    self._import_batch(*pending, method, result)
+                pending = batch, hashes
+            if pending:
+                self._import_batch(*pending, method, result)
+        return result
+
+    def _import_candidates(self, rows, result):
+        """Yield `(line, user, raw password)` for the valid `(line, row)` pairs."""
+        for line, row in rows:
+            if not isinstance(row, dict):
+                result.errors.append((line, 'not an object'))
+                continue
+            wrong_types = [
+                field for field in self.IMPORT_FIELDS
+                if row.get(field) is not None and not isinstance(row[field], str)
+            ]
+            if wrong_types:
+                result.errors.append((line, '; '.join(
+                    f'{field}: not a string' for field in wrong_types
+                )))
+                continue
+            user = self.model(
+                email=self.normalize_email(row.get('email') or ''),
+                name=row.get('name') or '',
+            )
+            # Like `create_user()`, the name is optional.
+            exclude = ['password', 'last_login'] + ([] if user.name else ['name'])
+            try:
+                user.clean_fields(exclude=exclude)
+            except ValidationError as exc:
+                result.errors.append((line, '; '.join(
+                    f'{field}: {" ".join(messages)}'
+                    for field, messages in exc.message_dict.items()
+                )))
+                continue
+            yield line, user, row.get('password') or None
+
+    def _skip_duplicates(self, batch, seen, result):
+        """Drop (& report) the rows of `batch` with an email that's taken."""
+        taken = self.taken_emails(user.email for _, user, _ in batch)
+        kept = []
+        for line, user, password in batch:
+            email = user.email.lower()
+            if email in taken or email in seen:
+                result.duplicates.append((line, user.email))
+            else:
+                seen.add(email)
+                kept.append((line, user, password))
+        return kept
+
+    def _import_batch(self, batch, hashes, method, result):
+        users = []
+        for (_, user, _), encoded in zip(batch, hashes):
+            user.password = encoded
+            users.append(user)
+        conflicts = self.insert_users(users, method)
+        for index, (line, user, _) in enumerate(batch):
+            if index in conflicts:
+                result.duplicates.append((line, user.email))
+            else:
+                result.created += 1
+
+    def taken_emails(self, emails):
+        """
+        Return the (lowercased) `emails` some user already has, in one query
+        (per shard).
+        """
+        by_shard = defaultdict(set)
+        for email in emails:
+            by_shard[self._db or shards.db_for_email(email)].add(email.lower())
+        taken = set()
+        for using, group in by_shard.items():
+            taken.update(
+                self.db_manager(using).annotate(email_lower=Lower('email'))
+                .filter(email_lower__in=group)
+                .values_list('email_lower', flat=True)
+            )
+        return taken
+
+    def insert_users(self, users, method='bulk'):
+        """
+        Insert the (unsaved, hashed) `users` in one go (per shard), with
+        `bulk_create()` (which sets their pks) or Postgres `COPY`
+        (`method='copy'`, which doesn't unless sharded). Returns the indexes of
+        the users that weren't inserted because their email got taken since it
+        was checked.
+        """
+        if self._db is not None or not shards.enabled():
+            return self._insert_users(users, self.write_db, method)
+
+        by_shard = defaultdict(list)
+        for index, user in enumerate(users):
+            user.pk = shards.new_user_id(user.email)
+            by_shard[shards.db_for_user_id(user.pk)].append(index)
+        conflicts = set()
+        for using, indexes in by_shard.items():
+            failed = self._insert_users([users[index] for index in indexes], using, method)
+            conflicts.update(indexes[position] for position in failed)
+        return conflicts
+
+    def _insert_users(self, users, using, method):
+        manager = self.db_manager(using)
+        try:
+            with transaction.atomic(using=using):
+                if method == 'copy':
+                    bulk.copy_insert(users, using=using)
+                else:
+                    manager.bulk_create(users)
+            return set()
+        except IntegrityError:
+            pass
+        # Someone signed up with one of these emails since we checked;
+        # insert row by row to find out which.
+        conflicts = set()
+        for index, user in enumerate(users):
+            try:
+                with transaction.atomic(using=using):
+                    manager.bulk_create([user])
+            except IntegrityError:
+                conflicts.add(index)
+        return conflicts
+
     def create_superuser(self, email, password, **extra_fields):
         user = self.create_user(email, password, **extra_fields)
         # Give the generated user superuser credentials.
@@ -43,8 +254,85 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=50)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Part of every signed token (`user.tokens`); bumping it voids them all.
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by every save; the ETag of /api/user/me/ is derived from it.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Written in batches by `core.activity` (not by `save()`, so it leaves
+    # `updated_at` & the ETag alone).
+    last_seen = models.DateTimeField(null=True, blank=True, editable=False)
 
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            # Case-insensitive prefix search (`email__istartswith`, e.g. the admin).
+            PrefixSearchIndex(Upper('email'), name='core_user_email_prefix_idx'),
+            PrefixSearchIndex(Upper('name'), name='core_user_name_prefix_idx'),
+        ]
+        constraints = [
+            # Created concurrently on Postgres, see migration 0003.
+            models.UniqueConstraint(
+                Lower('email'),
+                name='core_user_email_ci_unique',
+                violation_error_message='User with this email already exists.',
+            ),
+        ]
+
     # Define the field used for authentication.
     USERNAME_FIELD = 'email'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember `is_active` as loaded, so `save()` can tell a deactivation.
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save the user; a password change or deactivation revokes their tokens."""
+        deactivated = not self.is_active and getattr(self, '_loaded_is_active', None)
+        # `auto_now` only applies to the fields being saved; always include it.
+        extra_fields = {'updated_at'}
+        # `_password` is only set by `set_password()` (hash upgrades clear it).
+        if self.pk is not None and (self._password is not None or deactivated):
+            self.token_version += 1
+            extra_fields.add('token_version')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *extra_fields}
+        if self.pk is None and shards.enabled():
+            # The pk says which shard the user is on (see `core.shards`).
+            self.pk = shards.new_user_id(self.email)
+            kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+        self._loaded_is_active = self.is_active
+
+    # Hashing goes through the bounded pool in `core.hashing`; this covers
+    # signup (`create_user`), login (`authenticate`) & password updates.
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return hashing.check_password(raw_password, self.password, setter)
+
+    async def aset_password(self, raw_password):
+        """See set_password()."""
+        self.password = await hashing.amake_password(raw_password)
+        self._password = raw_password
+
+    async def acheck_password(self, raw_password):
+        """See check_password()."""
+        async def setter(raw_password):
+            await self.aset_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=['password'])
+
+        return await hashing.acheck_password(raw_password, self.password, setter)
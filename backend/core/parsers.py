@@ -0,0 +1,38 @@
+"""
+API parsers: JSON through orjson & MessagePack (see `core.renderers`).
+"""
+
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from core.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+
+
+class ORJSONParser(parsers.JSONParser):
+    """`JSONParser` parsing with orjson; the stdlib one without it."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = parsers.get_encoding(parser_context or {})
+        # orjson only reads UTF-8.
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(parsers.BaseParser):
+    """Parse MessagePack (`Content-Type: application/msgpack`); needs `msgpack`."""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            # Map keys are strings (or numbers) like JSON's; arrays or maps as
+            # keys (unhashable) are refused rather than failing later.
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=True)
+        except (ValueError, TypeError) as exc:
+            # Unpacking errors are `ValueError`s; `TypeError` for what slips by.
+            raise ParseError('MessagePack parse error - %s' % str(exc))
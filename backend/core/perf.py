@@ -0,0 +1,85 @@
+"""
+Per-request performance timings.
+
+`PerformanceMiddleware` activates a `RequestTimings` for each request; code
+that wants its time broken out wraps the work in `timer(name)`. With no
+active request (or the middleware disabled) `timer()` is a no-op.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulated time (seconds) & call counts per name, plus the DB queries."""
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.queries = []  # (sql, seconds)
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def record_query(self, execute, sql, params, many, context):
+        """`connection.execute_wrapper()` hook timing every query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries.append((sql, elapsed))
+            self.add('db', elapsed)
+
+    def server_timing(self, total):
+        """Render the timings as a `Server-Timing` header value."""
+        metrics = [f'total;dur={1000 * total:.1f}']
+        for name, seconds in self.totals.items():
+            metrics.append(
+                f'{name};dur={1000 * seconds:.1f};desc="{self.counts[name]} calls"'
+            )
+        return ', '.join(metrics)
+
+
+def activate(timings):
+    """Make `timings` the current request's; returns a token for `deactivate()`."""
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request's `name` timing."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """Report a serializer's validation, save & output time as `serializer`."""
+
+    def is_valid(self, *args, **kwargs):
+        with timer('serializer'):
+            return super().is_valid(*args, **kwargs)
+
+    def save(self, **kwargs):
+        with timer('serializer'):
+            return super().save(**kwargs)
+
+    @property
+    def data(self):
+        with timer('serializer'):
+            return super().data
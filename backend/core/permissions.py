@@ -0,0 +1,263 @@
+"""
+Cross-request cache of the users' permission sets.
+
+Django keeps a user's permissions on the instance (`_perm_cache`), so every
+request pays two queries (`user_permissions` & groups) on its first
+`has_perm()`. `EmailBackend` keeps them in a per-process LRU instead, as a
+bitmask over a `PermissionIndex` (one bit per permission): a few bytes per
+user, & a warm `has_perm()` is a lookup & an `&`, without a query.
+
+The receivers below drop what a change makes stale:
+
+- a user's groups or permissions changed (`m2m_changed`, either side): them;
+- a group's permissions changed, or a group deleted: everyone;
+- a permission created or deleted: everyone, & the index is rebuilt;
+- a user saved or deleted (e.g. `is_superuser`): them.
+
+Other processes learn about it through the Django cache `ALIAS` (which the
+workers have to share, e.g. Redis/Memcached): dropping a user's entries (or
+everyone's) writes a new random version there, and an entry is only used
+while the versions it was loaded with are still the current ones. They're
+read before the permissions are, so a change made meanwhile isn't missed.
+"""
+
+import threading
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import LRUCache
+
+
+class PermissionIndex:
+    """The bit of every permission (`'app_label.codename'`)."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.bits = {name: bit for bit, name in enumerate(self.names)}
+
+    @staticmethod
+    def _permissions():
+        return Permission.objects.order_by('pk').values_list(
+            'content_type__app_label', 'codename',
+        )
+
+    @classmethod
+    def load(cls):
+        return cls(f'{app_label}.{codename}' for app_label, codename in cls._permissions())
+
+    @classmethod
+    async def aload(cls):
+        """See load()."""
+        return cls([
+            f'{app_label}.{codename}' async for app_label, codename in cls._permissions()
+        ])
+
+    def encode(self, perms):
+        """The mask of `perms`, or None if one of them isn't indexed."""
+        mask = 0
+        for name in perms:
+            bit = self.bits.get(name)
+            if bit is None:
+                return None
+            mask |= 1 << bit
+        return mask
+
+    def decode(self, mask):
+        return {name for bit, name in enumerate(self.names) if mask >> bit & 1}
+
+    def has(self, mask, name):
+        bit = self.bits.get(name)
+        return bit is not None and bool(mask >> bit & 1)
+
+
+class PermissionCache:
+    """
+    Per-process LRU of `user id -> (index, mask, versions)`; `versions` are
+    the user's & everyone's invalidation versions in the Django cache `alias`
+    when the permissions were loaded (see `versions()`).
+    """
+
+    prefix = 'permcache'
+
+    def __init__(self, max_size, ttl, alias):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        self.ttl = ttl
+        self.alias = alias
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def _shared(self):
+        return caches[self.alias]
+
+    def _version_keys(self, user_id):
+        """The keys of the user's & of everyone's invalidation versions."""
+        return [f'{self.prefix}:user:{user_id}', f'{self.prefix}:all']
+
+    def versions(self, user_id):
+        """
+        The current invalidation versions of the user `user_id`: what to pass
+        to `get()`, or to `set()` with the permissions loaded after it.
+        """
+        keys = self._version_keys(user_id)
+        found = self._shared.get_many(keys)
+        return tuple(found.get(key) for key in keys)
+
+    async def aversions(self, user_id):
+        """See versions()."""
+        keys = self._version_keys(user_id)
+        found = await self._shared.aget_many(keys)
+        return tuple(found.get(key) for key in keys)
+
+    def _bump(self, keys):
+        """New versions for `keys`: the entries loaded with the old ones are stale."""
+        # Outlives the entries loaded before it (they expire after `ttl`).
+        self._shared.set_many(dict.fromkeys(keys, uuid.uuid4().hex), timeout=2 * self.ttl)
+
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = PermissionIndex.load()
+        return self._index
+
+    async def aindex(self):
+        """See index()."""
+        if self._index is None:
+            index = await PermissionIndex.aload()
+            with self._lock:
+                if self._index is None:
+                    self._index = index
+        return self._index
+
+    def _get(self, user_id, versions):
+        entry = self._cache.get(user_id)
+        # Masks of a previous index don't mean anything anymore, & entries of
+        # older versions were dropped (maybe by another process).
+        if entry is None or entry[0] is not self._index or entry[2] != versions:
+            return None, None
+        return entry[:2]
+
+    def get(self, user_id, versions):
+        """The permission names of the user `user_id`, or None if not cached."""
+        index, mask = self._get(user_id, versions)
+        return None if index is None else index.decode(mask)
+
+    def has_perm(self, user_id, perm, versions):
+        """Whether the user `user_id` has `perm`, or None if not cached."""
+        index, mask = self._get(user_id, versions)
+        return None if index is None else index.has(mask, perm)
+
+    def set(self, user_id, perms, versions):
+        """Cache `perms`, loaded after reading `versions`."""
+        if not self._store(user_id, perms, versions, self.index()):
+            # A permission created since the index was built (e.g. by a
+            # migration in another process).
+            self.reset_index()
+            self._store(user_id, perms, versions, self.index())
+
+    async def aset(self, user_id, perms, versions):
+        """See set()."""
+        if not self._store(user_id, perms, versions, await self.aindex()):
+            self.reset_index()
+            self._store(user_id, perms, versions, await self.aindex())
+
+    def _store(self, user_id, perms, versions, index):
+        mask = index.encode(perms)
+        if mask is None:
+            return False
+        self._cache.set(user_id, (index, mask, versions))
+        return True
+
+    def invalidate(self, user_ids):
+        """Drop the entries of `user_ids`, in every process."""
+        user_ids = list(user_ids)
+        for user_id in user_ids:
+            self._cache.delete(user_id)
+        self._bump(self._version_keys(user_id)[0] for user_id in user_ids)
+
+    def clear(self):
+        """Drop every entry, in every process."""
+        self._cache.clear()
+        _, everyone = self._version_keys(None)
+        self._bump([everyone])
+
+    def reset_index(self):
+        """Rebuild the index (& so drop the entries) of this process."""
+        with self._lock:
+            self._index = None
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_permission_cache():
+    """Return the process-wide cache configured by `PERMISSION_CACHE`."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                conf = settings.PERMISSION_CACHE
+                _cache = PermissionCache(conf['MAX_SIZE'], conf['TTL'], conf['ALIAS'])
+    return _cache
+
+
+@receiver(setting_changed)
+def _reset_cache(*, setting, **kwargs):
+    global _cache
+    if setting == 'PERMISSION_CACHE':
+        _cache = None
+
+
+def _user_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        get_permission_cache().invalidate([instance.pk])
+    elif pk_set is not None:
+        # `group.user_set.add(...)`: `pk_set` are the users.
+        get_permission_cache().invalidate(pk_set)
+    else:
+        # `group.user_set.clear()`: no telling who was in it.
+        get_permission_cache().clear()
+
+
+m2m_changed.connect(_user_m2m_changed, sender=get_user_model().groups.through)
+m2m_changed.connect(_user_m2m_changed, sender=get_user_model().user_permissions.through)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        # Its members may be on any shard; they're few changes, drop them all.
+        get_permission_cache().clear()
+
+
+@receiver(post_delete, sender=Group)
+def _group_deleted(sender, **kwargs):
+    get_permission_cache().clear()
+
+
+@receiver([post_save, post_delete], sender=Permission)
+def _permission_changed(sender, **kwargs):
+    # The other processes rebuild theirs when they meet the new permission.
+    get_permission_cache().reset_index()
+    get_permission_cache().clear()
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def _user_changed(sender, instance, **kwargs):
+    # `is_active` & `is_superuser` change what they have.
+    get_permission_cache().invalidate([instance.pk])
@@ -0,0 +1,161 @@
+"""
+API renderers: JSON through orjson, MessagePack & streamable NDJSON/CSV.
+
+`ORJSONRenderer` renders the same bytes as DRF's `JSONRenderer` (datetimes,
+decimals, lazy strings... still go through DRF's encoder), several times
+faster. It falls back to the stdlib `JSONRenderer` when orjson isn't installed
+or can't produce the same output: indented or non-compact JSON, ASCII-only
+output (`UNICODE_JSON = False`) or values orjson rejects (e.g. ints > 64 bits).
+Unlike the stdlib one it renders NaN/Infinity as `null`.
+"""
+
+import csv
+import io
+from itertools import islice
+
+from django.http import HttpResponse
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional; without it JSON is rendered by the stdlib.
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional; `MessagePackRenderer` is only offered with it.
+    msgpack = None
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """`JSONRenderer` serializing with orjson (see the module docstring)."""
+    # Types orjson doesn't know (or renders differently) go to DRF's encoder.
+    OPTIONS = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=self.OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            # Let the stdlib encoder render it (or raise its usual error).
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same as DRF: escape U+2028/U+2029, so the JSON is valid JavaScript.
+        for char, escaped in ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029')):
+            if char in ret:
+                ret = ret.replace(char, escaped)
+        return ret
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Render MessagePack (`Accept: application/msgpack`); needs `msgpack`."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Datetimes, decimals... become the same strings as in JSON.
+        return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True)
+
+
+class StreamingRenderer(renderers.BaseRenderer):
+    """
+    Base of the renderers of rows (NDJSON, CSV). Besides `render()` (a list of
+    dicts) they can `stream()` a table: one bytes chunk per `batch_size` rows.
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = [data] if isinstance(data, dict) else list(data)
+        fields = list(rows[0]) if rows else []
+        return b''.join(
+            self.stream(fields, ([row.get(name) for name in fields] for row in rows))
+        )
+
+    def stream(self, fields, rows, batch_size=1000):
+        """Yield the rendering of `rows` (sequences of `fields` values) in chunks."""
+        rows = iter(rows)
+        header = self.render_header(fields)
+        if header:
+            yield header
+        while batch := list(islice(rows, batch_size)):
+            yield self.render_rows(fields, batch)
+
+    def render_header(self, fields):
+        return b''
+
+    def render_rows(self, fields, rows):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """Newline delimited JSON: one JSON object per row."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render_rows(self, fields, rows):
+        json = ORJSONRenderer()
+        return b''.join(json.render(dict(zip(fields, row))) + b'\n' for row in rows)
+
+
+class CSVRenderer(StreamingRenderer):
+    """
+    CSV with a header row; values are formatted as in the JSON output, except
+    that text a spreadsheet would take for a formula gets a leading `'`.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    encoder_class = JSONEncoder
+    # First characters that make a cell a formula (CSV injection).
+    formula_prefixes = ('=', '+', '-', '@', '\t', '\r')
+
+    @classmethod
+    def format_value(cls, value, encode):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, str):
+            return "'" + value if value.startswith(cls.formula_prefixes) else value
+        if isinstance(value, (int, float)):
+            return value
+        return encode(value)
+
+    def render_csv(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+    def render_header(self, fields):
+        return self.render_csv([fields])
+
+    def render_rows(self, fields, rows):
+        encode = self.encoder_class().default
+        return self.render_csv([[self.format_value(v, encode) for v in row] for row in rows])
+
+
+class JsonResponse(HttpResponse):
+    """Django's `JsonResponse` for views outside DRF, rendered by `ORJSONRenderer`."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', ORJSONRenderer.media_type)
+        super().__init__(ORJSONRenderer().render(data), **kwargs)
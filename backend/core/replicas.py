@@ -0,0 +1,182 @@
+"""
+Read replica routing.
+
+`ReplicaRoutingMiddleware` opens a `routing()` state for each request; while
+it's open `ReplicaRouter` sends the reads of safe-method requests to one of
+the `READ_REPLICAS` (the same one for the whole request) & everything else to
+the primary (`default`). The first write pins the rest of the request to the
+primary, so it reads what it just wrote. Outside of a request (commands,
+shell, migrations) the router stays out of the way.
+
+Later requests of a client that wrote read from the primary for
+`STICKY_SECONDS` too: browsers through a cookie, & the users the requests
+act for (`note_user()`, e.g. once their token is checked) through a key in
+the Django cache `ALIAS`, which the workers have to share (token clients
+rarely keep cookies).
+
+A replica that can't be connected to is skipped for `RETRY_SECONDS`; with
+none left, reads go to the primary.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('replica_routing', default=None)
+_next_replica = itertools.count()
+# Alias -> `time.monotonic()` until which the replica is skipped.
+_down_until = {}
+_down_lock = threading.Lock()
+
+
+class RoutingState:
+    """Where the reads of one request go."""
+
+    def __init__(self, pinned=False):
+        # Read from the primary (the request is a write, or the client wrote lately).
+        self.pinned = pinned
+        # The replica picked on the first read.
+        self.replica = None
+        # Something was written during the request.
+        self.wrote = False
+        # The user the request acts for (see `note_user()`).
+        self.user_id = None
+
+
+@contextmanager
+def routing(pinned=False):
+    """Route the reads of the block (a request) to a replica unless `pinned`."""
+    state = RoutingState(pinned)
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+def note_write():
+    """Pin the rest of the current request (if any) to the primary."""
+    state = _current.get()
+    if state is not None:
+        state.pinned = state.wrote = True
+
+
+def read_primary():
+    """
+    Send the rest of the current request's reads to the primary; returns
+    whether they were going to a replica.
+    """
+    state = _current.get()
+    if state is None or state.pinned:
+        return False
+    state.pinned = True
+    return True
+
+
+def _pins():
+    return caches[settings.READ_REPLICAS['ALIAS']]
+
+
+def _pin_key(user_id):
+    return f'replicas:pin:{user_id}'
+
+
+def note_user(user_id):
+    """
+    The current request acts for the user `user_id`: it reads from the
+    primary if they wrote lately, & pins them if it writes (`pin_user()`).
+    Returns whether the reads were moved from a replica to the primary (what
+    was read already may be stale).
+    """
+    state = _current.get()
+    if state is None:
+        return False
+    state.user_id = user_id
+    if state.pinned or not _pins().get(_pin_key(user_id)):
+        return False
+    return read_primary()
+
+
+async def anote_user(user_id):
+    """See note_user()."""
+    state = _current.get()
+    if state is None:
+        return False
+    state.user_id = user_id
+    if state.pinned or not await _pins().aget(_pin_key(user_id)):
+        return False
+    return read_primary()
+
+
+def pin_user(user_id):
+    """Send the reads of the requests acting for `user_id` to the primary for a while."""
+    _pins().set(_pin_key(user_id), True, timeout=settings.READ_REPLICAS['STICKY_SECONDS'])
+
+
+async def apin_user(user_id):
+    """See pin_user()."""
+    timeout = settings.READ_REPLICAS['STICKY_SECONDS']
+    await _pins().aset(_pin_key(user_id), True, timeout=timeout)
+
+
+def mark_down(alias):
+    """Skip the replica `alias` for `RETRY_SECONDS`."""
+    with _down_lock:
+        _down_until[alias] = time.monotonic() + settings.READ_REPLICAS['RETRY_SECONDS']
+
+
+def is_down(alias):
+    return _down_until.get(alias, 0) > time.monotonic()
+
+
+def choose_replica():
+    """Return the next reachable replica (round robin), or the primary if none is."""
+    aliases = settings.READ_REPLICAS['ALIASES']
+    for _ in range(len(aliases)):
+        alias = aliases[next(_next_replica) % len(aliases)]
+        if is_down(alias):
+            continue
+        try:
+            # Connects once; persistent connections make it a no-op afterwards.
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            logger.warning('Read replica %r is unreachable', alias, exc_info=True)
+            mark_down(alias)
+            continue
+        return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Reads to a replica within `routing()`, writes always to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None:
+            return None
+        if state.pinned:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = choose_replica()
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        # Even for instances read from a replica (Django would save them there).
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.READ_REPLICAS['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,212 @@
+"""
+Precomputed OpenAPI schema.
+
+drf-spectacular introspects every view & serializer each time the schema is
+requested. The schema only changes with the code (& a few settings), so we
+build it once per version (or load it from the file written by
+`manage.py generate_schema`), keep the rendered YAML/JSON (plain & gzipped) in
+memory and serve those with strong ETags.
+"""
+
+import gzip
+import hashlib
+import importlib.metadata
+import json
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views import View
+
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+logger = logging.getLogger(__name__)
+
+# Packages whose upgrades can change the generated schema.
+SCHEMA_PACKAGES = ('Django', 'djangorestframework', 'drf-spectacular')
+
+# Settings that change the generated schema (routes, media types, limits...).
+SCHEMA_SETTINGS = (
+    'API_BROWSABLE',
+    'API_MSGPACK',
+    'AUTH_TOKEN_MODE',
+    'REST_FRAMEWORK',
+    'ROOT_URLCONF',
+    'SPECTACULAR_SETTINGS',
+    'USER_API_ASYNC',
+    'USER_BATCH_MAX_SIZE',
+)
+
+
+def code_version():
+    """
+    Return the version the schema is tied to: `CODE_VERSION` when set (e.g. the
+    git commit baked into the image), otherwise a digest of the project's
+    Python sources & the schema-relevant package versions; followed by a
+    digest of the `SCHEMA_SETTINGS`, which may differ between deployments of
+    the same code.
+    """
+    return f'{settings.CODE_VERSION or sources_digest()}-{settings_digest()}'
+
+
+def settings_digest():
+    """A digest of the `SCHEMA_SETTINGS`."""
+    values = {name: getattr(settings, name, None) for name in SCHEMA_SETTINGS}
+    encoded = json.dumps(values, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def sources_digest():
+    """A digest of the project's Python sources & the `SCHEMA_PACKAGES` versions."""
+    digest = hashlib.sha256()
+    for package in SCHEMA_PACKAGES:
+        try:
+            digest.update(f'{package}={importlib.metadata.version(package)};'.encode())
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    for path in sorted(Path(settings.BASE_DIR).rglob('*.py')):
+        stat = path.stat()
+        digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    return digest.hexdigest()[:16]
+
+
+def generate_schema():
+    """Introspect the API & return the schema rendered as JSON bytes."""
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return OpenApiJsonRenderer().render(schema)
+
+
+class SchemaVariant:
+    """One rendering of the schema (YAML or JSON), with its gzipped copy & ETags."""
+
+    def __init__(self, content, content_type):
+        self.content = content
+        self.gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+        self.content_type = content_type
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+class SchemaCache:
+    """All the variants of the schema for one code version."""
+
+    def __init__(self, version, schema_json):
+        self.version = version
+        schema = json.loads(schema_json)
+        self.variants = {
+            'json': SchemaVariant(schema_json, OpenApiJsonRenderer.media_type),
+            'yaml': SchemaVariant(
+                OpenApiYamlRenderer().render(schema), OpenApiYamlRenderer.media_type,
+            ),
+        }
+
+    @classmethod
+    def load(cls, version):
+        """Use the schema file if it matches `version`, else generate (& save) it."""
+        path = Path(settings.SCHEMA_CACHE_FILE)
+        try:
+            stored = json.loads(path.read_text())
+            if stored['version'] == version:
+                return cls(version, stored['schema'].encode())
+        except (OSError, ValueError, KeyError):
+            pass
+
+        cache = cls(version, generate_schema())
+        cache.save(path)
+        return cache
+
+    def save(self, path):
+        """Write the schema file; a read-only filesystem only costs a regeneration."""
+        stored = {
+            'version': self.version,
+            'schema': self.variants['json'].content.decode(),
+        }
+        try:
+            Path(path).write_text(json.dumps(stored))
+        except OSError as exc:
+            logger.warning('Could not write the schema cache file %s: %s', path, exc)
+
+
+_schema_cache = None
+_schema_cache_lock = threading.Lock()
+
+
+def get_schema_cache():
+    """Return the in-memory schema, building it on first use."""
+    global _schema_cache
+    if _schema_cache is None:
+        with _schema_cache_lock:
+            if _schema_cache is None:
+                _schema_cache = SchemaCache.load(code_version())
+    return _schema_cache
+
+
+@receiver(setting_changed)
+def _reset_schema_cache(*, setting, **kwargs):
+    global _schema_cache
+    if setting in ('CODE_VERSION', 'SCHEMA_CACHE_FILE', *SCHEMA_SETTINGS):
+        _schema_cache = None
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an `Accept-Encoding` header value allows gzip: listed (or `*`
+    is, when gzip isn't) with a non-zero q-value.
+    """
+    qvalues = {}
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        qvalue = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        if coding:
+            qvalues[coding.lower()] = qvalue
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qvalues:
+            return qvalues[coding] > 0
+    return False
+
+
+class CachedSchemaView(View):
+    """
+    OpenApi3 schema for this API, served from memory.
+    - YAML (default): application/vnd.oai.openapi
+    - JSON (`?format=json` or an `Accept` mentioning json): application/vnd.oai.openapi+json
+    """
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format')
+        if fmt not in ('json', 'yaml'):
+            fmt = 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+        variant = get_schema_cache().variants[fmt]
+
+        use_gzip = accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        etag = variant.gzip_etag if use_gzip else variant.etag
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match == '*':
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                variant.gzipped if use_gzip else variant.content,
+                content_type=variant.content_type,
+            )
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        # Clients may cache, but must revalidate (cheap: a 304 has no body).
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        return response
@@ -0,0 +1,263 @@
+"""
+Hash sharding of users (& their auth tokens) across the `USER_SHARDS` databases.
+
+Every user belongs to one of 2**16 slots, from a hash of their normalized
+(lowercased) email. The slot is mapped to a shard with jump consistent hashing
+(Lamping & Veach), so going from N to N+1 shards only moves about 1/(N+1) of
+the users (`manage.py rebalance_user_shards`).
+
+So that lookups by id or by token don't need a directory, the slot is also
+part of everything that identifies a user:
+
+- primary keys are `slot << 47 | 47 random bits` (`new_user_id()`);
+- opaque token keys start with the slot in hex (`new_token_key()`).
+
+Lookups by email, id or token key pick the shard with `db_for_email()`,
+`db_for_user_id()` & `db_for_token_key()`; `ShardRouter` routes the queries that
+carry an instance (saves, deletes, related managers). With a single shard
+(the default) all of these return None & nothing changes: regular
+auto-increment ids, random token keys & the other routers decide.
+
+Every shard has the whole schema. A user's groups & permissions (the rows of
+`User.groups` & `User.user_permissions`) are on their shard, & so are the
+groups & permissions these point to: groups are managed on `default` & copied
+to every shard under the same pk (`sync_groups()`, on each change), so a
+group of `default` can be given to anyone (`user.groups.add(group)`, see
+`ShardRouter.allow_relation()`). Permissions are created on each shard by
+`migrate`; a user's own ones are taken from their shard
+(`Permission.objects.db_manager(user._state.db)`).
+
+Reads that don't start from a user, an email, an id or a token (listings)
+have to go to every shard: see `ShardedQuerySet`.
+"""
+
+import hashlib
+import heapq
+import itertools
+import secrets
+from collections import defaultdict
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core import replicas
+
+SLOT_BITS = 16
+ID_BITS = 47
+TOKEN_SLOT_CHARS = SLOT_BITS // 4
+
+
+def aliases():
+    """The databases users are sharded across (`default` first)."""
+    return settings.USER_SHARDS
+
+
+def enabled():
+    return len(settings.USER_SHARDS) > 1
+
+
+def jump_hash(key, buckets):
+    """Bucket (0 to `buckets` - 1) of the 64-bit `key`, by jump consistent hashing."""
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def email_slot(email):
+    digest = hashlib.blake2b(email.lower().encode(), digest_size=SLOT_BITS // 8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def id_slot(user_id):
+    return int(user_id) >> ID_BITS
+
+
+def token_slot(key):
+    """The slot at the start of a token key, or None if it hasn't got one."""
+    try:
+        return int(key[:TOKEN_SLOT_CHARS], 16)
+    except ValueError:
+        return None
+
+
+def shard_for_slot(slot):
+    shards = aliases()
+    return shards[jump_hash(slot, len(shards))]
+
+
+def db_for_email(email):
+    """The shard of the user with `email` (None without sharding)."""
+    return shard_for_slot(email_slot(email)) if enabled() else None
+
+
+def db_for_user_id(user_id):
+    """The shard of the user with the primary key `user_id` (None without sharding)."""
+    return shard_for_slot(id_slot(user_id)) if enabled() else None
+
+
+def db_for_token_key(key):
+    """The shard of the token `key` (None without sharding or for a malformed key)."""
+    if not enabled():
+        return None
+    slot = token_slot(key)
+    return None if slot is None else shard_for_slot(slot)
+
+
+def db_for_user(user):
+    """The shard `user` is on, or goes to (None without sharding)."""
+    if not enabled():
+        return None
+    if user._state.db is not None:
+        return user._state.db
+    if user.pk is not None:
+        return db_for_user_id(user.pk)
+    return db_for_email(user.email)
+
+
+def new_user_id(email):
+    """A primary key for a new user with `email`, carrying its slot."""
+    return email_slot(email) << ID_BITS | secrets.randbits(ID_BITS)
+
+
+def new_token_key(user_id):
+    """A token key for the user `user_id` carrying its slot (None without sharding)."""
+    if not enabled():
+        return None
+    # 40 hex characters, like DRF's keys.
+    random_part = secrets.token_hex(20)[TOKEN_SLOT_CHARS:]
+    return f'{id_slot(user_id):0{TOKEN_SLOT_CHARS}x}{random_part}'
+
+
+class ShardedQuerySet:
+    """
+    A queryset of model instances over every shard, for keyset pagination:
+    `order_by()` (one field) & `filter()` apply to each shard, & a slice
+    reads up to its end from every shard & merges the rows in order.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def order_by(self, *fields):
+        return ShardedQuerySet(self.queryset.order_by(*fields))
+
+    def filter(self, *args, **kwargs):
+        return ShardedQuerySet(self.queryset.filter(*args, **kwargs))
+
+    def __getitem__(self, k):
+        if not isinstance(k, slice) or k.stop is None or k.step is not None:
+            raise TypeError('ShardedQuerySet only supports bounded slices.')
+        order, = self.queryset.query.order_by
+        rows = heapq.merge(
+            *(self.queryset.using(alias)[:k.stop] for alias in aliases()),
+            key=attrgetter(order.lstrip('-')), reverse=order.startswith('-'),
+        )
+        return list(itertools.islice(rows, k.start, k.stop))
+
+
+def _permission_keys(using):
+    """Natural key (app label, model, codename) -> pk of the permissions on `using`."""
+    return {
+        tuple(key): pk for pk, *key in Permission.objects.using(using).values_list(
+            'pk', 'content_type__app_label', 'content_type__model', 'codename',
+        )
+    }
+
+
+def sync_groups(pks=None):
+    """
+    Copy the groups of `default` (those with `pks`, or all of them) to the
+    other shards, under the same pk & with the same permissions; drop the
+    copies of the groups `default` hasn't got (anymore).
+    """
+    groups = Group.objects.using(DEFAULT_DB_ALIAS)
+    memberships = Group.permissions.through.objects.using(DEFAULT_DB_ALIAS)
+    if pks is not None:
+        groups = groups.filter(pk__in=pks)
+        memberships = memberships.filter(group__in=pks)
+    names = dict(groups.values_list('pk', 'name'))
+    permissions = defaultdict(list)
+    for group_id, *key in memberships.values_list(
+        'group_id', 'permission__content_type__app_label',
+        'permission__content_type__model', 'permission__codename',
+    ):
+        permissions[group_id].append(tuple(key))
+
+    for alias in aliases():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        copies = Group.objects.using(alias)
+        keys = _permission_keys(alias)
+        with transaction.atomic(using=alias):
+            stale = copies if pks is None else copies.filter(pk__in=pks)
+            stale.exclude(pk__in=names).delete()
+            for pk, name in names.items():
+                group, _ = copies.update_or_create(pk=pk, defaults={'name': name})
+                group.permissions.set([keys[key] for key in permissions[pk] if key in keys])
+
+
+@receiver(post_save, sender=Group)
+def _group_saved(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and enabled():
+        sync_groups([instance.pk])
+
+
+@receiver(post_delete, sender=Group)
+def _group_deleted(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and enabled():
+        sync_groups([instance.pk])
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _group_permissions_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and enabled() and action.startswith('post_'):
+        # `permission.group_set.clear()`: no telling which groups had it.
+        sync_groups(pk_set if reverse else [instance.pk])
+
+
+class ShardRouter:
+    """
+    Route the queries on a user (or one of its tokens, groups & permissions)
+    to its shard, & the ones on a copy of a group to that copy's shard.
+    Queries without such an instance are left to the next router.
+    """
+
+    def _db_for_instance(self, hints):
+        if not enabled():
+            return None
+        from rest_framework.authtoken.models import Token
+
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            return db_for_user(instance)
+        if isinstance(instance, Token) and instance.user_id is not None:
+            return instance._state.db or db_for_user_id(instance.user_id)
+        if isinstance(instance, (Group, Permission)) and instance._state.db in aliases():
+            return instance._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_instance(hints)
+
+    def db_for_write(self, model, **hints):
+        db = self._db_for_instance(hints)
+        if db is not None:
+            replicas.note_write()
+        return db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # `user.groups.add(group)`: the group of `default` is on their shard too.
+        if (
+            enabled() and isinstance(obj1, Group) and obj1._state.db == DEFAULT_DB_ALIAS
+            and isinstance(obj2, get_user_model())
+        ):
+            return True
+        return None
@@ -0,0 +1,30 @@
+"""
+Test runner for the project.
+"""
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    `DiscoverRunner` with the rate limits turned off: the whole suite logs in
+    & signs up from one IP with the same few emails.
+    The throttle tests switch them back on with `override_settings`.
+    Last-seen tracking is off too (its flushing thread would write outside the
+    test transactions); its tests turn it on the same way.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        rates = dict.fromkeys(settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}))
+        self._no_throttling = override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+            ACTIVITY_TRACKING={**settings.ACTIVITY_TRACKING, 'ENABLED': False},
+        )
+        self._no_throttling.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._no_throttling.disable()
+        super().teardown_test_environment(**kwargs)
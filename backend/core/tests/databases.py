@@ -0,0 +1,41 @@
+"""
+Extra in-memory SQLite databases for the tests of multi-database routing.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def add_database(alias, name):
+    """Register an SQLite database as `alias`."""
+    connections.settings[alias] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+    connections.configure_settings(connections.settings)
+
+
+def remove_database(alias):
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+
+class ExtraDatabasesMixin:
+    """
+    Create the (migrated) `extra_databases` for the tests of a `TestCase`.
+    Added here rather than in `databases`: the test runner checks those before
+    any test runs, & only knows the configured ones.
+    """
+    extra_databases = []
+
+    @classmethod
+    def setUpClass(cls):
+        for alias in cls.extra_databases:
+            add_database(alias, ':memory:')
+            connections[alias].creation.create_test_db(verbosity=0, serialize=False)
+        cls.databases = {DEFAULT_DB_ALIAS, *cls.extra_databases}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.extra_databases:
+            connections[alias].creation.destroy_test_db(':memory:', verbosity=0)
+            remove_database(alias)
@@ -0,0 +1,171 @@
+"""
+Test suit for the buffered last-seen tracking.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import activity
+from core.activity import ActivityBuffer
+
+ENABLED = {**settings.ACTIVITY_TRACKING, 'ENABLED': True, 'FLUSH_INTERVAL': 0}
+WHEN = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+PASSWORD = 'Whatever!'
+
+
+class ActivityBufferTests(TestCase):
+    """Test the buffer coalesces activity into few writes."""
+
+    def setUp(self):
+        user_model = get_user_model()
+        self.users = [
+            user_model.objects.create_user(
+                email=f'user{i}@example.com', password=PASSWORD, name=f'User {i}',
+            )
+            for i in range(3)
+        ]
+        self.buffer = ActivityBuffer(flush_interval=0, max_users=100, resolution=60)
+
+    def last_seen(self, user):
+        user.refresh_from_db(fields=['last_seen'])
+        return user.last_seen
+
+    def test_coalesced_into_one_update(self):
+        for _ in range(5):
+            for user in self.users:
+                self.buffer.record(user.pk, WHEN)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), len(self.users))
+
+        for user in self.users:
+            self.assertEqual(self.last_seen(user), WHEN)
+        stats = self.buffer.stats()
+        self.assertEqual(stats['recorded'], 15)
+        self.assertEqual(stats['coalesced'], 12)
+        self.assertEqual(stats['updates'], 1)
+
+    def test_one_update_per_timestamp(self):
+        self.buffer.record(self.users[0].pk, WHEN)
+        self.buffer.record(self.users[1].pk, WHEN)
+        self.buffer.record(self.users[2].pk, WHEN + timedelta(minutes=1))
+
+        with self.assertNumQueries(2):
+            self.buffer.flush()
+
+    def test_written_users_not_written_again(self):
+        self.buffer.record(self.users[0].pk, WHEN)
+        self.buffer.flush()
+
+        self.buffer.record(self.users[0].pk, WHEN)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        # A later window is written.
+        self.buffer.record(self.users[0].pk, WHEN + timedelta(minutes=1))
+        self.buffer.flush()
+        self.assertEqual(self.last_seen(self.users[0]), WHEN + timedelta(minutes=1))
+
+    def test_never_goes_backwards(self):
+        user = self.users[0]
+        get_user_model().objects.filter(pk=user.pk).update(last_seen=WHEN)
+
+        self.buffer.record(user.pk, WHEN - timedelta(minutes=5))
+        self.buffer.flush()
+
+        self.assertEqual(self.last_seen(user), WHEN)
+
+    def test_flushed_when_full(self):
+        buffer = ActivityBuffer(flush_interval=0, max_users=2, resolution=60)
+        buffer.record(self.users[0].pk, WHEN)
+        self.assertIsNone(self.last_seen(self.users[0]))
+
+        buffer.record(self.users[1].pk, WHEN)
+
+        self.assertEqual(self.last_seen(self.users[0]), WHEN)
+        self.assertEqual(buffer.stats()['buffered'], 0)
+
+    def test_failed_flush_kept(self):
+        self.buffer.record(self.users[0].pk, WHEN)
+        failing = patch.object(
+            get_user_model().objects, 'using', side_effect=OperationalError('gone away'),
+        )
+        with failing, self.assertLogs('core.activity', 'WARNING'):
+            self.buffer.stop()
+
+        self.assertEqual(self.buffer.stats()['buffered'], 1)
+        self.buffer.flush()
+        self.assertEqual(self.last_seen(self.users[0]), WHEN)
+
+    def test_background_flush(self):
+        buffer = ActivityBuffer(flush_interval=60, max_users=1, resolution=60)
+        flushed = threading.Event()
+
+        with patch.object(buffer, 'flush', side_effect=lambda: flushed.set()):
+            # Full: wakes the thread rather than flushing on this one.
+            buffer.record(self.users[0].pk, WHEN)
+            self.assertTrue(flushed.wait(5))
+            self.assertIsNotNone(buffer._thread)
+            buffer.stop()
+
+        self.assertIsNone(buffer._thread)
+
+
+class ActivityMiddlewareTests(TestCase):
+    """Test requests are recorded in the buffer, not written right away."""
+
+    def setUp(self):
+        # Per test, so each one gets a new buffer.
+        tracking = override_settings(ACTIVITY_TRACKING=ENABLED)
+        tracking.enable()
+        self.addCleanup(tracking.disable)
+        self.payload = {'email': 'user@example.com', 'password': PASSWORD}
+        self.user = get_user_model().objects.create_user(**self.payload, name='Test User')
+
+    def test_authenticated_requests_buffered(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        for _ in range(3):
+            res = client.get(reverse('user:me'))
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_seen)
+        stats = activity.get_buffer().stats()
+        self.assertEqual((stats['recorded'], stats['buffered']), (3, 1))
+
+        activity.get_buffer().flush()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_seen)
+
+    def test_login_recorded(self):
+        res = APIClient().post(reverse('user:token'), self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(activity.get_buffer().stats()['buffered'], 1)
+
+    def test_anonymous_not_recorded(self):
+        APIClient().get(reverse('user:me'))
+
+        self.assertEqual(activity.get_buffer().stats()['recorded'], 0)
+
+    def test_profile_etag_unchanged(self):
+        """The batch update doesn't touch `updated_at`."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        etag = client.get(reverse('user:me'))['ETag']
+
+        activity.get_buffer().flush()
+
+        self.assertEqual(client.get(reverse('user:me'))['ETag'], etag)
@@ -2,8 +2,13 @@
 Test suit for the Django Admin modifications.
 """
 
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.db import connection
 from django.urls import reverse
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 
@@ -41,3 +46,111 @@ class AdminPanelTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+
+class UserChangelistTests(TestCase):
+    """Test the user changelist stays cheap on big tables."""
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='SuperUser!'
+        )
+        get_user_model().objects.bulk_create(
+            get_user_model()(email=f'user{i}@example.com', name=f'User {i}')
+            for i in range(5)
+        )
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+        self.url = reverse('admin:core_user_changelist')
+
+    def get_changelist(self, params=None):
+        """GET the changelist and return (response, executed SQL)."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.url, params)
+        return res, [query['sql'] for query in ctx.captured_queries]
+
+    @skipIf(connection.vendor != 'postgresql', 'Estimates come from Postgres statistics.')
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=0)
+    def test_estimated_count_above_threshold(self):
+        res, queries = self.get_changelist()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.context['cl'].paginator.estimated)
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql.upper()])
+        # Session, user, group filter choices, EXPLAIN & the page itself.
+        self.assertEqual(len(queries), 5)
+
+    def test_exact_count_below_threshold(self):
+        res, _ = self.get_changelist()
+
+        self.assertFalse(res.context['cl'].paginator.estimated)
+        self.assertEqual(res.context['cl'].result_count, 6)
+
+    def test_keyset_next_page(self):
+        users = list(get_user_model().objects.order_by('id'))
+        per_page = 2
+
+        with patch('core.admin.UserAdmin.list_per_page', per_page):
+            res, queries = self.get_changelist()
+            next_url = res.context['cl'].keyset_next_url
+            self.assertIn(f'id__gt={users[per_page - 1].pk}', next_url)
+
+            res, queries = self.get_changelist({'id__gt': users[per_page - 1].pk})
+
+        self.assertEqual(
+            list(res.context['cl'].result_list), users[per_page:2 * per_page]
+        )
+        self.assertFalse([sql for sql in queries if 'OFFSET' in sql.upper()])
+        self.assertContains(res, 'First')
+
+    def test_search_by_email_prefix(self):
+        res, _ = self.get_changelist({'q': 'USER3'})
+
+        self.assertContains(res, 'user3@example.com')
+        self.assertNotContains(res, 'user4@example.com')
+
+    def test_search_by_name_prefix(self):
+        res, _ = self.get_changelist({'q': '"user 1"'})
+
+        self.assertEqual(
+            [user.email for user in res.context['cl'].result_list], ['user1@example.com']
+        )
+
+
+class AdminFullStackTests(TestCase):
+    """Test the admin keeps the middleware the API skips (sessions, CSRF, ...)."""
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='SuperUser!'
+        )
+        self.client = Client(enforce_csrf_checks=True)
+
+    def login(self, with_csrf_token=True):
+        url = reverse('admin:login')
+        res = self.client.get(url)
+        self.assertEqual(res['X-Frame-Options'], 'DENY')
+        data = {'username': 'admin@example.com', 'password': 'SuperUser!'}
+        if with_csrf_token:
+            data['csrfmiddlewaretoken'] = self.client.cookies['csrftoken'].value
+        return self.client.post(url, data)
+
+    def test_login_needs_csrf_token(self):
+        res = self.login(with_csrf_token=False)
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_login_and_edit(self):
+        res = self.login()
+        self.assertEqual(res.status_code, 302)
+
+        url = reverse('admin:core_user_change', args=[self.admin_user.id])
+        res = self.client.post(url, {
+            'email': 'admin@example.com',
+            'is_active': 'on', 'is_staff': 'on', 'is_superuser': 'on',
+            'csrfmiddlewaretoken': self.client.cookies['csrftoken'].value,
+        }, follow=True)
+
+        self.assertEqual(res.status_code, 200)
+        # The success message went through the messages middleware.
+        self.assertTrue(list(res.context['messages']))
@@ -0,0 +1,132 @@
+"""
+Test suit for the bulk user import (`UserManager.bulk_import()`).
+"""
+
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+
+from core import bulk
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def make_rows(count, start=0):
+    return [
+        {'email': f'user{i}@example.com', 'name': f'User {i}', 'password': f'Pass-{i}!'}
+        for i in range(start, start + count)
+    ]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class BulkImportTests(TestCase):
+    """Test `bulk_import()` creates users & reports what it skipped."""
+
+    def bulk_import(self, rows, **kwargs):
+        kwargs.setdefault('workers', 0)
+        kwargs.setdefault('batch_size', 4)
+        return get_user_model().objects.bulk_import(iter(rows), **kwargs)
+
+    def test_creates_users(self):
+        result = self.bulk_import(make_rows(10))
+
+        self.assertEqual(result.created, 10)
+        user = get_user_model().objects.get(email='user7@example.com')
+        self.assertEqual(user.name, 'User 7')
+        self.assertTrue(user.check_password('Pass-7!'))
+        self.assertIsNotNone(user.updated_at)
+
+    def test_process_pool(self):
+        result = self.bulk_import(make_rows(10), workers=2)
+
+        self.assertEqual(result.created, 10)
+        user = get_user_model().objects.get(email='user3@example.com')
+        self.assertTrue(user.check_password('Pass-3!'))
+
+    def test_duplicates_reported_not_fatal(self):
+        get_user_model().objects.create_user(email='USER2@example.com', password='x')
+        rows = make_rows(5) + [{'email': 'User4@Example.com', 'password': 'again'}]
+
+        result = self.bulk_import(rows)
+
+        self.assertEqual(result.created, 4)
+        # Already in the DB (any case), then repeated in the file.
+        self.assertEqual(
+            result.duplicates, [(3, 'user2@example.com'), (6, 'User4@example.com')],
+        )
+        self.assertEqual(get_user_model().objects.count(), 5)
+
+    def test_invalid_rows_reported(self):
+        rows = [{'email': 'not-an-email', 'password': 'x'}, {'name': 'No Email'}]
+        rows += make_rows(1)
+
+        result = self.bulk_import(rows)
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [1, 2])
+        self.assertIn('email', result.errors[0][1])
+
+    def test_malformed_rows_reported(self):
+        rows = [['user@example.com'], {'email': 'user@example.com', 'password': 1}]
+        rows += make_rows(1)
+
+        result = self.bulk_import(rows)
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(1, 'not an object'), (2, 'password: not a string')])
+
+    def test_numbered_rows(self):
+        rows = [(7, {'email': 'bad'}), (9, make_rows(1)[0])]
+
+        result = self.bulk_import(rows, numbered=True)
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [7])
+
+    def test_missing_password_unusable(self):
+        self.bulk_import([{'email': 'user@example.com'}])
+
+        self.assertFalse(get_user_model().objects.get().has_usable_password())
+
+    def test_race_falls_back_to_single_rows(self):
+        """A conflict at insert time only skips the conflicting row."""
+        manager = get_user_model().objects
+        skip_duplicates = manager._skip_duplicates
+
+        def racing_skip_duplicates(*args):
+            kept = skip_duplicates(*args)
+            # Somebody signs up with one of the emails right after the check.
+            manager.create_user(email='user1@example.com', password='x')
+            return kept
+
+        with patch.object(manager, '_skip_duplicates', side_effect=racing_skip_duplicates):
+            result = self.bulk_import(make_rows(3), method='bulk')
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.duplicates, [(2, 'user1@example.com')])
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is Postgres only')
+    def test_copy(self):
+        rows = make_rows(5) + [{'email': 'tab@example.com', 'name': 'Tab\there \\ back'}]
+
+        result = self.bulk_import(rows, method='copy')
+
+        self.assertEqual(result.created, 6)
+        user = get_user_model().objects.get(email='tab@example.com')
+        self.assertEqual(user.name, 'Tab\there \\ back')
+        self.assertTrue(user.is_active)
+        self.assertIsNone(user.last_login)
+        self.assertTrue(
+            get_user_model().objects.get(email='user0@example.com').check_password('Pass-0!')
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is Postgres only')
+    def test_copy_conflict_raises(self):
+        get_user_model().objects.create_user(email='user0@example.com', password='x')
+        user = get_user_model()(email='USER0@example.com', password='x')
+
+        with self.assertRaises(IntegrityError):
+            bulk.copy_insert([user])
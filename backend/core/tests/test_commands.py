@@ -2,11 +2,12 @@
 Test suit for custom Django management commands.
 """
 
+from io import StringIO
 from unittest.mock import patch
 
-from psycopg2 import OperationalError as Psycopg2OpErr
-
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
 from django.test import SimpleTestCase
 
@@ -28,10 +29,95 @@ class MgmtCmdTest(SimpleTestCase):
         """Test wit_for_db when getting operational error (db not ready yet)."""
         # The 6th time we call the db, we get True (i.e, db is ready)
         # Before that it raises various exceptions.
-        patched_check.side_effect = [Psycopg2OpErr] * 2 + [OperationalError] * 3 + [True]
+        # The driver's own (e.g. psycopg2's) & Django's.
+        driver_error = connection.Database.OperationalError
+        patched_check.side_effect = [driver_error] * 2 + [OperationalError] * 3 + [True]
 
         call_command('wait_for_db')
 
         self.assertEqual(patched_check.call_count, 6)
 
         patched_check.assert_called_with(databases=['default'])
+
+
+class FakeClock:
+    """Stands in for the `time` module: `sleep()` just advances `monotonic()`."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@patch('core.management.commands.wait_for_db.Command.check')
+class WaitForDbReadinessTests(SimpleTestCase):
+    """Test how fast (and how long) wait_for_db waits."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch('core.management.commands.wait_for_db.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, *args):
+        out = StringIO()
+        call_command('wait_for_db', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ready_on_first_check_no_wait(self, patched_check):
+        """A database that is already up costs no waiting at all."""
+        patched_check.return_value = True
+
+        out = self.call()
+
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertIn('(0ms)', out)
+
+    def test_time_to_ready_exponential_backoff(self, patched_check):
+        """Retries start in milliseconds & double; ready right after the first success."""
+        patched_check.side_effect = [OperationalError] * 4 + [True]
+
+        out = self.call()
+
+        self.assertEqual(self.clock.sleeps, [0.05, 0.1, 0.2, 0.4])
+        self.assertIn('(750ms)', out)
+
+    def test_backoff_capped(self, patched_check):
+        patched_check.side_effect = [OperationalError] * 7 + [True]
+
+        self.call('--max-delay', '0.5')
+
+        self.assertEqual(self.clock.sleeps, [0.05, 0.1, 0.2, 0.4, 0.5, 0.5, 0.5])
+
+    def test_timeout_gives_up(self, patched_check):
+        """The command fails instead of looping forever."""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            self.call('--timeout', '3')
+
+        self.assertAlmostEqual(sum(self.clock.sleeps), 3)
+
+    @patch('core.management.commands.wait_for_db.Command.unapplied_migrations')
+    def test_wait_for_migrations(self, patched_unapplied, patched_check):
+        patched_check.return_value = True
+        patched_unapplied.side_effect = [2, 1, 0]
+
+        self.call('--check-migrations')
+
+        self.assertEqual(patched_unapplied.call_count, 3)
+        self.assertEqual(self.clock.sleeps, [0.05, 0.1])
+
+    @patch('core.management.commands.wait_for_db.warm_pool', return_value=3)
+    def test_warm_pool(self, patched_warm_pool, patched_check):
+        patched_check.return_value = True
+
+        self.call('--warm', '3')
+
+        patched_warm_pool.assert_called_once_with('default', 3, 60)
@@ -0,0 +1,111 @@
+"""
+Test suit for the database connection settings & stats.
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db import connection_stats, connections_opened
+from user.authentication import get_token_cache
+
+
+class ConnectionReuseTests(SimpleTestCase):
+    """Test persistent connections survive the request cycle."""
+    databases = {'default'}
+
+    def setUp(self):
+        self.conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.close()
+
+    def tearDown(self):
+        connection.settings_dict['CONN_MAX_AGE'] = self.conn_max_age
+        connection.close()
+
+    def serve_requests(self, count):
+        """
+        Run `count` request cycles that each hit the DB and return how many
+        connections got opened. The request signals are what close (or keep)
+        connections between requests.
+        """
+        opened = connections_opened()
+        for _ in range(count):
+            request_started.send(sender=self.__class__)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            request_finished.send(sender=self.__class__)
+        return connections_opened() - opened
+
+    def test_persistent_connection_reused(self):
+        connection.settings_dict['CONN_MAX_AGE'] = 60
+
+        self.assertEqual(self.serve_requests(5), 1)
+
+    def test_no_max_age_reconnects_every_request(self):
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+
+        self.assertEqual(self.serve_requests(5), 5)
+
+    def test_connection_stats(self):
+        stats = connection_stats()
+
+        self.assertIn('default', stats)
+        self.assertEqual(stats['default']['vendor'], connection.vendor)
+        self.assertIn('connections_opened', stats['default'])
+
+
+class DatabaseStatsViewTests(TestCase):
+    """Test the DB stats endpoint is for staff only."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('db-stats')
+
+    def test_staff_can_see_stats(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='SuperUser!'
+        )
+        self.client.force_authenticate(user=admin)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('default', res.data)
+
+    def test_regular_user_forbidden(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!'
+        )
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(AUTH_TOKEN_TTL=3600)
+    def test_expired_token_refused(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='SuperUser!'
+        )
+        token = Token.objects.create(user=admin)
+        get_token_cache().clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        Token.objects.filter(pk=token.pk).update(
+            created=timezone.now() - timedelta(hours=2)
+        )
+        get_token_cache().clear()
+
+        for url in (self.url, reverse('hashing-stats')):
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,242 @@
+"""
+Test suit for the password hashing pool.
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashing
+
+
+POOLED = {'MAX_WORKERS': 1, 'MAX_PENDING': 0}
+INLINE = {'MAX_WORKERS': 0, 'MAX_PENDING': 0}
+QUEUED = {'MAX_WORKERS': 1, 'MAX_PENDING': 1, 'QUEUE_TIMEOUT': 60}
+
+
+@override_settings(PASSWORD_HASHING=POOLED)
+class HashingExecutorTests(SimpleTestCase):
+    """Test the executor itself."""
+
+    def test_hash_runs_on_pool(self):
+        """Hashing happens on a pool thread, not the calling one."""
+        threads = []
+
+        def fake_make_password(raw_password):
+            threads.append(threading.current_thread().name)
+            return 'hashed'
+
+        with patch('django.contrib.auth.hashers.make_password', fake_make_password):
+            self.assertEqual(hashing.make_password('Whatever!'), 'hashed')
+
+        self.assertTrue(threads[0].startswith('hashing'))
+
+    def test_check_password(self):
+        encoded = hashing.make_password('Whatever!')
+
+        self.assertTrue(hashing.check_password('Whatever!', encoded))
+        self.assertFalse(hashing.check_password('WrongPass!', encoded))
+
+    def test_saturated_pool_raises(self):
+        """With every slot taken new work is refused instead of queued."""
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_job():
+            started.set()
+            release.wait()
+
+        busy = threading.Thread(target=hashing.get_executor().run, args=(blocking_job,))
+        busy.start()
+        try:
+            started.wait()
+            with self.assertRaises(hashing.HashingPoolSaturated):
+                hashing.make_password('Whatever!')
+        finally:
+            release.set()
+            busy.join()
+
+    @override_settings(PASSWORD_HASHING={**QUEUED, 'QUEUE_TIMEOUT': 0.05})
+    def test_queued_past_deadline_shed(self):
+        """A hash still waiting for a worker after `QUEUE_TIMEOUT` is dropped."""
+        executor = hashing.get_executor()
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_job():
+            started.set()
+            release.wait()
+
+        busy = executor.submit(blocking_job)
+        started.wait()
+        queued = executor.submit(lambda: 'hashed')
+        self.assertEqual(executor.stats()['queue_depth'], 1)
+        time.sleep(0.1)
+        release.set()
+
+        with self.assertRaises(hashing.HashingPoolSaturated):
+            queued.result()
+        busy.result()
+        stats = executor.stats()
+        self.assertEqual(stats['shed_expired'], 1)
+        self.assertEqual(stats['max_queue_depth'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    @override_settings(PASSWORD_HASHING={**QUEUED, 'QUEUE_TIMEOUT': 0.05})
+    def test_waiting_caller_shed_at_deadline(self):
+        """The caller is shed at the deadline, not when a worker gets to its hash."""
+        executor = hashing.get_executor()
+        release = threading.Event()
+        busy = executor.submit(release.wait)
+        # Shouldn't be needed: the caller gives up long before.
+        threading.Timer(5, release.set).start()
+        try:
+            start = time.monotonic()
+            with self.assertRaises(hashing.HashingPoolSaturated):
+                executor.run(lambda: 'hashed')
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertEqual(executor.stats()['in_flight'], 1)
+        finally:
+            release.set()
+            busy.result()
+        self.assertEqual(executor.stats()['shed_expired'], 1)
+        self.assertEqual(executor.stats()['completed'], 1)
+
+    @override_settings(PASSWORD_HASHING={**QUEUED, 'QUEUE_TIMEOUT': 0.05})
+    async def test_async_caller_shed_at_deadline(self):
+        executor = hashing.get_executor()
+        release = threading.Event()
+        busy = executor.submit(release.wait)
+        threading.Timer(5, release.set).start()
+        try:
+            start = time.monotonic()
+            with self.assertRaises(hashing.HashingPoolSaturated):
+                await executor.arun(lambda: 'hashed')
+            self.assertLess(time.monotonic() - start, 5)
+        finally:
+            release.set()
+            busy.result()
+        self.assertEqual(executor.stats()['shed_expired'], 1)
+
+    @override_settings(PASSWORD_HASHING={**QUEUED, 'QUEUE_TIMEOUT': 0.05})
+    def test_started_hash_waited_for(self):
+        """A hash that started in time isn't dropped when it ends past the deadline."""
+        result = hashing.get_executor().run(lambda: time.sleep(0.1) or 'hashed')
+
+        self.assertEqual(result, 'hashed')
+
+    @override_settings(PASSWORD_HASHING=QUEUED)
+    def test_queued_within_deadline_runs(self):
+        executor = hashing.get_executor()
+        release = threading.Event()
+
+        busy = executor.submit(release.wait)
+        queued = executor.submit(lambda: 'hashed')
+        release.set()
+
+        self.assertEqual(queued.result(), 'hashed')
+        busy.result()
+        self.assertEqual(executor.stats()['completed'], 2)
+
+    def test_stats_count_shed_requests(self):
+        executor = hashing.get_executor()
+        shed = executor.stats()['shed_full']
+        release = threading.Event()
+        busy = executor.submit(release.wait)
+        try:
+            with self.assertRaises(hashing.HashingPoolSaturated) as raised:
+                executor.submit(lambda: 'hashed')
+        finally:
+            release.set()
+            busy.result()
+
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(executor.stats()['shed_full'], shed + 1)
+
+    @override_settings(PASSWORD_HASHING={'MAX_WORKERS': 2, 'MAX_PENDING': 0})
+    def test_make_passwords_stays_within_workers(self):
+        """A batch bigger than the pool & its queue is hashed without shedding."""
+        passwords = [f'Pass-{i}!' for i in range(7)]
+
+        encoded = hashing.make_passwords(passwords)
+
+        self.assertEqual(len(encoded), 7)
+        self.assertTrue(hashing.check_password('Pass-5!', encoded[5]))
+        self.assertEqual(hashing.get_executor().stats()['shed_full'], 0)
+
+    @override_settings(PASSWORD_HASHING=INLINE)
+    def test_disabled_pool_runs_inline(self):
+        self.assertIsNone(hashing.get_executor())
+        encoded = hashing.make_password('Whatever!')
+        self.assertTrue(hashing.check_password('Whatever!', encoded))
+
+
+class HashingBackpressureTests(TestCase):
+    """Test the user API answers 503 when the pool is saturated."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {
+            'email': 'user@example.com',
+            'password': 'Whatever!',
+            'name': 'user-test',
+        }
+
+    @patch('core.hashing._run', side_effect=hashing.HashingPoolSaturated)
+    def test_create_user_saturated(self, patched_run):
+        res = self.client.post(reverse('user:create'), self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_token_saturated(self):
+        get_user_model().objects.create_user(**self.payload)
+
+        with patch('core.hashing._run', side_effect=hashing.HashingPoolSaturated):
+            res = self.client.post(reverse('user:token'), self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertNotIn('token', res.data)
+
+    def test_retry_after_header(self):
+        get_user_model().objects.create_user(**self.payload)
+
+        with patch('core.hashing._run', side_effect=hashing.HashingPoolSaturated(3)):
+            res = self.client.post(reverse('user:token'), self.payload)
+
+        self.assertEqual(res['Retry-After'], '3')
+
+
+@override_settings(PASSWORD_HASHING=POOLED)
+class HashingStatsViewTests(TestCase):
+    """Test the hashing pool stats endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('hashing-stats')
+
+    def test_staff_can_see_stats(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='SuperUser!'
+        )
+        self.client.force_authenticate(user=admin)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['pooled'])
+        self.assertIn('queue_depth', res.data)
+        self.assertIn('shed_full', res.data)
+
+    def test_regular_user_forbidden(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!'
+        )
+        self.client.force_authenticate(user=user)
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
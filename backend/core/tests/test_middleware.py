@@ -0,0 +1,173 @@
+"""
+Test suit for the project middleware.
+"""
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.base import BaseHandler
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import activity, replicas
+from core.middleware import (
+    ActivityMiddleware,
+    PerformanceMiddleware,
+    ReplicaRoutingMiddleware,
+    is_lean,
+)
+
+
+ENABLED = {'ENABLED': True, 'SLOW_REQUEST_MS': 10_000}
+DISABLED = {'ENABLED': False, 'SLOW_REQUEST_MS': 10_000}
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Test the per-request instrumentation."""
+
+    def setUp(self):
+        self.payload = {
+            'email': 'user@example.com',
+            'password': 'Whatever!',
+            'name': 'Test User',
+        }
+        self.user = get_user_model().objects.create_user(**self.payload)
+
+    def get_profile(self):
+        # A new client per request, so the middleware stack reflects the settings.
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        return client.get(reverse('user:me'))
+
+    def test_disabled_no_header(self):
+        with override_settings(PERF_INSTRUMENTATION=DISABLED):
+            res = self.get_profile()
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_server_timing_header(self):
+        with override_settings(PERF_INSTRUMENTATION=ENABLED):
+            res = APIClient().post(reverse('user:token'), self.payload)
+
+        timing = res['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'hash;dur=', 'serializer;dur='):
+            self.assertIn(metric, timing)
+
+    def test_response_body_unchanged(self):
+        """Instrumentation only adds a header; the payload is byte-for-byte the same."""
+        with override_settings(PERF_INSTRUMENTATION=DISABLED):
+            plain = self.get_profile()
+        with override_settings(PERF_INSTRUMENTATION=ENABLED):
+            timed = self.get_profile()
+
+        self.assertEqual(plain.status_code, timed.status_code)
+        self.assertEqual(plain.content, timed.content)
+
+    def test_slow_request_logged_with_queries(self):
+        slow = {'ENABLED': True, 'SLOW_REQUEST_MS': 0}
+        with override_settings(PERF_INSTRUMENTATION=slow), \
+                self.assertLogs('core.perf', level='WARNING') as logs:
+            APIClient().post(reverse('user:token'), self.payload)
+
+        self.assertIn('user:token', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+@override_settings(
+    PERF_INSTRUMENTATION=ENABLED,
+    READ_REPLICAS={**settings.READ_REPLICAS, 'ALIASES': ['replica1']},
+    ACTIVITY_TRACKING={**settings.ACTIVITY_TRACKING, 'ENABLED': True, 'FLUSH_INTERVAL': 0},
+)
+class AsyncMiddlewareTests(TestCase):
+    """Test the project middleware run as coroutines under ASGI."""
+
+    @override_settings(DEBUG=True)
+    def test_async_stack_not_adapted(self):
+        """No middleware makes Django wrap the async views in a thread."""
+        # (Django logs the adaptations it makes with DEBUG on.)
+        handler = BaseHandler()
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            handler.load_middleware(is_async=True)
+
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    async def test_async_requests(self):
+        user = await get_user_model().objects.acreate(email='user@example.com', name='User')
+
+        async def view(request):
+            request.user = await get_user_model().objects.aget(pk=user.pk)
+            replicas.note_write()
+            return HttpResponse()
+
+        stack = PerformanceMiddleware(ReplicaRoutingMiddleware(ActivityMiddleware(view)))
+        self.assertTrue(iscoroutinefunction(stack))
+
+        res = await stack(AsyncRequestFactory().post('/'))
+
+        self.assertIn('db;dur=', res['Server-Timing'])
+        self.assertIn(settings.READ_REPLICAS['PIN_COOKIE'], res.cookies)
+        self.assertEqual(activity.get_buffer().stats()['buffered'], 1)
+
+
+class LeanMiddlewareTests(TestCase):
+    """Test API requests skip the browser-only middleware."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!', name='Test User', is_staff=True,
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def get_profile(self):
+        # A new client per request, so the middleware stack reflects the settings.
+        return APIClient().get(reverse('user:me'), HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_is_lean(self):
+        factory = RequestFactory()
+        self.assertTrue(is_lean(factory.get('/api/user/me/')))
+        self.assertFalse(is_lean(factory.get('/admin/')))
+        self.assertFalse(is_lean(factory.get(reverse('api-docs'))))
+        with_session = factory.get('/api/user/')
+        with_session.COOKIES[settings.SESSION_COOKIE_NAME] = 'key'
+        self.assertFalse(is_lean(with_session))
+
+    def test_api_request_skips_middleware(self):
+        res = self.get_profile()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertFalse(hasattr(res.wsgi_request, 'session'))
+        self.assertNotIn('X-Frame-Options', res)
+
+    def test_docs_not_frameable(self):
+        """The docs are a page, even for a client without a session."""
+        res = APIClient().get(reverse('api-docs'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Frame-Options'], 'DENY')
+
+    def test_full_stack_when_disabled(self):
+        with override_settings(LEAN_MIDDLEWARE_PATHS=[]):
+            res = self.get_profile()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(hasattr(res.wsgi_request, 'session'))
+        self.assertEqual(res['X-Frame-Options'], 'DENY')
+
+    def test_session_authentication_still_works(self):
+        """A logged-in browser (session cookie) gets the full stack."""
+        client = APIClient(enforce_csrf_checks=True)
+        client.force_login(self.user)
+
+        res = client.get(reverse('user:list'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('X-Frame-Options', res)
+
+        # DRF's session authentication still wants the CSRF token.
+        res = client.patch(reverse('user:me'), {'name': 'New name'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -2,6 +2,9 @@
 Test suit for the project models.
 """
 
+from unittest import skipIf
+
+from django.db import IntegrityError, connection
 from django.test import TestCase
 
 from django.contrib.auth import get_user_model
@@ -49,3 +52,42 @@ class ModelTests(TestCase):
         )
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
+
+    def test_email_unique_regardless_of_case(self):
+        get_user_model().objects.create_user(email='user@example.com', password='Whatever!')
+
+        with self.assertRaises(IntegrityError):
+            get_user_model().objects.create_user(
+                email='USER@example.com', password='Whatever!'
+            )
+
+    def test_natural_key_lookup_ignores_case(self):
+        user = get_user_model().objects.create_user(
+            email='User@example.com', password='Whatever!'
+        )
+
+        found = get_user_model().objects.get_by_natural_key('uSER@EXAMPLE.COM')
+        self.assertEqual(found, user)
+
+    @skipIf(connection.vendor != 'postgresql', 'Checks a Postgres query plan.')
+    def test_email_lookup_uses_index(self):
+        with connection.cursor() as cursor:
+            # The table is tiny; make the planner show whether it *can* use the index.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = get_user_model().objects.filter(email__ciexact='User@Example.com').explain()
+
+        self.assertIn('core_user_email_ci_unique', plan)
+
+    def test_password_change_bumps_token_version(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!'
+        )
+        user.name = 'New Name'
+        user.save()
+        self.assertEqual(user.token_version, 0)
+
+        user.set_password('AnotherPass!')
+        user.save(update_fields=['password'])
+        user.refresh_from_db()
+
+        self.assertEqual(user.token_version, 1)
@@ -0,0 +1,194 @@
+"""
+Test suit for the cross-request permission cache.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+
+from core.permissions import PermissionCache, PermissionIndex, get_permission_cache
+
+VIEW_USER = 'core.view_user'
+CHANGE_USER = 'core.change_user'
+
+
+CONF = {'MAX_SIZE': 100, 'TTL': 300, 'ALIAS': 'default'}
+
+
+@override_settings(PERMISSION_CACHE=CONF)
+class PermissionCacheTests(TestCase):
+    """Test warm permission checks skip the DB & changes are picked up."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!', name='Staff', is_staff=True,
+        )
+        self.group = Group.objects.create(name='Editors')
+        self.view_user = Permission.objects.get_by_natural_key('view_user', 'core', 'user')
+        self.change_user = Permission.objects.get_by_natural_key(
+            'change_user', 'core', 'user',
+        )
+
+    def fresh_user(self):
+        """The user as the next request would load it (no per-instance cache)."""
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_warm_checks_skip_db(self):
+        self.user.user_permissions.add(self.view_user)
+        self.group.permissions.add(self.change_user)
+        self.user.groups.add(self.group)
+        get_permission_cache().index()
+        user = self.fresh_user()
+        # Cold: the user's & their groups' permissions.
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm(VIEW_USER))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm(VIEW_USER))
+            self.assertTrue(user.has_perm(CHANGE_USER))
+            self.assertFalse(user.has_perm('core.delete_user'))
+            self.assertTrue(user.has_module_perms('core'))
+            self.assertEqual(user.get_all_permissions(), {VIEW_USER, CHANGE_USER})
+
+    async def test_async_checks_use_cache(self):
+        await self.user.user_permissions.aadd(self.view_user)
+        user = await get_user_model().objects.aget(pk=self.user.pk)
+        self.assertTrue(await user.ahas_perm(VIEW_USER))
+
+        user = await get_user_model().objects.aget(pk=self.user.pk)
+        hits = get_permission_cache().stats()['hits']
+        self.assertEqual(await user.aget_all_permissions(), {VIEW_USER})
+        self.assertEqual(get_permission_cache().stats()['hits'], hits + 1)
+
+    def test_user_permissions_changed(self):
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+        self.user.user_permissions.add(self.view_user)
+        self.assertTrue(self.fresh_user().has_perm(VIEW_USER))
+
+        self.view_user.user_set.remove(self.user)
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+    def test_groups_changed(self):
+        self.group.permissions.add(self.view_user)
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+        self.user.groups.add(self.group)
+        self.assertTrue(self.fresh_user().has_perm(VIEW_USER))
+
+        self.group.user_set.clear()
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+        self.group.user_set.add(self.user)
+        self.assertTrue(self.fresh_user().has_perm(VIEW_USER))
+
+    def test_group_permissions_changed(self):
+        self.user.groups.add(self.group)
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+        self.group.permissions.add(self.view_user)
+        self.assertTrue(self.fresh_user().has_perm(VIEW_USER))
+
+        self.group.permissions.remove(self.view_user)
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+        self.group.permissions.add(self.view_user)
+        self.assertTrue(self.fresh_user().has_perm(VIEW_USER))
+        self.group.delete()
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+    def test_user_saved(self):
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertEqual(
+            len(self.fresh_user().get_all_permissions()), Permission.objects.count(),
+        )
+
+        self.user.is_superuser = False
+        self.user.user_permissions.add(self.view_user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+    def test_new_permission(self):
+        self.assertEqual(self.fresh_user().get_all_permissions(), set())
+        content_type = ContentType.objects.get_for_model(get_user_model())
+        permission = Permission.objects.create(
+            codename='export_user', name='Can export users', content_type=content_type,
+        )
+
+        self.user.user_permissions.add(permission)
+
+        self.assertTrue(self.fresh_user().has_perm('core.export_user'))
+
+    def test_compact_representation(self):
+        self.user.user_permissions.add(self.view_user, self.change_user)
+        self.fresh_user().has_perm(VIEW_USER)
+
+        cache = get_permission_cache()
+        index, mask = cache._get(self.user.pk, cache.versions(self.user.pk))
+        self.assertIsInstance(mask, int)
+        self.assertEqual(bin(mask).count('1'), 2)
+        self.assertEqual(index.decode(mask), {VIEW_USER, CHANGE_USER})
+
+    def other_process(self):
+        """A cache like another worker's: its own entries, the same shared versions."""
+        return PermissionCache(CONF['MAX_SIZE'], CONF['TTL'], CONF['ALIAS'])
+
+    def test_revoked_in_other_process(self):
+        self.user.user_permissions.add(self.view_user)
+        self.assertTrue(self.fresh_user().has_perm(VIEW_USER))
+
+        # What its receivers do when it revokes them.
+        self.user.user_permissions.through.objects.filter(user=self.user).delete()
+        self.other_process().invalidate([self.user.pk])
+
+        self.assertFalse(self.fresh_user().has_perm(VIEW_USER))
+
+    def test_cleared_in_other_process(self):
+        self.user.user_permissions.add(self.view_user)
+        self.fresh_user().has_perm(VIEW_USER)
+
+        self.other_process().clear()
+
+        # Loaded again, not taken from this process's entry.
+        user = self.fresh_user()
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm(VIEW_USER))
+
+    def test_change_while_loading(self):
+        """Permissions loaded while they change aren't cached as current."""
+        cache = get_permission_cache()
+        versions = cache.versions(self.user.pk)
+        # Loaded (here: made up) before the change...
+        perms = {VIEW_USER}
+        self.other_process().invalidate([self.user.pk])
+        # ...& stored after it.
+        cache.set(self.user.pk, perms, versions)
+
+        self.assertIsNone(cache.get(self.user.pk, cache.versions(self.user.pk)))
+
+
+class PermissionIndexTests(TestCase):
+    """Test the permission <-> bit mapping."""
+
+    def test_round_trip(self):
+        index = PermissionIndex(['a.x', 'a.y', 'b.z'])
+        mask = index.encode({'a.x', 'b.z'})
+
+        self.assertEqual(mask, 0b101)
+        self.assertEqual(index.decode(mask), {'a.x', 'b.z'})
+        self.assertTrue(index.has(mask, 'b.z'))
+        self.assertFalse(index.has(mask, 'a.y'))
+        self.assertFalse(index.has(mask, 'c.unknown'))
+        self.assertIsNone(index.encode({'c.unknown'}))
+
+    def test_load(self):
+        index = PermissionIndex.load()
+
+        self.assertEqual(len(index.names), Permission.objects.count())
+        self.assertIn(VIEW_USER, index.bits)
@@ -0,0 +1,167 @@
+"""
+Test suit for the orjson & MessagePack renderers/parsers.
+"""
+
+import io
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import renderers
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+PAYLOAD = {
+    'id': 1,
+    'email': 'user@example.com',
+    'name': 'Zoë \u2028 line',  # U+2028 gets escaped.
+    'joined': datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc),
+    'balance': Decimal('1.50'),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'label': _('Name'),
+    'tags': ('a', 'b'),
+    'nested': [{'n': None, 'ok': True, 'ratio': 0.5}],
+}
+
+
+@skipIf(renderers.orjson is None, 'orjson is not installed')
+class ORJSONRendererTests(SimpleTestCase):
+    """Test `ORJSONRenderer` renders exactly what DRF's `JSONRenderer` does."""
+
+    def test_same_output_as_drf(self):
+        self.assertEqual(ORJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+
+    def test_indent_falls_back(self):
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOAD, media_type),
+            JSONRenderer().render(PAYLOAD, media_type),
+        )
+
+    def test_huge_int_falls_back(self):
+        data = {'big': 2 ** 70}
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_without_orjson(self):
+        with patch('core.renderers.orjson', None), patch('core.parsers.orjson', None):
+            body = ORJSONRenderer().render(PAYLOAD)
+            parsed = ORJSONParser().parse(io.BytesIO(body))
+
+        self.assertEqual(body, JSONRenderer().render(PAYLOAD))
+        self.assertEqual(parsed['email'], 'user@example.com')
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """Test `ORJSONParser`."""
+
+    def test_round_trip(self):
+        body = ORJSONRenderer().render(PAYLOAD)
+
+        data = ORJSONParser().parse(io.BytesIO(body))
+
+        self.assertEqual(data['name'], PAYLOAD['name'])
+        self.assertEqual(data['joined'], '2024-01-02T03:04:05.678000Z')
+
+    def test_invalid_json(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"email": '))
+
+    def test_other_encoding(self):
+        body = '{"name": "Zoë"}'.encode('latin-1')
+
+        data = ORJSONParser().parse(
+            io.BytesIO(body), parser_context={'encoding': 'latin-1'},
+        )
+
+        self.assertEqual(data['name'], 'Zoë')
+
+
+@skipUnless(renderers.msgpack, 'msgpack is not installed')
+class MessagePackTests(TestCase):
+    """Test MessagePack rendering, parsing & negotiation."""
+
+    def test_round_trip(self):
+        body = MessagePackRenderer().render(PAYLOAD)
+
+        data = MessagePackParser().parse(io.BytesIO(body))
+
+        self.assertEqual(data['joined'], '2024-01-02T03:04:05.678000Z')
+        self.assertEqual(data['tags'], ['a', 'b'])
+
+    def test_invalid_body(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+    def test_unhashable_map_key(self):
+        # {[]: 1} & {{}: 1}
+        for body in (b'\x81\x90\x01', b'\x81\x80\x01'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                MessagePackParser().parse(io.BytesIO(body))
+
+    def test_type_error_is_parse_error(self):
+        """What msgpack < 1.0 (or `strict_map_key=False`) raises for those keys."""
+        unpackb = patch.object(
+            renderers.msgpack, 'unpackb', side_effect=TypeError("unhashable type: 'list'"),
+        )
+        with unpackb, self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\x81\x90\x01'))
+
+    def test_unhashable_map_key_bad_request(self):
+        res = APIClient().post(
+            reverse('user:token'), b'\x81\x90\x01', content_type='application/msgpack',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_negotiated_by_accept(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!', name='Test Name',
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(reverse('user:me'), HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        body = MessagePackParser().parse(io.BytesIO(res.content))
+        self.assertEqual(body['email'], 'user@example.com')
+
+
+class JSONNegotiationTests(TestCase):
+    """Test the API still speaks JSON through the new renderer & parser."""
+
+    def test_json_body(self):
+        res = APIClient().post(
+            reverse('user:create'),
+            {'email': 'user@example.com', 'password': 'Whatever!', 'name': 'Zoë'},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.json()['name'], 'Zoë')
+
+    def test_malformed_json(self):
+        res = APIClient().post(
+            reverse('user:create'), b'{"email": ', content_type='application/json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
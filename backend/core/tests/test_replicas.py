@@ -0,0 +1,138 @@
+"""
+Test suit for the read replica routing, with a second SQLite database
+standing in for the replica.
+"""
+
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import replicas
+from core.tests.databases import ExtraDatabasesMixin
+from user.authentication import get_token_cache
+
+REPLICA = 'replica'
+REPLICAS = {**settings.READ_REPLICAS, 'ALIASES': [REPLICA]}
+LIST_URL = reverse('user:list')
+ME_URL = reverse('user:me')
+
+
+@override_settings(READ_REPLICAS=REPLICAS)
+class ReplicaRoutingTests(ExtraDatabasesMixin, TestCase):
+    """Test reads go to the replica, except for clients that just wrote."""
+
+    extra_databases = [REPLICA]
+
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.staff = user_model.objects.create_user(
+            email='staff@example.com', password='Whatever!', name='Staff', is_staff=True,
+        )
+        # Not replicated yet.
+        user_model.objects.create(email='primary@example.com', name='Primary')
+        user_model.objects.using(REPLICA).create(email='replica@example.com', name='Replica')
+
+    def setUp(self):
+        self.addCleanup(replicas._down_until.clear)
+        # The users pinned by earlier tests.
+        caches[REPLICAS['ALIAS']].clear()
+        get_token_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+    def listed(self):
+        res = self.client.get(LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [user['email'] for user in res.data['results']]
+
+    def test_safe_request_reads_replica(self):
+        self.assertEqual(self.listed(), ['replica@example.com'])
+        self.assertNotIn(REPLICAS['PIN_COOKIE'], self.client.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        res = self.client.patch(ME_URL, {'name': 'New name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        cookie = res.cookies[REPLICAS['PIN_COOKIE']]
+        self.assertEqual(cookie['max-age'], REPLICAS['STICKY_SECONDS'])
+        # Reads its own write.
+        self.assertIn('primary@example.com', self.listed())
+
+        # Once the cookie has expired, back to the replica.
+        del self.client.cookies[REPLICAS['PIN_COOKIE']]
+        self.assertEqual(self.listed(), ['replica@example.com'])
+
+    def token_client(self, token):
+        """A client like most token ones: it doesn't keep cookies."""
+        return APIClient(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_new_token_found_on_primary(self):
+        """A token the replica hasn't got yet (just issued) still authenticates."""
+        token = Token.objects.create(user=self.staff)
+
+        res = self.token_client(token).get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'staff@example.com')
+
+    def test_write_pins_user_to_primary(self):
+        """Without the cookie, the user who wrote still reads their write."""
+        token = Token.objects.create(user=self.staff)
+        # The replica has them & their token, as they were before the write.
+        user_model = get_user_model()
+        user_model.objects.using(REPLICA).filter(pk=self.staff.pk).delete()
+        user_model.objects.using(REPLICA).bulk_create([user_model(
+            pk=self.staff.pk, email=self.staff.email, name='Old name', is_staff=True,
+        )])
+        Token.objects.using(REPLICA).bulk_create([Token(key=token.key, user=self.staff)])
+
+        res = self.token_client(token).patch(ME_URL, {'name': 'New name'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.token_client(token).get(ME_URL)
+        self.assertEqual(res.data['name'], 'New name')
+
+        # Once the pin has expired, back to the replica.
+        caches[REPLICAS['ALIAS']].clear()
+        get_token_cache().clear()
+        res = self.token_client(token).get(ME_URL)
+        self.assertEqual(res.data['name'], 'Old name')
+
+    def test_write_pins_rest_of_request(self):
+        user_model = get_user_model()
+        with replicas.routing() as state:
+            self.assertEqual(user_model.objects.all().db, REPLICA)
+            user = user_model.objects.get(email='replica@example.com')
+            # Instances read from the replica are saved to the primary.
+            self.assertEqual(router.db_for_write(user_model, instance=user), DEFAULT_DB_ALIAS)
+            self.assertTrue(state.wrote)
+            self.assertEqual(user_model.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_no_routing_outside_requests(self):
+        self.assertEqual(get_user_model().objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_unreachable_replica(self):
+        """The primary answers until the replica is retried."""
+        unreachable = patch.object(
+            connections[REPLICA], 'ensure_connection',
+            side_effect=OperationalError('could not connect to server'),
+        )
+        with unreachable, self.assertLogs('core.replicas', 'WARNING'):
+            self.assertIn('primary@example.com', self.listed())
+        self.assertTrue(replicas.is_down(REPLICA))
+
+        # Left alone for `RETRY_SECONDS`.
+        self.assertIn('primary@example.com', self.listed())
+        with self.settings(READ_REPLICAS={**REPLICAS, 'RETRY_SECONDS': 0}):
+            replicas.mark_down(REPLICA)
+            self.assertEqual(self.listed(), ['replica@example.com'])
@@ -0,0 +1,129 @@
+"""
+Test suit for the precomputed OpenAPI schema.
+"""
+
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+
+
+class CachedSchemaViewTests(SimpleTestCase):
+    """Test the schema is built once & served with ETags/gzip."""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.schema_file = Path(tmp_dir.name) / 'schema.json'
+        settings_patcher = override_settings(
+            CODE_VERSION='v1', SCHEMA_CACHE_FILE=self.schema_file,
+        )
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        self.url = reverse('api-schema')
+
+    def test_schema_yaml_default(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/vnd.oai.openapi')
+        self.assertIn(b'/api/user/me/', res.content)
+        self.assertTrue(res['ETag'].startswith('"'))
+
+    def test_schema_json(self):
+        res = self.client.get(self.url, {'format': 'json'})
+
+        self.assertIn('/api/user/me/', json.loads(res.content)['paths'])
+
+    def test_generated_once(self):
+        """Repeated requests are served from memory without introspection."""
+        with patch('core.schema.generate_schema', wraps=schema.generate_schema) as generate:
+            for _ in range(3):
+                self.client.get(self.url)
+
+        self.assertEqual(generate.call_count, 1)
+
+    def test_if_none_match_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_gzip_variant(self):
+        plain = self.client.get(self.url)
+        res = self.client.get(self.url, headers={'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_loaded_from_file_for_same_version(self):
+        """A schema file for the running version is reused after a restart."""
+        self.client.get(self.url)
+        schema._schema_cache = None  # Simulate a new process.
+
+        with patch('core.schema.generate_schema') as generate:
+            res = self.client.get(self.url)
+
+        generate.assert_not_called()
+        self.assertEqual(res.status_code, 200)
+
+    def test_regenerated_when_version_changes(self):
+        self.client.get(self.url)
+
+        generate_patcher = patch('core.schema.generate_schema', wraps=schema.generate_schema)
+        with override_settings(CODE_VERSION='v2'), generate_patcher as generate:
+            self.client.get(self.url)
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertTrue(json.loads(self.schema_file.read_text())['version'].startswith('v2-'))
+
+    def test_regenerated_when_settings_change(self):
+        """The file of the same code built with other settings isn't reused."""
+        self.client.get(self.url)
+
+        generate_patcher = patch('core.schema.generate_schema', wraps=schema.generate_schema)
+        with override_settings(API_MSGPACK=False), generate_patcher as generate:
+            self.client.get(self.url)
+            schema._schema_cache = None  # Simulate a new process.
+            self.client.get(self.url)
+
+        self.assertEqual(generate.call_count, 1)
+
+    def test_gzip_refused(self):
+        for accept_encoding in ('gzip;q=0', 'gzip; q=0.0, deflate', '*;q=0', 'br', ''):
+            with self.subTest(accept_encoding=accept_encoding):
+                res = self.client.get(self.url, headers={'Accept-Encoding': accept_encoding})
+
+                self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_gzip_qvalues(self):
+        for accept_encoding in ('gzip;q=0.5', 'br, *', 'GZIP', 'gzip;q=1, *;q=0'):
+            with self.subTest(accept_encoding=accept_encoding):
+                res = self.client.get(self.url, headers={'Accept-Encoding': accept_encoding})
+
+                self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    def test_settings_digest(self):
+        digest = schema.settings_digest()
+
+        with override_settings(USER_API_ASYNC=not settings.USER_API_ASYNC):
+            self.assertNotEqual(schema.settings_digest(), digest)
+        with override_settings(CODE_VERSION='v2'):
+            self.assertEqual(schema.settings_digest(), digest)
+
+    def test_docs_page(self):
+        res = self.client.get(reverse('api-docs'))
+
+        self.assertEqual(res.status_code, 200)
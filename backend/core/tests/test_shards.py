@@ -0,0 +1,304 @@
+"""
+Test suit for the sharding of users, with in-memory SQLite databases
+standing in for the shards.
+"""
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import shards
+from core.tests.databases import ExtraDatabasesMixin
+from user.authentication import get_token_cache, get_user_cache
+
+SHARDS = [DEFAULT_DB_ALIAS, 'shard1', 'shard2']
+PASSWORD = 'Whatever!'
+
+
+def email_on(shard, name):
+    """An email address of the user `name` that belongs on `shard`."""
+    for i in range(1000):
+        email = f'{name}-{i}@example.com'
+        if shards.db_for_email(email) == shard:
+            return email
+    raise AssertionError(f'No email found for {shard}')
+
+
+class JumpHashTests(SimpleTestCase):
+    """Test the slot -> shard mapping."""
+
+    def test_buckets_in_range_and_stable(self):
+        buckets = [shards.jump_hash(key, 5) for key in range(1000)]
+
+        self.assertEqual(set(buckets), set(range(5)))
+        self.assertEqual(buckets, [shards.jump_hash(key, 5) for key in range(1000)])
+        self.assertEqual(shards.jump_hash(12345, 1), 0)
+
+    def test_new_bucket_moves_few_keys(self):
+        """Going from 3 to 4 buckets moves about a 1/4 of the keys, all to the new one."""
+        slots = range(1 << shards.SLOT_BITS)
+        moved = [
+            slot for slot in slots if shards.jump_hash(slot, 3) != shards.jump_hash(slot, 4)
+        ]
+
+        self.assertAlmostEqual(len(moved) / len(slots), 1 / 4, delta=0.02)
+        self.assertEqual({shards.jump_hash(slot, 4) for slot in moved}, {3})
+
+    def test_no_sharding_by_default(self):
+        self.assertFalse(shards.enabled())
+        self.assertIsNone(shards.db_for_email('user@example.com'))
+        self.assertIsNone(shards.new_token_key(1))
+
+
+@override_settings(USER_SHARDS=SHARDS)
+class ShardedUserTests(ExtraDatabasesMixin, TestCase):
+    """Test users & their tokens are stored & found on their shard."""
+
+    extra_databases = SHARDS[1:]
+
+    def setUp(self):
+        get_token_cache().clear()
+        get_user_cache().clear()
+        self.email = email_on('shard2', 'user')
+        self.user = get_user_model().objects.create_user(
+            email=self.email, password=PASSWORD, name='Test User',
+        )
+
+    def test_user_on_its_shard(self):
+        self.assertEqual(self.user._state.db, 'shard2')
+        self.assertEqual(shards.id_slot(self.user.pk), shards.email_slot(self.email))
+        self.assertFalse(get_user_model().objects.filter(email=self.email).exists())
+        self.assertTrue(
+            get_user_model().objects.using('shard2').filter(pk=self.user.pk).exists()
+        )
+
+    def test_natural_key_lookup(self):
+        user = get_user_model().objects.get_by_natural_key(self.email.upper())
+
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_bulk_insert_splits_by_shard(self):
+        user_model = get_user_model()
+        users = [
+            user_model(email=email_on(shard, 'bulk'), name='Bulk', password='!')
+            for shard in SHARDS
+        ]
+
+        self.assertEqual(user_model.objects.insert_users(users), set())
+        for shard, user in zip(SHARDS, users):
+            self.assertTrue(user_model.objects.using(shard).filter(pk=user.pk).exists())
+
+    def test_token_login_and_auth(self):
+        res = APIClient().post(
+            reverse('user:token'), {'email': self.email, 'password': PASSWORD},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        key = res.data['token']
+        self.assertEqual(shards.db_for_token_key(key), 'shard2')
+        self.assertTrue(Token.objects.using('shard2').filter(key=key).exists())
+
+        res = APIClient().get(reverse('user:me'), HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.email)
+
+    @override_settings(AUTH_TOKEN_MODE='signed')
+    def test_signed_token_auth(self):
+        res = APIClient().post(
+            reverse('user:token'), {'email': self.email, 'password': PASSWORD},
+        )
+        access = res.data['access']
+
+        res = APIClient().get(reverse('user:me'), HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.email)
+
+    def test_email_unique_on_shard(self):
+        res = APIClient().post(reverse('user:create'), {
+            'email': self.email.upper(), 'password': PASSWORD, 'name': 'Copy',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['email'][0].code, 'unique')
+
+    def test_email_change_to_other_slot_refused(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        other_slot = next(
+            email for email in (f'new-{i}@example.com' for i in range(100))
+            if shards.email_slot(email) != shards.email_slot(self.email)
+        )
+
+        res = client.patch(reverse('user:me'), {'email': other_slot})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['email'][0].code, 'shard')
+
+        # Only the case changes: same slot.
+        res = client.patch(reverse('user:me'), {'email': self.email.upper()})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_default_group_given_to_user(self):
+        """Groups are managed on `default` & copied to the shards, with their permissions."""
+        group = Group.objects.create(name='Editors')
+        group.permissions.add(Permission.objects.get(codename='view_user'))
+
+        self.user.groups.add(group)
+
+        copy = Group.objects.using('shard2').get(pk=group.pk)
+        self.assertEqual(copy.name, 'Editors')
+        self.assertEqual([group.pk for group in self.user.groups.all()], [group.pk])
+        user = get_user_model().objects.get_by_natural_key(self.email)
+        self.assertTrue(user.has_perm('core.view_user'))
+
+        group.permissions.clear()
+        user = get_user_model().objects.get_by_natural_key(self.email)
+        self.assertFalse(user.has_perm('core.view_user'))
+
+        group.delete()
+        self.assertFalse(Group.objects.using('shard2').exists())
+        self.assertFalse(self.user.groups.exists())
+
+    def test_group_of_other_database_refused_for_user(self):
+        group = Group.objects.create(name='Editors')
+        copy = Group.objects.using('shard1').get(pk=group.pk)
+
+        with self.assertRaises(ValueError):
+            self.user.groups.add(copy)
+
+
+@override_settings(USER_SHARDS=SHARDS)
+class ShardedListingTests(ExtraDatabasesMixin, TestCase):
+    """Test the staff listings read the users of every shard."""
+
+    extra_databases = SHARDS[1:]
+
+    def setUp(self):
+        user_model = get_user_model()
+        self.admin = user_model.objects.create_superuser(
+            email=email_on(DEFAULT_DB_ALIAS, 'admin'), password=PASSWORD,
+        )
+        self.users = [self.admin] + [
+            user_model.objects.create_user(
+                email=email_on(shard, f'user{i}'), password=PASSWORD, name=f'User {i}',
+            )
+            for i in range(3) for shard in SHARDS
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_directory_pages_through_every_shard(self):
+        ids, url = [], reverse('user:list') + '?page_size=3'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [user['id'] for user in res.data['results']]
+            url = res.data['next']
+
+        self.assertEqual(ids, sorted(user.pk for user in self.users))
+
+        # And back.
+        res = self.client.get(res.data['previous'])
+        self.assertEqual(
+            [user['id'] for user in res.data['results']], ids[-4:-1],
+        )
+
+    def test_export_every_shard(self):
+        out = StringIO()
+        call_command('export_users', '--format=csv', '--fields=email', stdout=out)
+
+        emails = out.getvalue().split()[1:]
+        self.assertCountEqual(emails, [user.email for user in self.users])
+
+    def test_admin_finds_user_on_shard(self):
+        user = self.users[-1]
+        self.assertEqual(user._state.db, 'shard2')
+        self.client.force_login(self.admin)
+
+        res = self.client.get(reverse('admin:core_user_change', args=[user.pk]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertContains(res, user.email)
+
+        changelist = reverse('admin:core_user_changelist')
+        res = self.client.get(changelist, {'shard': 'shard2'})
+        self.assertContains(res, reverse('admin:core_user_change', args=[user.pk]))
+        self.assertNotContains(res, reverse('admin:core_user_change', args=[self.admin.pk]))
+
+        res = self.client.get(changelist, {'shard': 'nope'})
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+
+
+class RebalanceTests(ExtraDatabasesMixin, TestCase):
+    """Test `rebalance_user_shards` after adding a shard."""
+
+    extra_databases = SHARDS[1:]
+
+    def rebalance(self, *args):
+        out = StringIO()
+        call_command('rebalance_user_shards', *args, stdout=out)
+        return out.getvalue()
+
+    def test_rebalance(self):
+        user_model = get_user_model()
+        # From before sharding: a regular id, a token that doesn't carry its slot.
+        legacy = user_model.objects.create_user(
+            email='legacy@example.com', password=PASSWORD, name='Legacy',
+        )
+        Token.objects.create(user=legacy)
+
+        with self.settings(USER_SHARDS=SHARDS[:2]):
+            users = [
+                user_model.objects.create_user(
+                    email=f'user-{i}@example.com', password=PASSWORD, name=f'User {i}',
+                )
+                for i in range(20)
+            ]
+        with self.settings(USER_SHARDS=SHARDS):
+            misplaced = [
+                user for user in users if user._state.db != shards.db_for_user_id(user.pk)
+            ]
+            self.assertTrue(misplaced)
+            group = Group.objects.create(name='Editors')
+            misplaced[0].groups.add(group)
+            key = Token.objects.db_manager(misplaced[0]._state.db).create(
+                user=misplaced[0], key=shards.new_token_key(misplaced[0].pk),
+            ).key
+
+            out = self.rebalance('--dry-run')
+            self.assertIn(f'Moved {len(misplaced)} user(s), re-keyed 1 user(s).', out)
+            self.assertEqual(user_model.objects.using('shard2').count(), 0)
+
+            out = self.rebalance()
+            self.assertIn(f'Moved {len(misplaced)} user(s), re-keyed 1 user(s).', out)
+            for user in [*users, legacy]:
+                moved = user_model.objects.get_by_natural_key(user.email)
+                self.assertEqual(moved._state.db, shards.db_for_user_id(moved.pk))
+                self.assertEqual(
+                    sum(user_model.objects.using(shard).filter(email=user.email).count()
+                        for shard in SHARDS),
+                    1,
+                )
+            moved = user_model.objects.get_by_natural_key(misplaced[0].email)
+            self.assertEqual(moved.pk, misplaced[0].pk)
+            self.assertEqual([group.name for group in moved.groups.all()], ['Editors'])
+            self.assertTrue(
+                Token.objects.using(shards.db_for_token_key(key)).filter(key=key).exists()
+            )
+            # Legacy users get a pk with their slot, & no token.
+            rekeyed = user_model.objects.get_by_natural_key(legacy.email)
+            self.assertEqual(shards.id_slot(rekeyed.pk), shards.email_slot(legacy.email))
+            self.assertFalse(
+                Token.objects.using(rekeyed._state.db).filter(user=rekeyed).exists()
+            )
+            self.assertFalse(Token.objects.filter(user_id=legacy.pk).exists())
+
+            # Nothing left to do.
+            self.assertIn('Moved 0 user(s), re-keyed 0 user(s).', self.rebalance())
@@ -0,0 +1,206 @@
+"""
+Test suit for the sliding window throttles & their counter stores.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from rest_framework.test import APIRequestFactory
+
+from core.throttling import (
+    CacheCounterStore,
+    IPThrottle,
+    LocalCounterStore,
+    SharedMemoryCounterStore,
+    get_counter_store,
+)
+
+
+class CounterStoreTestsMixin:
+    """Tests every store has to pass; subclasses set `self.store`."""
+
+    def test_counts_start_at_zero(self):
+        self.assertEqual(self.store.counts('key', 10), (0, 0))
+
+    def test_incr_and_counts(self):
+        returned = [self.store.incr_and_counts('key', 10, ttl=60) for _ in range(3)]
+        self.store.incr_and_counts('other', 10, ttl=60)
+
+        self.assertEqual(returned, [(0, 1), (0, 2), (0, 3)])
+        self.assertEqual(self.store.counts('key', 10), (0, 3))
+        self.assertEqual(self.store.counts('other', 10), (0, 1))
+
+    def test_decr(self):
+        self.store.incr_and_counts('key', 10, ttl=60)
+        self.store.incr_and_counts('key', 10, ttl=60)
+
+        self.store.decr('key', 10, ttl=60)
+
+        self.assertEqual(self.store.counts('key', 10), (0, 1))
+
+    def test_window_rolls_over(self):
+        self.store.incr_and_counts('key', 10, ttl=60)
+        self.store.incr_and_counts('key', 10, ttl=60)
+
+        self.assertEqual(self.store.counts('key', 11), (2, 0))
+        self.assertEqual(self.store.counts('key', 12), (0, 0))
+
+        self.assertEqual(self.store.incr_and_counts('key', 11, ttl=60), (2, 1))
+        self.assertEqual(self.store.counts('key', 11), (2, 1))
+
+
+class LocalCounterStoreTests(CounterStoreTestsMixin, SimpleTestCase):
+
+    def setUp(self):
+        self.store = LocalCounterStore(max_size=100)
+
+
+class CacheCounterStoreTests(CounterStoreTestsMixin, SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.store = CacheCounterStore('default')
+
+
+class SharedMemoryCounterStoreTests(CounterStoreTestsMixin, SimpleTestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.store = SharedMemoryCounterStore(self.path, slots=64)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_shared_between_instances(self):
+        """Two workers (store instances) mapping one file see the same counters."""
+        other = SharedMemoryCounterStore(self.path, slots=64)
+
+        self.store.incr_and_counts('key', 10, ttl=60)
+        other.incr_and_counts('key', 10, ttl=60)
+
+        self.assertEqual(self.store.counts('key', 10), (0, 2))
+
+    def test_full_table_evicts(self):
+        """More keys than slots never fails; old counts get dropped."""
+        store = SharedMemoryCounterStore(self.path, slots=4)
+        for i in range(20):
+            store.incr_and_counts(f'key{i}', 10, ttl=60)
+
+        self.assertEqual(store.counts('key19', 10), (0, 1))
+
+    def test_live_slots_of_longer_windows_kept(self):
+        """
+        A per-minute key's window number is ~60 times a per-hour one's; that
+        doesn't make the per-hour key's slot look free.
+        """
+        store = SharedMemoryCounterStore(self.path, slots=2)
+        # Both start probing at slot 0.
+        hashes = {'hourly': 2, 'minutely': 4}
+        with patch.object(store, '_hash', side_effect=hashes.get):
+            store.incr_and_counts('hourly', 10, ttl=7200)
+            store.incr_and_counts('minutely', 600, ttl=120)
+
+            self.assertEqual(store.counts('hourly', 10), (0, 1))
+            self.assertEqual(store.counts('minutely', 600), (0, 1))
+
+    def test_expired_slots_reused(self):
+        store = SharedMemoryCounterStore(self.path, slots=1)
+        hashes = {'old': 1, 'new': 2}
+        with patch.object(store, '_hash', side_effect=hashes.get):
+            store.incr_and_counts('old', 10, ttl=60)
+            with patch('core.throttling.time.time', return_value=time.time() + 120):
+                self.assertEqual(store.counts('old', 10), (0, 0))
+                store.incr_and_counts('new', 12, ttl=60)
+                self.assertEqual(store.counts('new', 12), (0, 1))
+
+
+class ScopedThrottle(IPThrottle):
+    scope = 'test'
+
+
+@override_settings(
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'test': '4/min'}},
+    THROTTLE_STORE={'BACKEND': 'local', 'MAX_SIZE': 100},
+)
+class SlidingWindowThrottleTests(SimpleTestCase):
+    """Test the sliding window maths."""
+
+    def setUp(self):
+        self.request = APIRequestFactory().get('/')
+        get_counter_store().clear()
+
+    def hit(self, now, request=None):
+        throttle = ScopedThrottle()
+        with patch.object(throttle, 'timer', return_value=now):
+            return throttle.allow_request(request or self.request, None), throttle
+
+    def test_limit_within_window(self):
+        allowed = [self.hit(600 + i)[0] for i in range(5)]
+
+        self.assertEqual(allowed, [True] * 4 + [False])
+
+    def test_previous_window_slides_out(self):
+        for i in range(4):
+            self.hit(600 + i)
+
+        # 15s into the next window, 3/4 of the previous 4 hits still count.
+        self.assertTrue(self.hit(675)[0])
+        allowed, throttle = self.hit(675)
+        self.assertFalse(allowed)
+        # Half way, only 2 of them do.
+        self.assertAlmostEqual(throttle.wait(), 15)
+        self.assertTrue(self.hit(690)[0])
+        self.assertFalse(self.hit(690)[0])
+
+    def test_wait(self):
+        for i in range(4):
+            self.hit(600)
+
+        allowed, throttle = self.hit(630)
+
+        self.assertFalse(allowed)
+        # Next window at 660; by 675 the old hits weigh 3 (< 4) again.
+        self.assertAlmostEqual(throttle.wait(), 45)
+
+    def test_rejected_not_counted(self):
+        for i in range(6):
+            self.hit(600 + i)
+
+        key = ScopedThrottle().get_cache_key(self.request, None)
+        self.assertEqual(get_counter_store().counts(key, 10), (0, 4))
+
+    def test_concurrent_requests_limited(self):
+        """Parallel requests can't all pass the check before any is counted."""
+        barrier = threading.Barrier(8)
+
+        def hit():
+            barrier.wait()
+            return self.hit(600)[0]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            allowed = list(executor.map(lambda _: hit(), range(8)))
+
+        self.assertEqual(allowed.count(True), 4)
+
+    def test_forwarded_for_not_trusted(self):
+        """A made-up `X-Forwarded-For` per request doesn't get a new bucket."""
+        factory = APIRequestFactory()
+        allowed = [
+            self.hit(600, factory.get('/', HTTP_X_FORWARDED_FOR=f'10.0.{i}.1'))[0]
+            for i in range(5)
+        ]
+
+        self.assertEqual(allowed, [True] * 4 + [False])
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'test': None}})
+    def test_no_rate_allows_all(self):
+        self.assertTrue(all(self.hit(600)[0] for _ in range(10)))
@@ -0,0 +1,315 @@
+"""
+Sliding window rate limiting with pluggable counter stores.
+
+The throttles count requests per key in fixed windows of `duration` seconds
+and estimate the last `duration` seconds as the current window's count plus
+the previous window's, weighted by how much of it is still inside the sliding
+window. That's two integers per key (DRF's throttles keep a timestamp per
+request) and every store below can keep them without external services.
+
+`THROTTLE_STORE['BACKEND']` picks the store:
+- 'local': in-process; each worker counts on its own.
+- 'cache': one of the Django `CACHES` (e.g. Redis/Memcached), shared by all.
+- 'shared_memory': a memory-mapped file shared by the workers of one host.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from rest_framework import throttling
+from rest_framework.settings import api_settings
+
+from core.cache import LRUCache
+
+
+def _rolled(entry_window, current, previous, window):
+    """Return `(previous, current)` for `window` of a key last counted in `entry_window`."""
+    if entry_window == window:
+        return previous, current
+    if entry_window == window - 1:
+        return current, 0
+    return 0, 0
+
+
+class LocalCounterStore:
+    """Counters in a process-local LRU (bounded to `max_size` keys)."""
+
+    def __init__(self, max_size):
+        self._counters = LRUCache(max_size=max_size, ttl=None)
+        self._lock = threading.Lock()
+
+    def counts(self, key, window):
+        """Return `(previous, current)` counts of `key` for `window`."""
+        with self._lock:
+            entry = self._counters.get(key)
+        return (0, 0) if entry is None else _rolled(*entry, window)
+
+    def incr_and_counts(self, key, window, ttl):
+        """
+        Count a hit for `key` in `window` & return the counts including it, in
+        one step (so concurrent hits can't all pass a limit before counting).
+        The key is forgotten after `ttl` seconds.
+        """
+        with self._lock:
+            entry = self._counters.get(key)
+            previous, current = (0, 0) if entry is None else _rolled(*entry, window)
+            self._counters.set(key, (window, current + 1, previous), ttl=ttl)
+        return previous, current + 1
+
+    def decr(self, key, window, ttl):
+        """Take back a hit counted by `incr_and_counts()` in `window`."""
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is not None and entry[0] == window and entry[1] > 0:
+                self._counters.set(key, (window, entry[1] - 1, entry[2]), ttl=ttl)
+
+    def clear(self):
+        self._counters.clear()
+
+
+class CacheCounterStore:
+    """Counters in the Django cache named `alias`; one cache key per window."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def counts(self, key, window):
+        found = self._cache.get_many([f'{key}:{window - 1}', f'{key}:{window}'])
+        return found.get(f'{key}:{window - 1}', 0), found.get(f'{key}:{window}', 0)
+
+    def incr_and_counts(self, key, window, ttl):
+        """See `LocalCounterStore.incr_and_counts()`."""
+        current_key = f'{key}:{window}'
+        # `add()` & `incr()` are atomic on Redis/Memcached; `incr()` returns the
+        # new value, so no concurrent hit is missed.
+        if self._cache.add(current_key, 1, timeout=ttl):
+            current = 1
+        else:
+            try:
+                current = self._cache.incr(current_key)
+            except ValueError:
+                # Expired between the two calls.
+                self._cache.set(current_key, 1, timeout=ttl)
+                current = 1
+        return self._cache.get(f'{key}:{window - 1}', 0), current
+
+    def decr(self, key, window, ttl):
+        try:
+            self._cache.decr(f'{key}:{window}')
+        except ValueError:
+            # Expired since: nothing to take back.
+            pass
+
+
+class SharedMemoryCounterStore:
+    """
+    Counters in a memory-mapped file, shared by every process that opens the
+    same `path` (e.g. all the gunicorn workers of a host).
+    The file is a fixed-size hash table of `slots` slots holding a key's hash,
+    window, counts & expiry time; `flock` keeps the processes from writing at
+    once. A slot is free again once expired (windows of throttles with different
+    durations can't be compared). When the probed slots are all taken by live
+    keys one gets evicted, which only ever forgets hits.
+    """
+    # key hash, window, current count, previous count, expiry (epoch seconds).
+    SLOT = struct.Struct('<QqIIq')
+    CURRENT = struct.Struct('<I')
+    CURRENT_OFFSET = struct.calcsize('<Qq')
+    PROBES = 8
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _open(self):
+        """Map the file; again after a fork, so every process has its own lock."""
+        if self._pid != os.getpid():
+            size = self.slots * self.SLOT.size
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size != size:
+                    # New, or laid out for other settings: start over.
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(self._fd, size)
+            self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, operation):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, operation)
+            try:
+                yield self._map
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # 0 marks an empty slot.
+        return int.from_bytes(digest, 'little') or 1
+
+    def _find(self, data, key_hash, now):
+        """
+        Return `(offset, (window, current, previous))` of the key's slot, or of
+        a free slot & None.
+        """
+        free = None
+        for probe in range(self.PROBES):
+            offset = (key_hash + probe) % self.slots * self.SLOT.size
+            slot_hash, *entry, expires_at = self.SLOT.unpack_from(data, offset)
+            if slot_hash == key_hash and expires_at > now:
+                return offset, entry
+            # Empty slots have expired at 0.
+            if free is None and expires_at <= now:
+                free = offset
+        if free is None:
+            free = key_hash % self.slots * self.SLOT.size
+        return free, None
+
+    def counts(self, key, window):
+        with self._locked(fcntl.LOCK_SH) as data:
+            _, entry = self._find(data, self._hash(key), time.time())
+        return (0, 0) if entry is None else _rolled(*entry, window)
+
+    def incr_and_counts(self, key, window, ttl):
+        """See `LocalCounterStore.incr_and_counts()`."""
+        key_hash = self._hash(key)
+        now = time.time()
+        with self._locked(fcntl.LOCK_EX) as data:
+            offset, entry = self._find(data, key_hash, now)
+            previous, current = (0, 0) if entry is None else _rolled(*entry, window)
+            self.SLOT.pack_into(
+                data, offset, key_hash, window, current + 1, previous, int(now + ttl) + 1,
+            )
+        return previous, current + 1
+
+    def decr(self, key, window, ttl):
+        key_hash = self._hash(key)
+        with self._locked(fcntl.LOCK_EX) as data:
+            offset, entry = self._find(data, key_hash, time.time())
+            if entry is not None and entry[0] == window and entry[1] > 0:
+                # Only the count changes; the slot keeps its expiry.
+                self.CURRENT.pack_into(data, offset + self.CURRENT_OFFSET, entry[1] - 1)
+
+    def clear(self):
+        with self._locked(fcntl.LOCK_EX) as data:
+            data[:] = bytes(len(data))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_counter_store():
+    """Return the process-wide counter store configured by `THROTTLE_STORE`."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                conf = settings.THROTTLE_STORE
+                if conf['BACKEND'] == 'cache':
+                    _store = CacheCounterStore(conf['ALIAS'])
+                elif conf['BACKEND'] == 'shared_memory':
+                    _store = SharedMemoryCounterStore(conf['PATH'], conf['SLOTS'])
+                else:
+                    _store = LocalCounterStore(conf['MAX_SIZE'])
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_store(*, setting, **kwargs):
+    """Rebuild the store on the next request when tests override the setting."""
+    global _store
+    if setting == 'THROTTLE_STORE':
+        _store = None
+
+
+class SlidingWindowThrottle(throttling.SimpleRateThrottle):
+    """
+    `SimpleRateThrottle` (same `scope` & rate settings) counting with a sliding
+    window in the `get_counter_store()` store.
+    Subclasses implement `get_cache_key()`; returning None skips the throttle.
+    """
+    wait_seconds = None
+
+    def get_rate(self):
+        # Read the settings every time (not once at import), so overrides apply.
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            return super().get_rate()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        window, elapsed = divmod(self.timer(), self.duration)
+        window = int(window)
+        store = get_counter_store()
+        ttl = 2 * self.duration
+        # Counted first & checked after: concurrent requests each see the
+        # others' hits, so a burst can't all slip under the limit.
+        previous, current = store.incr_and_counts(self.key, window, ttl=ttl)
+        weight = 1 - elapsed / self.duration
+        if previous * weight + current > self.num_requests:
+            # Rejected requests don't count towards the limit.
+            store.decr(self.key, window, ttl=ttl)
+            self.wait_seconds = self.time_until_allowed(previous, current - 1, elapsed)
+            return False
+        return True
+
+    def time_until_allowed(self, previous, current, elapsed):
+        """Seconds until `previous * weight + current` drops to the limit - 1."""
+        allowed = self.num_requests - 1
+        if current <= allowed:
+            # The previous window's share slides out during this window.
+            return max(self.duration * (1 - (allowed - current) / previous) - elapsed, 0)
+        # Next window: this window's count becomes the one sliding out.
+        return self.duration - elapsed + self.duration * (1 - allowed / current)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottle(SlidingWindowThrottle):
+    """Limit requests per client IP (honouring `NUM_PROXIES`)."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    """Limit requests per `email` in the request body, whoever sends them."""
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        # Hashed: raw emails aren't valid (or wanted) in cache keys.
+        ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
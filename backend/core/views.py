@@ -0,0 +1,40 @@
+"""
+Views for the project internals (operations & monitoring).
+"""
+
+from rest_framework import authentication, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from drf_spectacular.utils import extend_schema
+
+from core import hashing
+from core.db import connection_stats
+from user.authentication import CachedTokenAuthentication
+
+
+class DatabaseStatsView(APIView):
+    """Connection reuse & pool statistics of the worker serving the request."""
+    # The user API's token authentication: expiry (`AUTH_TOKEN_TTL`) & shards.
+    authentication_classes = [
+        CachedTokenAuthentication,
+        authentication.SessionAuthentication,
+    ]
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        return Response(connection_stats())
+
+
+class HashingStatsView(APIView):
+    """Queue depth & shed counts of the password hashing pool of this worker."""
+    authentication_classes = DatabaseStatsView.authentication_classes
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        executor = hashing.get_executor()
+        return Response({'pooled': False} if executor is None else {
+            'pooled': True, **executor.stats(),
+        })
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        # Register the cache invalidation handlers & the OpenAPI extensions.
+        from user import schema, signals  # noqa: F401
@@ -0,0 +1,183 @@
+"""
+Native async views for the user API.
+
+Same endpoints & payloads as `user.views`, but written against Django's async
+ORM so under ASGI a request never ties up a thread while it waits on the DB
+or the password hashing pool. Enabled with the `USER_API_ASYNC` setting.
+"""
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core import activity, replicas
+from core.hashing import HashingPoolSaturated
+from core.renderers import JsonResponse
+from user import serializers, throttles, tokens
+from user.authentication import (
+    AsyncTokenAuthentication,
+    SignedTokenAuthentication,
+    aget_or_rotate_token,
+)
+from user.views import HashingUnavailable, UserETagMixin
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of DRF's `APIView`: parses the body with the DRF
+    parsers, renders JSON & turns API exceptions into error responses.
+    """
+
+    authentication_classes = []
+    # Token auth only; no session/CSRF involved (just like DRF views).
+    require_authentication = False
+    throttle_classes = []
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def get_request(self, request):
+        """Return (once per request) a DRF `Request` wrapping `request`."""
+        if not hasattr(self, '_drf_request'):
+            parsers = [parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+            self._drf_request = Request(request, parsers=parsers)
+        return self._drf_request
+
+    def get_data(self, request):
+        """Return the parsed request body (JSON, form or multipart)."""
+        return self.get_request(request).data
+
+    async def authenticate(self, request):
+        """Set `request.user`/`request.auth` from the authentication classes."""
+        for authenticator in self.authentication_classes:
+            result = await authenticator().aauthenticate(request)
+            if result is not None:
+                request.user, request.auth = result
+                return
+        if self.require_authentication:
+            raise exceptions.NotAuthenticated()
+
+    def check_throttles(self, request):
+        """Same as DRF: ask every throttle, then refuse with the longest wait."""
+        drf_request = self.get_request(request)
+        checks = [cls() for cls in self.throttle_classes]
+        refused = [t for t in checks if not t.allow_request(drf_request, self)]
+        if refused:
+            waits = [t.wait() for t in refused if t.wait() is not None]
+            raise exceptions.Throttled(max(waits, default=None))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() in self.http_method_names:
+                await self.authenticate(request)
+                self.check_throttles(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except HashingPoolSaturated as exc:
+            return self.handle_exception(HashingUnavailable.from_saturated(exc))
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    def handle_exception(self, exc):
+        response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # Same as DRF: 401 + a `WWW-Authenticate` header naming the scheme.
+            response['WWW-Authenticate'] = self.authentication_classes[0].keyword
+        if getattr(exc, 'wait', None) is not None:
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+
+class CreateUserView(AsyncAPIView):
+    """Create a new user."""
+    http_method_names = ['post', 'options']
+    throttle_classes = [throttles.SignupIPThrottle, throttles.SignupEmailThrottle]
+
+    async def post(self, request):
+        serializer = serializers.AsyncUserSerializer(data=self.get_data(request))
+        if not await serializer.ais_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        await serializer.asave()
+        return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ManageUserView(UserETagMixin, AsyncAPIView):
+    """Manage the authenticated user (`If-None-Match`/`If-Match` aware)."""
+    http_method_names = ['get', 'put', 'patch', 'options']
+    authentication_classes = [AsyncTokenAuthentication, SignedTokenAuthentication]
+    require_authentication = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = await super().dispatch(request, *args, **kwargs)
+        return self.set_etag(request, response)
+
+    async def conditional_response(self, request):
+        """See `user.views.ManageUserView`."""
+        if not self.is_conditional(request):
+            return None
+        await request.user.arefresh_from_db()
+        return self.check_preconditions(request)
+
+    async def get(self, request):
+        response = await self.conditional_response(request)
+        if response is None:
+            response = JsonResponse(serializers.AsyncUserSerializer(request.user).data)
+        return response
+
+    async def put(self, request, partial=False):
+        if self.is_conditional(request):
+            # The async ORM has no transactions; see `lock_user()`.
+            return await sync_to_async(self.locked_update)(request, partial)
+        serializer = serializers.AsyncUserSerializer(
+            request.user, data=self.get_data(request), partial=partial,
+        )
+        if not await serializer.ais_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        await serializer.asave()
+        return JsonResponse(serializer.data)
+
+    def locked_update(self, request, partial):
+        """Check the preconditions & update the user in one locked transaction."""
+        with self.lock_user(request):
+            response = self.check_preconditions(request)
+            if response is not None:
+                return response
+            serializer = serializers.UserSerializer(
+                request.user, data=self.get_data(request), partial=partial,
+            )
+            if not serializer.is_valid():
+                return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer.save()
+            return JsonResponse(serializer.data)
+
+    async def patch(self, request):
+        return await self.put(request, partial=True)
+
+
+class CreateTokenView(AsyncAPIView):
+    """Create a new auth token for user."""
+    http_method_names = ['post', 'options']
+    throttle_classes = [throttles.LoginIPThrottle, throttles.LoginEmailThrottle]
+
+    async def post(self, request):
+        serializer = serializers.AsyncAuthTokenSerializer(
+            data=self.get_data(request), context={'request': request},
+        )
+        if not await serializer.ais_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user = serializer.validated_data['user']
+        # The request itself is anonymous; `ActivityMiddleware` won't see them,
+        # nor pin them to the primary if their token is created.
+        await activity.arecord(user.pk)
+        await replicas.anote_user(user.pk)
+        if settings.AUTH_TOKEN_MODE == 'signed':
+            return JsonResponse(tokens.issue(user))
+        token = await aget_or_rotate_token(user)
+        return JsonResponse({'token': token.key})
@@ -0,0 +1,454 @@
+"""
+Authentication classes for the user API.
+"""
+
+import pickle
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+
+from core import replicas, shards
+from core.cache import LRUCache
+from user import tokens
+
+
+# The version of a deleted user: no cached token of theirs matches it.
+DELETED = 'deleted'
+
+
+def is_current(token, revoked, version):
+    """
+    Whether a cached `token` is still good: it wasn't deleted (`revoked`) &
+    was loaded with the user's `version` (their `updated_at`), unless no
+    change of theirs was recorded (`version` None). Entries are written after
+    the DB read, so one loaded before a change & cached after its
+    invalidation is caught here.
+    """
+    return not revoked and version in (None, token.user.updated_at)
+
+
+class LocalTokenCache:
+    """
+    Per-process LRU of `token key -> pickled Token` (with its user attached).
+    Each worker keeps its own copy, so `TTL` bounds how stale it can get when
+    another process changes a user.
+    """
+
+    def __init__(self, max_size, ttl):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        # The users' versions & deleted keys, kept longer than the entries
+        # loaded before they changed.
+        self._changes = LRUCache(max_size=max_size, ttl=2 * ttl)
+
+    def get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        user_id, data = entry
+        # Unpickle on every hit so requests never share (and mutate) one instance.
+        token = pickle.loads(data)
+        revoked = self._changes.get(('key', key)) is not None
+        if not is_current(token, revoked, self._changes.get(('user', user_id))):
+            self._cache.delete(key)
+            return None
+        return token
+
+    def set(self, token):
+        self._cache.set(token.key, (token.user_id, pickle.dumps(token)))
+
+    # Everything stays in memory, so the async API is the sync one.
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, token):
+        self.set(token)
+
+    def delete(self, key):
+        self._changes.set(('key', key), True)
+        self._cache.delete(key)
+
+    def invalidate_user(self, user_id, version=DELETED):
+        """Drop the user's entries; `version` is their `updated_at` as saved."""
+        self._changes.set(('user', user_id), version)
+        self._cache.discard_if(lambda entry: entry[0] == user_id)
+
+    def clear(self):
+        self._cache.clear()
+        self._changes.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class SharedTokenCache:
+    """
+    Token cache stored in one of the `CACHES` (e.g. Redis/Memcached) so every
+    worker sees the same entries & invalidations. Rather than tracking the
+    keys of each user, a change stores the user's new version, which the
+    entries loaded before it don't match anymore.
+    """
+
+    prefix = 'tokenauth'
+
+    def __init__(self, alias, ttl):
+        self.alias = alias
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def _token_key(self, key):
+        return f'{self.prefix}:key:{key}'
+
+    def _revoked_key(self, key):
+        return f'{self.prefix}:revoked:{key}'
+
+    def _user_key(self, user_id):
+        return f'{self.prefix}:user:{user_id}'
+
+    def _count(self, token):
+        with self._lock:
+            if token is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return token
+
+    def get(self, key):
+        token_key, revoked_key = self._token_key(key), self._revoked_key(key)
+        found = self._cache.get_many([token_key, revoked_key])
+        token = found.get(token_key)
+        if token is not None:
+            version = self._cache.get(self._user_key(token.user_id))
+            if not is_current(token, revoked_key in found, version):
+                token = None
+        return self._count(token)
+
+    def set(self, token):
+        self._cache.set(self._token_key(token.key), token, timeout=self.ttl)
+
+    async def aget(self, key):
+        token_key, revoked_key = self._token_key(key), self._revoked_key(key)
+        found = await self._cache.aget_many([token_key, revoked_key])
+        token = found.get(token_key)
+        if token is not None:
+            version = await self._cache.aget(self._user_key(token.user_id))
+            if not is_current(token, revoked_key in found, version):
+                token = None
+        return self._count(token)
+
+    async def aset(self, token):
+        await self._cache.aset(self._token_key(token.key), token, timeout=self.ttl)
+
+    def delete(self, key):
+        # Outlives an entry cached by a request that read the token before.
+        self._cache.set(self._revoked_key(key), True, timeout=2 * self.ttl)
+        self._cache.delete(self._token_key(key))
+
+    def invalidate_user(self, user_id, version=DELETED):
+        """Void the user's entries; `version` is their `updated_at` as saved."""
+        self._cache.set(self._user_key(user_id), version, timeout=2 * self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """Return the process-wide token cache configured by `TOKEN_AUTH_CACHE`."""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                conf = settings.TOKEN_AUTH_CACHE
+                if conf['BACKEND'] == 'shared':
+                    _token_cache = SharedTokenCache(conf['ALIAS'], conf['TTL'])
+                else:
+                    _token_cache = LocalTokenCache(conf['MAX_SIZE'], conf['TTL'])
+    return _token_cache
+
+
+_user_cache = None
+
+
+def get_user_cache():
+    """
+    Return the process-wide `user id -> pickled User` LRU used by
+    `SignedTokenAuthentication` (sized & expired like `TOKEN_AUTH_CACHE`).
+    """
+    global _user_cache
+    if _user_cache is None:
+        with _token_cache_lock:
+            if _user_cache is None:
+                conf = settings.TOKEN_AUTH_CACHE
+                _user_cache = LRUCache(max_size=conf['MAX_SIZE'], ttl=conf['TTL'])
+    return _user_cache
+
+
+@receiver(setting_changed)
+def _reset_token_cache(*, setting, **kwargs):
+    """Rebuild the caches on the next request when tests override the setting."""
+    global _token_cache, _user_cache
+    if setting == 'TOKEN_AUTH_CACHE':
+        _token_cache = _user_cache = None
+
+
+def token_expiry_cutoff():
+    """
+    Opaque tokens created before the returned time have expired
+    (`AUTH_TOKEN_TTL`); None when tokens never expire.
+    """
+    if not settings.AUTH_TOKEN_TTL:
+        return None
+    return timezone.now() - timedelta(seconds=settings.AUTH_TOKEN_TTL)
+
+
+def token_expired(token):
+    cutoff = token_expiry_cutoff()
+    return cutoff is not None and token.created < cutoff
+
+
+def user_tokens(user):
+    """
+    `Token.objects` on the user's shard, creating keys that lead back to it
+    (see `core.shards`); the regular ones without sharding.
+    """
+    return Token.objects.db_manager(shards.db_for_user(user))
+
+
+def get_or_rotate_token(user):
+    """Return the user's token, swapping it for a new one if it has expired."""
+    tokens = user_tokens(user)
+    token, created = tokens.get_or_create(
+        user=user, defaults={'key': shards.new_token_key(user.pk)},
+    )
+    if not created and token_expired(token):
+        # Deleting it also evicts it from the token cache (`user.signals`).
+        token.delete()
+        token = tokens.create(user=user, key=shards.new_token_key(user.pk))
+    return token
+
+
+async def aget_or_rotate_token(user):
+    """See get_or_rotate_token()."""
+    tokens = user_tokens(user)
+    token, created = await tokens.aget_or_create(
+        user=user, defaults={'key': shards.new_token_key(user.pk)},
+    )
+    if not created and token_expired(token):
+        await token.adelete()
+        token = await tokens.acreate(user=user, key=shards.new_token_key(user.pk))
+    return token
+
+
+class AuthorizationKeyMixin:
+    """Read `Authorization: <keyword> <key>` headers, like `TokenAuthentication`."""
+
+    def get_key(self, request):
+        """
+        Return the token key from the `Authorization` header, or None if the
+        header isn't ours. Same checks (& messages) as `TokenAuthentication`.
+        """
+        auth = authentication.get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. Token string should not contain spaces.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            msg = _(
+                'Invalid token header. Token string should not contain invalid characters.'
+            )
+            raise exceptions.AuthenticationFailed(msg)
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """
+    `TokenAuthentication` that remembers `token -> user` so repeated requests
+    with the same token don't hit the database.
+    Entries are dropped when the user is saved/deleted or the token is deleted
+    (see `user.signals`), including ones being loaded meanwhile (see
+    `is_current()`). Tokens older than `AUTH_TOKEN_TTL` are refused.
+    With read replicas, a token missing from the replica (issued moments ago)
+    is looked up on the primary, & the requests of a user who wrote lately read
+    from it (`core.replicas.note_user()`), cookie or not.
+    """
+
+    def get_tokens(self, key):
+        return (
+            self.get_model().objects.using(shards.db_for_token_key(key))
+            .select_related('user').filter(key=key)
+        )
+
+    def get_token(self, key):
+        """Load the token `key` & its user from the DB."""
+        token = self.get_tokens(key).first()
+        if token is None and replicas.read_primary():
+            token = self.get_tokens(key).first()
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if replicas.note_user(token.user_id):
+            # Read from a replica, which may not have their latest changes yet.
+            token = self.get_tokens(key).get()
+        return token
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(key)
+
+        if token is None:
+            token = self.get_token(key)
+            cache.set(token)
+        else:
+            replicas.note_user(token.user_id)
+
+        if token_expired(token):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+
+class AsyncTokenAuthentication(AuthorizationKeyMixin, CachedTokenAuthentication):
+    """
+    `CachedTokenAuthentication` for the async views: the token lookup uses the
+    async ORM/cache APIs so it never blocks the event loop.
+    """
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return await self.aauthenticate_credentials(key)
+
+    async def aget_token(self, key):
+        """See get_token()."""
+        token = await self.get_tokens(key).afirst()
+        if token is None and replicas.read_primary():
+            token = await self.get_tokens(key).afirst()
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if await replicas.anote_user(token.user_id):
+            token = await self.get_tokens(key).aget()
+        return token
+
+    async def aauthenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = await cache.aget(key)
+
+        if token is None:
+            token = await self.aget_token(key)
+            await cache.aset(token)
+        else:
+            await replicas.anote_user(token.user_id)
+
+        if token_expired(token):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+
+class SignedTokenAuthentication(AuthorizationKeyMixin, authentication.BaseAuthentication):
+    """
+    `Authorization: Bearer <access token>` with the signed tokens of `user.tokens`.
+    The signature is checked in memory; the user comes from `get_user_cache()`
+    and only a miss (or a token newer than the cached user) hits the DB.
+    Entries are dropped when the user is saved/deleted (see `user.signals`);
+    other processes notice within the cache `TTL`.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return await self.aauthenticate_credentials(key)
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+    def verify(self, key):
+        """Return `(user id, token version)` or raise `AuthenticationFailed`."""
+        try:
+            return tokens.verify_access(key)
+        except tokens.InvalidToken:
+            raise exceptions.AuthenticationFailed(_('Invalid or expired token.'))
+
+    @staticmethod
+    def get_users(user_id):
+        """The users of the shard `user_id` is on."""
+        return get_user_model().objects.using(shards.db_for_user_id(user_id))
+
+    def cached_user(self, user_id, version):
+        """Return the cached user if it's still valid for a `version` token."""
+        entry = get_user_cache().get(user_id)
+        user = None if entry is None else pickle.loads(entry)
+        # A newer token than the cached user means the cache is stale.
+        if user is not None and user.token_version < version:
+            return None
+        return user
+
+    def check_user(self, user, version, key):
+        if user is None or user.token_version != version:
+            raise exceptions.AuthenticationFailed(_('Invalid or expired token.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, key)
+
+    def authenticate_credentials(self, key):
+        user_id, version = self.verify(key)
+        replicas.note_user(user_id)
+        user = self.cached_user(user_id, version)
+        if user is None:
+            user = self.get_users(user_id).filter(pk=user_id).first()
+            if user is not None:
+                get_user_cache().set(user_id, pickle.dumps(user))
+        return self.check_user(user, version, key)
+
+    async def aauthenticate_credentials(self, key):
+        user_id, version = self.verify(key)
+        await replicas.anote_user(user_id)
+        user = self.cached_user(user_id, version)
+        if user is None:
+            user = await self.get_users(user_id).filter(pk=user_id).afirst()
+            if user is not None:
+                get_user_cache().set(user_id, pickle.dumps(user))
+        return self.check_user(user, version, key)
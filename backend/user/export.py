@@ -0,0 +1,77 @@
+"""
+Streaming export of users, shared by the `export_users` command & the
+`UserExportView` endpoint.
+
+Rows are read through a server-side cursor (`iterator(chunk_size=...)`) as
+plain tuples & rendered chunk by chunk (`core.renderers.StreamingRenderer`),
+so memory use doesn't grow with the size of the table. With sharding, the
+shards are read one after the other (`core.shards`).
+"""
+
+import itertools
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+
+from core import shards
+
+# Columns that can be exported, in their default order.
+EXPORT_FIELDS = [
+    'id', 'email', 'name', 'is_active', 'is_staff', 'last_login', 'last_seen', 'updated_at',
+]
+CHUNK_SIZE = 1000
+
+
+def parse_fields(value):
+    """
+    Return the export fields listed in `value` ("id,email"; all when empty).
+    Raises ValueError naming the unknown ones.
+    """
+    if not value:
+        return list(EXPORT_FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(fields) - set(EXPORT_FIELDS)
+    if unknown:
+        raise ValueError(', '.join(sorted(unknown)))
+    return fields
+
+
+def export_queryset(fields, is_active=None, is_staff=None):
+    """
+    Users to export (in pk order, shard by shard) as tuples of `fields`;
+    None skips a filter.
+    """
+    queryset = get_user_model().objects.order_by('pk')
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    if is_staff is not None:
+        queryset = queryset.filter(is_staff=is_staff)
+    return queryset.values_list(*fields)
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Iterate over the rows of `queryset`, on every shard."""
+    if not shards.enabled():
+        return queryset.iterator(chunk_size=chunk_size)
+    return itertools.chain.from_iterable(
+        queryset.using(alias).iterator(chunk_size=chunk_size) for alias in shards.aliases()
+    )
+
+
+def stream_users(renderer, queryset, fields, chunk_size=CHUNK_SIZE):
+    """Yield `queryset` rendered by `renderer`, `chunk_size` rows at a time."""
+    return renderer.stream(fields, export_rows(queryset, chunk_size), chunk_size)
+
+
+async def astream_users(renderer, queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    See stream_users(), for ASGI: every chunk is fetched & rendered on the
+    thread that runs the sync ORM. Not `aiterator()`: the iterables of
+    `values_list()` run their query as soon as they're created, which
+    `aiterator()` does on the event loop (`SynchronousOnlyOperation`).
+    """
+    chunks = stream_users(renderer, queryset, fields, chunk_size)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
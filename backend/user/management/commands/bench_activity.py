@@ -0,0 +1,104 @@
+"""
+Django custom command to benchmark the buffered last-seen tracking against a
+write per request.
+
+--users users each GET /api/user/me/ --requests times. The "write per
+request" case updates `last_seen` after every request (what tracking it
+inline would cost); the "buffered" case goes through `core.activity` &
+flushes at the end. Reports requests/second & the `UPDATE`s each case sent.
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core import activity
+from core.bench import seeded_users, test_client_environment, write_report
+
+PREFIX = 'bench-activity'
+
+
+@contextmanager
+def counting_updates():
+    """Count the `UPDATE`s of `last_seen` sent within the block."""
+    counter = {'updates': 0}
+
+    def count(execute, sql, params, many, context):
+        if sql.startswith('UPDATE') and 'last_seen' in sql:
+            counter['updates'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        yield counter
+
+
+class Command(BaseCommand):
+    """Writes & requests/second of last-seen tracking, per request vs buffered."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=20, help='Requests per user.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def run(self, clients, rounds, after_request=None):
+        """GET /me/ `rounds` times per client; return `(requests, seconds, updates)`."""
+        url = reverse('user:me')
+        with counting_updates() as counter:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for user, client in clients:
+                    res = client.get(url)
+                    if res.status_code != 200:
+                        raise RuntimeError(f'{url} answered {res.status_code}')
+                    if after_request is not None:
+                        after_request(user)
+            if settings.ACTIVITY_TRACKING['ENABLED']:
+                activity.get_buffer().flush()
+            elapsed = time.perf_counter() - start
+        return len(clients) * rounds, elapsed, counter['updates']
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+
+        def write_last_seen(user):
+            user_model.objects.filter(pk=user.pk).update(last_seen=timezone.now())
+
+        tracking = {**settings.ACTIVITY_TRACKING, 'FLUSH_INTERVAL': 0}
+        cases = {
+            'write per request': ({**tracking, 'ENABLED': False}, write_last_seen),
+            'buffered': ({**tracking, 'ENABLED': True}, None),
+        }
+        report = {}
+
+        with test_client_environment(), \
+                seeded_users(options['users'], prefix=PREFIX) as users:
+            for name, (conf, after_request) in cases.items():
+                with override_settings(ACTIVITY_TRACKING=conf):
+                    clients = []
+                    for user in users:
+                        client = APIClient()
+                        client.force_authenticate(user=user)
+                        clients.append((user, client))
+                    requests, elapsed, updates = self.run(
+                        clients, options['requests'], after_request,
+                    )
+                report[name] = {
+                    'requests': requests,
+                    'seconds': round(elapsed, 3),
+                    'requests_per_second': round(requests / elapsed, 1),
+                    'updates': updates,
+                    'requests_per_update': round(requests / max(updates, 1), 1),
+                }
+
+        write_report(self, report, as_json=options['json'])
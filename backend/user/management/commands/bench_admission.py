@@ -0,0 +1,162 @@
+"""
+Django custom command to load test the admission control of the password
+hashing pool.
+
+Measures /me/ alone, then again while a flood of /token/ requests (far more
+than the pool's workers can take) runs next to it: once with a queue as long
+as the flood & no deadline, once with the configured queue & deadline. With
+admission control most of the flood gets 503s & /me/ latency stays close to
+the idle one. The flooding clients wait for `Retry-After` after a 503 unless
+--ignore-retry-after is given; on few cores, the cost of answering a flood
+that never backs off shows up in /me/ too.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import hashing
+from core.bench import (
+    BENCH_PASSWORD,
+    run_concurrently,
+    seeded_users,
+    summarize,
+    test_client_environment,
+    write_report,
+)
+
+
+class Command(BaseCommand):
+    """/me/ latency with & without an overload of /token/, and what got shed."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='/me/ per run.')
+        parser.add_argument('--concurrency', type=int, default=4, help='/me/ clients.')
+        parser.add_argument('--flood', type=int, default=32, help='/token/ clients.')
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=2, help='Hashing pool size.')
+        parser.add_argument('--pending', type=int, default=4, help='Hashing queue size.')
+        parser.add_argument(
+            '--queue-timeout', type=float, default=0.5,
+            help='Seconds a queued hash may wait for a worker.',
+        )
+        parser.add_argument(
+            '--ignore-retry-after', action='store_true',
+            help="Flood on after a 503 instead of waiting for `Retry-After`.",
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def flood(self, users, stop, statuses, latencies, lock, backoff):
+        """Log in as fast as possible until `stop` is set."""
+        url = reverse('user:token')
+        client = APIClient()
+        i = 0
+        try:
+            while not stop.is_set():
+                user = users[i % len(users)]
+                i += 1
+                start = time.perf_counter()
+                res = client.post(url, {'email': user.email, 'password': BENCH_PASSWORD})
+                latency = time.perf_counter() - start
+                with lock:
+                    statuses[res.status_code] += 1
+                    latencies.append(latency)
+                if backoff and res.has_header('Retry-After'):
+                    stop.wait(int(res['Retry-After']))
+        finally:
+            connections.close_all()
+
+    def run_flooded(self, profile, users, options):
+        """Run the /me/ requests next to the /token/ flood."""
+        stop, lock = threading.Event(), threading.Lock()
+        statuses, token_latencies = Counter(), []
+        flooders = [
+            threading.Thread(
+                target=self.flood,
+                args=(
+                    users, stop, statuses, token_latencies, lock,
+                    not options['ignore_retry_after'],
+                ),
+            )
+            for _ in range(options['flood'])
+        ]
+        for thread in flooders:
+            thread.start()
+        try:
+            latencies, elapsed = run_concurrently(
+                profile, options['requests'], options['concurrency'],
+            )
+        finally:
+            stop.set()
+            for thread in flooders:
+                thread.join()
+        return {
+            'me': summarize(latencies.get('me', []), elapsed),
+            'token': {
+                **summarize(token_latencies, elapsed),
+                **{f'status_{code}': count for code, count in sorted(statuses.items())},
+            },
+            'hashing pool': hashing.get_executor().stats(),
+        }
+
+    def handle(self, *args, **options):
+        me_url = reverse('user:me')
+        modes = {
+            'unbounded': {
+                'MAX_WORKERS': options['workers'],
+                'MAX_PENDING': options['flood'],
+                'QUEUE_TIMEOUT': None,
+            },
+            'admission': {
+                'MAX_WORKERS': options['workers'],
+                'MAX_PENDING': options['pending'],
+                'QUEUE_TIMEOUT': options['queue_timeout'],
+            },
+        }
+        # The flood all comes from one IP; the rate limits would answer it instead.
+        rates = dict.fromkeys(settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}))
+        report = {}
+        # Don't log every shed request.
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+
+        try:
+            with test_client_environment(), \
+                    seeded_users(options['users'], prefix='bench-admission') as users, \
+                    override_settings(REST_FRAMEWORK={
+                        **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates,
+                    }):
+                tokens = [Token.objects.create(user=user).key for user in users]
+
+                def profile(i):
+                    client = APIClient()
+                    client.credentials(HTTP_AUTHORIZATION=f'Token {tokens[i % len(tokens)]}')
+                    res = client.get(me_url)
+                    return 'me' if res.status_code == 200 else f'me_{res.status_code}'
+
+                latencies, elapsed = run_concurrently(
+                    profile, options['requests'], options['concurrency'],
+                )
+                report['idle/me'] = summarize(latencies.get('me', []), elapsed)
+                for mode, conf in modes.items():
+                    with override_settings(PASSWORD_HASHING=conf):
+                        results = self.run_flooded(profile, users, options)
+                    for label, values in results.items():
+                        report[f'{mode}/{label}'] = values
+        finally:
+            request_logger.setLevel(level)
+
+        write_report(self, report, as_json=options['json'])
@@ -0,0 +1,104 @@
+"""
+Django custom command to benchmark the async user views against the DRF ones
+under many concurrent requests.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncRequestFactory
+
+from rest_framework.authtoken.models import Token
+
+from core.bench import (
+    BENCH_PASSWORD,
+    arun_concurrently,
+    seeded_users,
+    summarize,
+    test_client_environment,
+    write_report,
+)
+from user import async_views, views
+
+
+def as_asgi(view_class):
+    """
+    Return an awaitable view, called the way Django's ASGI handler calls it:
+    async views directly, sync views through `sync_to_async`.
+    """
+    view = view_class.as_view()
+    if getattr(view_class, 'view_is_async', False):
+        return view
+
+    def render(request):
+        return view(request).render()
+
+    return sync_to_async(render)
+
+
+class Command(BaseCommand):
+    """Latency & throughput of /token/ & /me/: sync DRF views vs async views."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument(
+            '--login-requests', type=int, default=100,
+            help='Requests sent to /token/ (each one hashes a password).',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        with test_client_environment(), \
+                seeded_users(options['users'], prefix='bench-async') as users:
+            tokens = [Token.objects.create(user=user).key for user in users]
+            report = asyncio.run(self.run(users, tokens, options))
+
+        write_report(self, report, as_json=options['json'])
+
+    async def run(self, users, tokens, options):
+        factory = AsyncRequestFactory()
+
+        def me_request(i):
+            headers = {'Authorization': f'Token {tokens[i % len(tokens)]}'}
+            return factory.get('/api/user/me/', headers=headers)
+
+        def token_request(i):
+            credentials = {'email': users[i % len(users)].email, 'password': BENCH_PASSWORD}
+            return factory.post(
+                '/api/user/token/', data=json.dumps(credentials),
+                content_type='application/json',
+            )
+
+        scenarios = {
+            'me': ('ManageUserView', me_request, options['requests']),
+            'token': ('CreateTokenView', token_request, options['login_requests']),
+        }
+        report = {}
+        for impl, module in (('sync', views), ('async', async_views)):
+            for scenario, (view_name, make_request, requests) in scenarios.items():
+                view = as_asgi(getattr(module, view_name))
+
+                async def call(i):
+                    res = await view(make_request(i))
+                    return 'ok' if res.status_code < 400 else f'http_{res.status_code}'
+
+                latencies, elapsed = await arun_concurrently(
+                    call, requests, options['concurrency'],
+                )
+                all_latencies = [lat for values in latencies.values() for lat in values]
+                results = summarize(all_latencies, elapsed)
+                results['errors'] = sum(
+                    len(values) for label, values in latencies.items() if label != 'ok'
+                )
+                report[f'{impl}/{scenario}'] = results
+
+        await sync_to_async(connections.close_all)()
+        return report
@@ -0,0 +1,111 @@
+"""
+Django custom command to benchmark creating users one request at a time vs
+in batches.
+
+Creates --users users through /api/user/create/ (a request each) and through
+/api/user/create/batch/ (--batch-size per request) & reports users/second.
+With --fast-hasher passwords get a cheap hash, so the numbers show the
+per-request & database side only.
+"""
+
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.bench import (
+    BENCH_EMAIL_DOMAIN,
+    BENCH_PASSWORD,
+    seeded_users,
+    test_client_environment,
+    write_report,
+)
+
+PREFIX = 'bench-batch'
+
+
+def make_payloads(count, case):
+    return [
+        {
+            'email': f'{PREFIX}-{case}-{i}@{BENCH_EMAIL_DOMAIN}',
+            'name': f'Batch user {i}',
+            'password': BENCH_PASSWORD,
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    """Users/second of /api/user/create/ vs /api/user/create/batch/."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Users per case.')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.USER_BATCH_MAX_SIZE,
+            help='Users per batch request.',
+        )
+        parser.add_argument(
+            '--fast-hasher', action='store_true',
+            help='Hash with MD5 to measure the rest of the request alone.',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def run(self, client, url, bodies):
+        """POST every body to `url`; return `(requests, seconds)`."""
+        start = time.perf_counter()
+        for body in bodies:
+            res = client.post(url, body, format='json')
+            if res.status_code != 201:
+                raise RuntimeError(f'{url} answered {res.status_code}: {res.data}')
+        return len(bodies), time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        count, size = options['users'], options['batch_size']
+        hashers = override_settings(
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        ) if options['fast_hasher'] else nullcontext()
+        # Every signup comes from one IP; the rate limits would answer them instead.
+        rates = dict.fromkeys(settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}))
+        payloads = make_payloads(count, 'row')
+        batch_payloads = make_payloads(count, 'batch')
+        cases = {
+            'create/ per user': (
+                reverse('user:create'), payloads,
+            ),
+            f'create/batch/ by {size}': (
+                reverse('user:create-batch'),
+                [batch_payloads[i:i + size] for i in range(0, count, size)],
+            ),
+        }
+        report = {}
+
+        with test_client_environment(), hashers, \
+                override_settings(
+                    USER_BATCH_MAX_SIZE=max(size, settings.USER_BATCH_MAX_SIZE),
+                    REST_FRAMEWORK={
+                        **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates,
+                    },
+                ), \
+                seeded_users(1, prefix=PREFIX) as (staff,):
+            staff.is_staff = True
+            staff.save(update_fields=['is_staff'])
+            client = APIClient()
+            client.force_authenticate(user=staff)
+
+            for name, (url, bodies) in cases.items():
+                requests, elapsed = self.run(client, url, bodies)
+                report[name] = {
+                    'users': count,
+                    'requests': requests,
+                    'seconds': round(elapsed, 3),
+                    'users_per_second': round(count / elapsed, 1),
+                }
+
+        write_report(self, report, as_json=options['json'])
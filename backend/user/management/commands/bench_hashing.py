@@ -0,0 +1,84 @@
+"""
+Django custom command to benchmark mixed /token/ & /me/ traffic with and
+without the password hashing pool.
+"""
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.bench import (
+    BENCH_PASSWORD,
+    run_concurrently,
+    seeded_users,
+    summarize,
+    test_client_environment,
+    write_report,
+)
+
+
+class Command(BaseCommand):
+    """Throughput of mixed login & profile traffic, inline vs pooled hashing."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=2, help='Hashing pool size.')
+        parser.add_argument('--pending', type=int, default=16, help='Hashing queue size.')
+        parser.add_argument(
+            '--login-ratio', type=float, default=0.2,
+            help='Share of the requests that go to /token/.',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        token_url, me_url = reverse('user:token'), reverse('user:me')
+        every = max(round(1 / options['login_ratio']), 1) if options['login_ratio'] else 0
+        report = {}
+
+        with test_client_environment(), \
+                seeded_users(options['users'], prefix='bench-hash') as users:
+            tokens = [Token.objects.create(user=user).key for user in users]
+
+            def request(i):
+                user = users[i % len(users)]
+                client = APIClient()
+                if every and i % every == 0:
+                    credentials = {'email': user.email, 'password': BENCH_PASSWORD}
+                    res = client.post(token_url, credentials)
+                    label = 'token'
+                else:
+                    client.credentials(HTTP_AUTHORIZATION=f'Token {tokens[i % len(tokens)]}')
+                    res = client.get(me_url)
+                    label = 'me'
+                return label if res.status_code < 500 else f'{label}_shed'
+
+            modes = {
+                'inline': {'MAX_WORKERS': 0, 'MAX_PENDING': 0},
+                'pooled': {
+                    'MAX_WORKERS': options['workers'],
+                    'MAX_PENDING': options['pending'],
+                },
+            }
+            for mode, conf in modes.items():
+                with override_settings(PASSWORD_HASHING=conf):
+                    latencies, elapsed = run_concurrently(
+                        request, options['requests'], options['concurrency'],
+                    )
+                all_latencies = [lat for values in latencies.values() for lat in values]
+                results = {'total': summarize(all_latencies, elapsed)}
+                for label, values in sorted(latencies.items()):
+                    results[label] = summarize(values, elapsed)
+                report[mode] = results
+
+        if options['json']:
+            write_report(self, report, as_json=True)
+            return
+        for mode, results in report.items():
+            write_report(self, {f'{mode}/{label}': res for label, res in results.items()})
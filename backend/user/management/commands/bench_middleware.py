@@ -0,0 +1,51 @@
+"""
+Django custom command to benchmark the per-request cost of the middleware
+stack on /api/user/me/, with & without the lean API mode.
+
+Sends --requests GETs authenticated with a (cached) token through the full
+stack (`LEAN_MIDDLEWARE_PATHS` empty) and through the lean one, alternating
+rounds so both see the same conditions. Reports latencies per case.
+"""
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.bench import seeded_users, summarize, test_client_environment, timed, write_report
+
+PREFIX = 'bench-middleware'
+
+
+class Command(BaseCommand):
+    """Latency of GET /api/user/me/ through the full & the lean middleware stacks."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per case.')
+        parser.add_argument('--rounds', type=int, default=4)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        url = reverse('user:me')
+        cases = {'full stack': [], 'lean API stack': ['/api/']}
+        latencies = {name: [] for name in cases}
+        per_round = max(options['requests'] // options['rounds'], 1)
+
+        with test_client_environment(), seeded_users(1, prefix=PREFIX) as (user,):
+            token = Token.objects.create(user=user)
+            for _ in range(options['rounds']):
+                for name, paths in cases.items():
+                    with override_settings(LEAN_MIDDLEWARE_PATHS=paths):
+                        client = APIClient(HTTP_AUTHORIZATION=f'Token {token.key}')
+                        # Warm up (token cache, URL resolver).
+                        timed(lambda: client.get(url), 20)
+                        latencies[name] += timed(lambda: client.get(url), per_round)
+
+        report = {name: summarize(values) for name, values in latencies.items()}
+        full, lean = (report[name]['mean_ms'] for name in cases)
+        report['lean API stack']['saved_ms_per_request'] = round(full - lean, 3)
+        write_report(self, report, as_json=options['json'])
@@ -0,0 +1,82 @@
+"""
+Django custom command to benchmark rendering & parsing of user payloads.
+
+Compares DRF's stdlib JSON renderer/parser with the orjson ones & MessagePack
+(`core.renderers`, `core.parsers`) on a single `UserSerializer` payload and on
+a list of --users directory entries. Nothing touches the database.
+"""
+
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.bench import summarize, timed, write_report
+from core.parsers import MessagePackParser, ORJSONParser
+from user.serializers import UserDirectorySerializer, UserSerializer
+
+
+class Command(BaseCommand):
+    """Per-call render & parse time of each format for user payloads."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Size of the list.')
+        parser.add_argument('--repeat', type=int, default=1000, help='Runs for one user.')
+        parser.add_argument('--list-repeat', type=int, default=20, help='Runs for the list.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def make_payloads(self, count):
+        """Return `(one user, list of users)` as the serializers output them."""
+        user_model = get_user_model()
+        now = timezone.now()
+        users = [
+            user_model(
+                id=i, email=f'user{i}@example.com', name=f'User Zoë {i}',
+                is_active=True, last_login=now - timedelta(minutes=i),
+            )
+            for i in range(1, count + 1)
+        ]
+        return UserSerializer(users[0]).data, UserDirectorySerializer(users, many=True).data
+
+    def handle(self, *args, **options):
+        one, many = self.make_payloads(options['users'])
+        formats = {
+            'stdlib json': (JSONRenderer(), JSONParser()),
+            'orjson': (renderers.ORJSONRenderer(), ORJSONParser()),
+        }
+        if renderers.orjson is None:
+            self.stderr.write('orjson is not installed; "orjson" is the stdlib fallback.')
+        if renderers.msgpack is not None:
+            formats['msgpack'] = (renderers.MessagePackRenderer(), MessagePackParser())
+        else:
+            self.stderr.write('msgpack is not installed; skipping MessagePack.')
+
+        report = {}
+        payloads = {
+            'one user': (one, options['repeat']),
+            f'{len(many)} users': (many, options['list_repeat']),
+        }
+        for payload_name, (data, repeat) in payloads.items():
+            for format_name, (renderer, parser) in formats.items():
+                body = renderer.render(data)
+                render = summarize(timed(lambda: renderer.render(data), repeat))
+                parse = summarize(
+                    timed(lambda: parser.parse(io.BytesIO(body), parser.media_type), repeat)
+                )
+                report[f'{payload_name}/{format_name}'] = {
+                    'bytes': len(body),
+                    'render_mean_ms': render['mean_ms'],
+                    'render_p95_ms': render['p95_ms'],
+                    'parse_mean_ms': parse['mean_ms'],
+                    'parse_p95_ms': parse['p95_ms'],
+                }
+
+        write_report(self, report, as_json=options['json'])
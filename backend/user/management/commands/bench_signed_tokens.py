@@ -0,0 +1,68 @@
+"""
+Django custom command to benchmark token verification: signed vs DB-backed.
+
+Times `authenticate_credentials()` (the part of authentication that checks the
+token) for the stock `TokenAuthentication`, `CachedTokenAuthentication` and
+`SignedTokenAuthentication`, plus the bare HMAC check of a signed token.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.bench import seeded_users, summarize, timed, write_report
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    get_token_cache,
+    get_user_cache,
+)
+
+
+class Command(BaseCommand):
+    """Compare the cost of verifying opaque (DB) vs signed tokens."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        report = {}
+
+        with seeded_users(options['users'], prefix='bench-signed') as users:
+            keys = [Token.objects.create(user=user).key for user in users]
+            signed = [tokens.issue(user)['access'] for user in users]
+            get_token_cache().clear()
+            get_user_cache().clear()
+
+            cases = {
+                'TokenAuthentication': (TokenAuthentication(), keys),
+                'CachedTokenAuthentication': (CachedTokenAuthentication(), keys),
+                'SignedTokenAuthentication': (SignedTokenAuthentication(), signed),
+            }
+            for name, (auth, credentials) in cases.items():
+                calls = iter(range(options['requests']))
+
+                def verify():
+                    auth.authenticate_credentials(credentials[next(calls) % len(credentials)])
+
+                with CaptureQueriesContext(connection) as queries:
+                    latencies = timed(verify, options['requests'])
+                results = summarize(latencies)
+                results['queries_per_request'] = round(len(queries) / options['requests'], 3)
+                report[name] = results
+
+            calls = iter(range(options['requests']))
+            report['signature check only'] = summarize(timed(
+                lambda: tokens.verify_access(signed[next(calls) % len(signed)]),
+                options['requests'],
+            ))
+
+        write_report(self, report, as_json=options['json'])
@@ -0,0 +1,90 @@
+"""
+Django custom command to benchmark the overhead of the login/signup throttles.
+
+Times `allow_request()` of the login throttles (IP + email, as the view runs
+them) against every counter store, for requests that get through and for
+rejected ones.
+"""
+
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from rest_framework.request import Request
+from rest_framework.parsers import JSONParser
+from rest_framework.test import APIRequestFactory
+
+from core.bench import summarize, timed, write_report
+from user.throttles import LoginEmailThrottle, LoginIPThrottle
+
+THROTTLES = (LoginIPThrottle, LoginEmailThrottle)
+
+
+class Command(BaseCommand):
+    """Report the per-request cost of the login throttles for each store."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+        parser.add_argument(
+            '--clients', type=int, default=1000,
+            help='Distinct IPs/emails the allowed requests come from.',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def make_requests(self, count):
+        """Return `count` parsed login requests from distinct IPs & emails."""
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(count):
+            request = Request(
+                factory.post(
+                    '/', {'email': f'user{i}@example.com', 'password': 'x'},
+                    format='json', REMOTE_ADDR=f'10.{i // 65536}.{i // 256 % 256}.{i % 256}',
+                ),
+                parsers=[JSONParser()],
+            )
+            request.data  # Parse now; the view would anyway.
+            requests.append(request)
+        return requests
+
+    def handle(self, *args, **options):
+        requests = self.make_requests(options['clients'])
+        fd, path = tempfile.mkstemp(suffix='.throttle')
+        os.close(fd)
+        stores = {
+            'local': {'BACKEND': 'local', 'MAX_SIZE': 100000},
+            'cache': {'BACKEND': 'cache', 'ALIAS': 'default'},
+            'shared_memory': {'BACKEND': 'shared_memory', 'PATH': path, 'SLOTS': 65536},
+        }
+        report = {}
+
+        try:
+            for name, store in stores.items():
+                for case, rate in (('allowed', '1000000/min'), ('rejected', '1/min')):
+                    rates = {'login_ip': rate, 'login_email': rate}
+                    calls = iter(range(options['requests']))
+
+                    def check():
+                        request = requests[next(calls) % len(requests)]
+                        for throttle_class in THROTTLES:
+                            throttle_class().allow_request(request, None)
+
+                    with override_settings(
+                        THROTTLE_STORE=store,
+                        REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates},
+                    ):
+                        # Use up the 1/min of every client for the rejected case.
+                        for request in requests:
+                            for throttle_class in THROTTLES:
+                                throttle_class().allow_request(request, None)
+                        report[f'{name} ({case})'] = summarize(
+                            timed(check, options['requests'])
+                        )
+        finally:
+            os.remove(path)
+
+        write_report(self, report, as_json=options['json'])
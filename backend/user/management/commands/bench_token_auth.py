@@ -0,0 +1,68 @@
+"""
+Django custom command to benchmark token authentication on /api/user/me/.
+"""
+
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.bench import (
+    seeded_users,
+    summarize,
+    test_client_environment,
+    timed,
+    write_report,
+)
+from user.authentication import CachedTokenAuthentication, get_token_cache
+from user.views import ManageUserView
+
+
+class Command(BaseCommand):
+    """Compare DB queries & latency per request: stock vs cached token auth."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        url = reverse('user:me')
+        report = {}
+
+        with test_client_environment(), \
+                seeded_users(options['users'], prefix='bench-auth') as users:
+            clients = []
+            for user in users:
+                token = Token.objects.create(user=user)
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+                clients.append(client)
+
+            for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+                get_token_cache().clear()
+                calls = iter(range(options['requests']))
+
+                def request():
+                    res = clients[next(calls) % len(clients)].get(url)
+                    assert res.status_code == 200, res.status_code
+
+                with patch.object(ManageUserView, 'authentication_classes', [auth_class]), \
+                        CaptureQueriesContext(connection) as queries:
+                    latencies = timed(request, options['requests'])
+
+                results = summarize(latencies)
+                results['queries_per_request'] = round(len(queries) / options['requests'], 3)
+                if auth_class is CachedTokenAuthentication:
+                    results.update(get_token_cache().stats())
+                report[auth_class.__name__] = results
+
+        write_report(self, report, as_json=options['json'])
@@ -0,0 +1,175 @@
+"""
+Django custom command to load-test the user API endpoints.
+
+Seeds users, drives concurrent traffic against /api/user/create/, /token/ &
+/me/ (in-process through the test client, or against a running server with
+--url) and reports throughput, latency percentiles & DB queries per request.
+Use --output to save the JSON report & compare it across commits.
+"""
+
+import json
+import subprocess
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.bench import (
+    BENCH_EMAIL_DOMAIN,
+    BENCH_PASSWORD,
+    run_concurrently,
+    seeded_users,
+    summarize,
+    test_client_environment,
+    write_report,
+)
+
+ENDPOINTS = ('create', 'token', 'me')
+
+
+def git_revision():
+    """Return the current commit (if we're in a git checkout) for the report."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """Load-test the user API & report throughput, latency & queries/request."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Users to seed.')
+        parser.add_argument(
+            '--requests', type=int, default=200, help='Requests per endpoint.',
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--endpoints', default=','.join(ENDPOINTS),
+            help=f'Comma separated subset of: {", ".join(ENDPOINTS)}.',
+        )
+        parser.add_argument(
+            '--url', help='Base URL of a running server (e.g. http://localhost:8000). '
+                          'Defaults to calling the app in-process.',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        endpoints = options['endpoints'].split(',')
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoint(s): {", ".join(sorted(unknown))}')
+
+        if options['url']:
+            send = self.http_sender(options['url'])
+        else:
+            send = self.in_process_sender()
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'target': options['url'] or 'in-process',
+                'users': options['users'],
+                'concurrency': options['concurrency'],
+            },
+        }
+
+        with test_client_environment(), \
+                seeded_users(options['users'], prefix='bench-api') as users:
+            tokens = [Token.objects.create(user=user).key for user in users]
+            requests = {
+                'create': lambda i: send('POST', reverse('user:create'), data={
+                    'email': f'bench-api-new{i}@{BENCH_EMAIL_DOMAIN}',
+                    'password': BENCH_PASSWORD,
+                    'name': f'bench-api new user {i}',
+                }),
+                'token': lambda i: send('POST', reverse('user:token'), data={
+                    'email': users[i % len(users)].email,
+                    'password': BENCH_PASSWORD,
+                }),
+                'me': lambda i: send(
+                    'GET', reverse('user:me'), token=tokens[i % len(tokens)],
+                ),
+            }
+            for endpoint in endpoints:
+                report[endpoint] = self.run_endpoint(requests[endpoint], options)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        write_report(self, report, as_json=options['json'])
+
+    def run_endpoint(self, request, options):
+        """Fire `--requests` requests at one endpoint & summarize them."""
+        queries = []
+        lock = threading.Lock()
+
+        def call(i):
+            status_code, query_count = request(i)
+            if query_count is not None:
+                with lock:
+                    queries.append(query_count)
+            return 'ok' if status_code < 400 else 'error'
+
+        latencies, elapsed = run_concurrently(
+            call, options['requests'], options['concurrency'],
+        )
+        results = summarize(
+            [lat for values in latencies.values() for lat in values], elapsed,
+        )
+        results['errors'] = len(latencies.get('error', []))
+        results['queries_per_request'] = (
+            round(sum(queries) / len(queries), 3) if queries else None
+        )
+        return results
+
+    def in_process_sender(self):
+        """Send requests through the test client, counting this thread's DB queries."""
+        def send(method, path, data=None, token=None):
+            client = APIClient()
+            if token:
+                client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+            with CaptureQueriesContext(connection) as queries:
+                if method == 'GET':
+                    res = client.get(path)
+                else:
+                    res = client.post(path, data, format='json')
+            return res.status_code, len(queries)
+
+        return send
+
+    def http_sender(self, base_url):
+        """Send requests to a running server; DB queries can't be counted there."""
+        def send(method, path, data=None, token=None):
+            headers = {'Content-Type': 'application/json'}
+            if token:
+                headers['Authorization'] = f'Token {token}'
+            req = urllib.request.Request(
+                base_url.rstrip('/') + path,
+                data=None if data is None else json.dumps(data).encode(),
+                headers=headers,
+                method=method,
+            )
+            try:
+                with urllib.request.urlopen(req, timeout=60) as res:
+                    res.read()
+                    return res.status, None
+            except urllib.error.HTTPError as exc:
+                return exc.code, None
+
+        return send
@@ -0,0 +1,91 @@
+"""
+Django custom command to benchmark deep pages of the staff user directory.
+
+Seeds a large user table and times /api/user/ on the first page vs a page deep
+into the table, with the keyset (cursor) pagination the view uses and with
+LIMIT/OFFSET pagination for comparison.
+"""
+
+from base64 import b64encode
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.urls import reverse
+
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.test import APIClient
+
+from core.bench import (
+    seeded_users,
+    summarize,
+    test_client_environment,
+    timed,
+    write_report,
+)
+from user.views import UserDirectoryView
+
+
+def cursor_after(pk):
+    """Return the `?cursor=` token of the page starting right after `pk`."""
+    return b64encode(urlencode({'p': pk}).encode()).decode()
+
+
+class Command(BaseCommand):
+    """Compare page 1 vs a deep page of /api/user/: cursor vs offset pagination."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10_000, help='The deep page.')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument(
+            '--users', type=int, default=None,
+            help='Users to seed; defaults to enough for --page.',
+        )
+        parser.add_argument('--requests', type=int, default=100, help='Requests per case.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        page, size = options['page'], options['page_size']
+        count = options['users'] or page * size
+        url = reverse('user:list')
+        report = {}
+
+        self.stdout.write(f'Seeding {count} users...')
+        with test_client_environment(), seeded_users(count, prefix='bench-dir') as users:
+            staff = users[0]
+            staff.is_staff = True
+            staff.save(update_fields=['is_staff'])
+            client = APIClient()
+            client.force_authenticate(user=staff)
+            # Fresh statistics, as a production table would have.
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE core_user')
+
+            # The row right before the deep page (seeded users come in id order).
+            last_seen = users[min((page - 1) * size, count) - 1].pk
+            cases = {
+                'cursor page 1': {},
+                f'cursor page {page}': {'cursor': cursor_after(last_seen)},
+                'offset page 1': {'limit': size},
+                f'offset page {page}': {'limit': size, 'offset': (page - 1) * size},
+            }
+
+            for name, params in cases.items():
+                params = {'page_size': size, **params}
+                pagination_class = (
+                    LimitOffsetPagination if name.startswith('offset')
+                    else UserDirectoryView.pagination_class
+                )
+
+                def request():
+                    res = client.get(url, params)
+                    assert res.status_code == 200, res.status_code
+
+                with patch.object(UserDirectoryView, 'pagination_class', pagination_class):
+                    report[name] = summarize(timed(request, options['requests']))
+
+        write_report(self, report, as_json=options['json'])
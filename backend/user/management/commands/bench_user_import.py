@@ -0,0 +1,90 @@
+"""
+Django custom command to benchmark bulk user imports against `create_user()`.
+
+Reports rows/second of creating users one `create_user()` at a time (on a
+sample, it's slow) and of `User.objects.bulk_import()` with `bulk_create()`
+& (on Postgres) `COPY`. With --fast-hasher passwords get a cheap hash, so
+the numbers show the database side only.
+"""
+
+import time
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from core.bench import BENCH_EMAIL_DOMAIN, BENCH_PASSWORD, write_report
+
+PREFIX = 'bench-import'
+
+
+def make_rows(count, method):
+    for i in range(count):
+        yield {
+            'email': f'{PREFIX}-{method}-{i}@{BENCH_EMAIL_DOMAIN}',
+            'name': f'Imported user {i}',
+            'password': BENCH_PASSWORD,
+        }
+
+
+class Command(BaseCommand):
+    """Rows/second of the per-row & bulk user creation paths."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Rows per bulk import.')
+        parser.add_argument(
+            '--per-row-sample', type=int, default=100,
+            help='Users created with `create_user()` to time the per-row path.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, help='Hashing processes (default: CPUs).')
+        parser.add_argument(
+            '--fast-hasher', action='store_true',
+            help='Hash with MD5 to measure the database writes alone.',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        hashers = override_settings(
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        ) if options['fast_hasher'] else nullcontext()
+        methods = ['bulk'] + (['copy'] if connection.vendor == 'postgresql' else [])
+        report = {}
+
+        try:
+            with hashers:
+                start = time.perf_counter()
+                for row in make_rows(options['per_row_sample'], 'row'):
+                    user_model.objects.create_user(**row)
+                elapsed = time.perf_counter() - start
+                report['create_user() per row'] = {
+                    'rows': options['per_row_sample'],
+                    'seconds': round(elapsed, 3),
+                    'rows_per_second': round(options['per_row_sample'] / elapsed, 1),
+                }
+
+                for method in methods:
+                    start = time.perf_counter()
+                    result = user_model.objects.bulk_import(
+                        make_rows(options['rows'], method),
+                        batch_size=options['batch_size'],
+                        workers=options['workers'],
+                        method=method,
+                    )
+                    elapsed = time.perf_counter() - start
+                    report[f'bulk_import({method})'] = {
+                        'rows': result.created,
+                        'seconds': round(elapsed, 3),
+                        'rows_per_second': round(result.created / elapsed, 1),
+                    }
+        finally:
+            user_model.objects.filter(
+                email__startswith=PREFIX, email__endswith=BENCH_EMAIL_DOMAIN,
+            ).delete()
+
+        write_report(self, report, as_json=options['json'])
@@ -0,0 +1,53 @@
+"""
+Django custom command to export users as NDJSON or CSV.
+
+Streams from a server-side cursor (see `user.export`), so dumping millions of
+users takes as little memory as dumping ten.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.renderers import CSVRenderer, NDJSONRenderer
+from user import export
+
+RENDERERS = {'ndjson': NDJSONRenderer, 'csv': CSVRenderer}
+FLAGS = {'true': True, 'false': False}
+
+
+class Command(BaseCommand):
+    """Write the users, optionally filtered, to a file or stdout."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=RENDERERS, default='ndjson')
+        parser.add_argument(
+            '--fields', default='',
+            help=f'Comma separated subset of: {", ".join(export.EXPORT_FIELDS)}.',
+        )
+        parser.add_argument('--is-active', choices=FLAGS)
+        parser.add_argument('--is-staff', choices=FLAGS)
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+        parser.add_argument('--output', '-o', help='File to write to; stdout by default.')
+
+    def handle(self, *args, **options):
+        try:
+            fields = export.parse_fields(options['fields'])
+        except ValueError as exc:
+            raise CommandError(f'Unknown field(s): {exc}')
+        queryset = export.export_queryset(
+            fields,
+            is_active=FLAGS.get(options['is_active']),
+            is_staff=FLAGS.get(options['is_staff']),
+        )
+        chunks = export.stream_users(
+            RENDERERS[options['format']](), queryset, fields, options['chunk_size'],
+        )
+
+        if options['output']:
+            with open(options['output'], 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
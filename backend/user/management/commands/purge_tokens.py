@@ -0,0 +1,66 @@
+"""
+Django custom command to delete expired auth tokens.
+
+Walks `authtoken_token` in primary key order, deleting at most --batch-size
+expired tokens per transaction and sleeping in between, so it can run against
+a live database without holding locks for long. With sharded users (see
+`core.shards`) every shard is purged in turn.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.authtoken.models import Token
+
+from core import shards
+from user.authentication import token_expiry_cutoff
+
+
+class Command(BaseCommand):
+    """Delete the tokens older than `AUTH_TOKEN_TTL` in small batches."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0.1,
+            help='Seconds to pause between batches.',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = token_expiry_cutoff()
+        if cutoff is None:
+            raise CommandError('Tokens never expire (AUTH_TOKEN_TTL is 0); nothing to purge.')
+
+        deleted = batches = 0
+        for using in shards.aliases():
+            last_key = ''
+            while True:
+                with transaction.atomic(using=using):
+                    # Keyset on the pk: every batch starts where the previous one ended.
+                    keys = list(
+                        Token.objects.using(using)
+                        .filter(key__gt=last_key, created__lt=cutoff)
+                        .order_by('key')
+                        .values_list('key', flat=True)[:options['batch_size']]
+                    )
+                    if not keys:
+                        break
+                    # A queryset delete, so the token cache hears about it (`user.signals`).
+                    Token.objects.using(using).filter(key__in=keys).delete()
+
+                deleted += len(keys)
+                batches += 1
+                last_key = keys[-1]
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Batch {batches}: {len(keys)} tokens deleted.')
+                if len(keys) < options['batch_size']:
+                    break
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired token(s) in {batches} batch(es).'
+        ))
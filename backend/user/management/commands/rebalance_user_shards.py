@@ -0,0 +1,130 @@
+"""
+Django custom command to move users (& their tokens, groups & permissions)
+to the shard they belong to, after the `USER_SHARDS` changed (see
+`core.shards`).
+
+Walks the users of every shard (& of the --drain databases being retired) in
+primary key order, --batch-size at a time. A user on the wrong shard is
+copied to the right one, with the same pk & tokens, then deleted from where
+it was. Users from before sharding was turned on have a pk without their
+slot: they get a new one, & lose their tokens (their keys don't lead to the
+shard either), so they'll have to log in again.
+
+The groups of `default` are copied to every shard first (`sync_groups()`).
+
+Safe to run again after an interruption: the copies that made it are skipped.
+"""
+
+import copy
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from rest_framework.authtoken.models import Token
+
+from core import shards
+
+
+class Command(BaseCommand):
+    """Put every user on its shard."""
+
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drain', nargs='+', default=[], metavar='ALIAS',
+            help='Databases no longer in USER_SHARDS to move the users out of.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the users that would be moved or re-keyed.',
+        )
+
+    def handle(self, *args, **options):
+        unknown = [alias for alias in options['drain'] if alias not in connections]
+        if unknown:
+            raise CommandError(f'Unknown database(s): {", ".join(unknown)}')
+
+        if not options['dry_run']:
+            # New shards haven't got them yet.
+            shards.sync_groups()
+
+        moved = rekeyed = 0
+        for source in [*shards.aliases(), *options['drain']]:
+            for user in self.users(source, options['batch_size']):
+                pk = user.pk
+                if shards.enabled() and shards.id_slot(pk) != shards.email_slot(user.email):
+                    pk = shards.new_user_id(user.email)
+                target = shards.shard_for_slot(shards.id_slot(pk))
+                if pk == user.pk and target == source:
+                    continue
+
+                if not options['dry_run']:
+                    self.move(user, source, target, pk)
+                if pk == user.pk:
+                    moved += 1
+                else:
+                    rekeyed += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'User {user.pk}: {source} -> {target} (pk {pk}).')
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Moved {moved} user(s), re-keyed {rekeyed} user(s).'
+        ))
+
+    @staticmethod
+    def users(using, batch_size):
+        """The users on `using`, read in keyset batches (moving them is fine)."""
+        users = get_user_model().objects.using(using).order_by('pk')
+        page = users
+        while True:
+            batch = list(page[:batch_size])
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            page = users.filter(pk__gt=batch[-1].pk)
+
+    @staticmethod
+    def move(user, source, target, pk):
+        """Copy `user` to `target` as `pk`, then delete it from `source`."""
+        user_model = get_user_model()
+        # Every shard has the groups, under the same pks.
+        groups = list(user.groups.values_list('pk', flat=True))
+        permissions = list(user.user_permissions.values_list(
+            'codename', 'content_type__app_label', 'content_type__model',
+        ))
+        # Re-keyed users keep no token: theirs don't carry their slot.
+        tokens = []
+        if pk == user.pk:
+            tokens = list(Token.objects.using(source).filter(user_id=user.pk))
+
+        with transaction.atomic(using=target), transaction.atomic(using=source):
+            if source == target:
+                # Re-keyed in place; the email must be free for the copy.
+                user_model.objects.using(source).filter(pk=user.pk).delete()
+
+            moved = copy.copy(user)
+            moved.pk = pk
+            moved._state = copy.copy(user._state)
+            moved._state.adding, moved._state.db = True, None
+            # Skips the copy left by an interrupted run.
+            user_model.objects.db_manager(target).bulk_create([moved], ignore_conflicts=True)
+            moved = user_model.objects.db_manager(target).get_by_natural_key(user.email)
+
+            moved.groups.add(*groups)
+            moved.user_permissions.add(*(
+                Permission.objects.db_manager(target).get_by_natural_key(*natural_key)
+                for natural_key in permissions
+            ))
+            Token.objects.using(target).bulk_create(
+                [Token(key=token.key, user=moved, created=token.created) for token in tokens],
+                ignore_conflicts=True,
+            )
+
+            if source != target:
+                # Its tokens go too (& out of the token cache, `user.signals`).
+                user_model.objects.using(source).filter(pk=user.pk).delete()
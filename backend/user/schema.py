@@ -0,0 +1,17 @@
+"""
+OpenAPI (drf-spectacular) extensions for the user API.
+"""
+
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.plumbing import build_bearer_security_scheme_object
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    """Document `SignedTokenAuthentication` as HTTP bearer auth."""
+    target_class = 'user.authentication.SignedTokenAuthentication'
+    name = 'signedToken'
+
+    def get_security_definition(self, auto_schema):
+        return build_bearer_security_scheme_object(
+            header_name='Authorization', token_prefix=self.target.keyword,
+        )
@@ -2,14 +2,38 @@
 Serializers for the user API view.
 """
 
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model, authenticate, aauthenticate
 
-from rest_framework import serializers
+from rest_framework import serializers, status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
 
 from django.utils.translation import gettext_lazy as _
 
+from core import hashing, shards
+from core.perf import TimedSerializerMixin
+from user import tokens
 
-class UserSerializer(serializers.ModelSerializer):
+
+def email_taken_message():
+    """The model's "email already exists" message, for our own uniqueness checks."""
+    field = get_user_model()._meta.get_field('email')
+    return field.error_messages['unique'] % {
+        'model_name': field.model._meta.verbose_name,
+        'field_label': field.verbose_name,
+    }
+
+
+class EmailUniqueValidator(UniqueValidator):
+    """`UniqueValidator` looking on the shard the email belongs to (`core.shards`)."""
+
+    def filter_queryset(self, value, queryset, field_name):
+        queryset = queryset.using(shards.db_for_email(value))
+        return super().filter_queryset(value, queryset, field_name)
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the user object."""
 
     class Meta:
@@ -19,9 +43,30 @@ class UserSerializer(serializers.ModelSerializer):
         # `write_only`: the corresponding field won't be returned back in the response.
         # N.B. If validation tests fail, serializer sends 400_BAD_REQUEST.
         extra_kwargs = {
-            'password': {'write_only': True, 'min_length': 8}
+            'password': {'write_only': True, 'min_length': 8},
+            # Emails are unique regardless of case (`email__ciexact` uses the index).
+            'email': {'validators': [EmailUniqueValidator(
+                queryset=get_user_model().objects.all(),
+                lookup='ciexact',
+                message=email_taken_message(),
+            )]},
         }
 
+    def validate_email(self, value):
+        """
+        With sharding, the user's id & tokens carry the slot of their email;
+        refuse a new email that would put them on another slot.
+        """
+        if (
+            self.instance is not None and shards.enabled()
+            and shards.email_slot(value) != shards.email_slot(self.instance.email)
+        ):
+            raise serializers.ValidationError(
+                _('This email address cannot be used for this account.'),
+                code='shard',
+            )
+        return value
+
     def create(self, validated_data):
         """Create & return a user with encrypted password."""
         return get_user_model().objects.create_user(**validated_data)
@@ -32,6 +77,7 @@ class UserSerializer(serializers.ModelSerializer):
         user = super().update(instance, validated_data)
 
         if password:
+            # Hashed on the bounded pool (see `core.hashing`).
             user.set_password(password)
             user.save()
 
@@ -39,7 +85,92 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class AuthTokenSerializer(serializers.Serializer):
+class UserBatchSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    A batch of users to create, with partial failure: an invalid item (or one
+    with a taken email) doesn't fail the others, it's kept as its
+    `ValidationError` & reported in its place by `data`. Emails are checked
+    with one query for the whole batch & the valid users are hashed in
+    parallel (`core.hashing.make_passwords()`) & inserted with `bulk_create()`.
+    """
+
+    def run_child_validation(self, data):
+        try:
+            return super().run_child_validation(data)
+        except serializers.ValidationError as exc:
+            return exc
+
+    def validate(self, attrs):
+        """Fail the items whose email is taken, or repeated in the batch."""
+        user_model = get_user_model()
+        valid = [item for item in attrs if not isinstance(item, serializers.ValidationError)]
+        taken = user_model.objects.taken_emails(item['email'] for item in valid)
+        seen = set()
+        for index, item in enumerate(attrs):
+            if isinstance(item, serializers.ValidationError):
+                continue
+            email = item['email'].lower()
+            if email in taken or email in seen:
+                attrs[index] = self.email_taken()
+            seen.add(email)
+        return attrs
+
+    @staticmethod
+    def email_taken():
+        return serializers.ValidationError(
+            {'email': [ErrorDetail(email_taken_message(), code='unique')]}
+        )
+
+    def create(self, validated_data):
+        """Create the valid users; return them & the errors, in batch order."""
+        user_model = get_user_model()
+        results = list(validated_data)
+        indexes = [
+            index for index, item in enumerate(results)
+            if not isinstance(item, serializers.ValidationError)
+        ]
+        passwords = hashing.make_passwords([results[index]['password'] for index in indexes])
+        users = [
+            user_model(**{
+                **results[index],
+                'email': user_model.objects.normalize_email(results[index]['email']),
+                'password': encoded,
+            })
+            for index, encoded in zip(indexes, passwords)
+        ]
+        conflicts = user_model.objects.insert_users(users)
+        for position, (index, user) in enumerate(zip(indexes, users)):
+            results[index] = self.email_taken() if position in conflicts else user
+        return results
+
+    def save(self):
+        # `ListSerializer.save()` expects every item to be valid.
+        self.instance = self.create(self.validated_data)
+        return self.instance
+
+    def to_representation(self, data):
+        """Per item: `{"status": 201, "data": user}` or `{"status": 400, "errors": ...}`."""
+        return [
+            {'status': status.HTTP_400_BAD_REQUEST, 'errors': item.detail}
+            if isinstance(item, serializers.ValidationError) else
+            {'status': status.HTTP_201_CREATED, 'data': self.child.to_representation(item)}
+            for item in data
+        ]
+
+
+class UserBatchItemSerializer(UserSerializer):
+    """One user of a `UserBatchSerializer`, which checks the emails together."""
+
+    class Meta(UserSerializer.Meta):
+        list_serializer_class = UserBatchSerializer
+        extra_kwargs = {
+            **UserSerializer.Meta.extra_kwargs,
+            # Checked for the whole batch by `UserBatchSerializer.validate()`.
+            'email': {'validators': []},
+        }
+
+
+class AuthTokenSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer for the user auth token."""
     email = serializers.EmailField()
     # Hides the pass when typed in.
@@ -72,3 +203,119 @@ class AuthTokenSerializer(serializers.Serializer):
         # This allows the view that calls this serializer to retrieve the authenticated user.
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer exchanging a signed refresh token for a new token pair."""
+    refresh = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        """Check the token, then that its user is still active & on the same version."""
+        msg = _('Invalid or expired refresh token.')
+        try:
+            user_id, version = tokens.verify_refresh(attrs['refresh'])
+        except tokens.InvalidToken:
+            raise serializers.ValidationError(msg, code='authorization')
+
+        user = (
+            get_user_model().objects.using(shards.db_for_user_id(user_id))
+            .filter(pk=user_id, is_active=True).first()
+        )
+        if user is None or user.token_version != version:
+            raise serializers.ValidationError(msg, code='authorization')
+
+        attrs['user'] = user
+        return attrs
+
+
+class UserDirectorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Read-only user listing for staff.
+    `fields`: optional subset of `Meta.fields` to return (the view fetches
+    only those columns too).
+    """
+
+    class Meta:
+        model = get_user_model()
+        fields = ['id', 'email', 'name', 'is_active', 'is_staff', 'last_login', 'last_seen']
+        read_only_fields = fields
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class AsyncUserSerializer(UserSerializer):
+    """
+    `UserSerializer` for the async views.
+    DRF validators & `save()` are sync, so the email uniqueness check and the
+    create/update run through the async ORM in `ais_valid()` & `asave()`.
+    """
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            **UserSerializer.Meta.extra_kwargs,
+            # Checked in `ais_valid()` instead of by (sync) `UniqueValidator`.
+            'email': {'validators': []},
+        }
+
+    async def ais_valid(self):
+        """Run the field validation, then check the email is not taken."""
+        if not self.is_valid():
+            return False
+
+        email = self.validated_data.get('email')
+        if email is not None:
+            users = get_user_model().objects.for_email(email).filter(email__ciexact=email)
+            if self.instance is not None:
+                users = users.exclude(pk=self.instance.pk)
+            if await users.aexists():
+                msg = email_taken_message()
+                self._errors = {'email': [ErrorDetail(msg, code='unique')]}
+                return False
+
+        return True
+
+    async def asave(self):
+        """Async counterpart of `save()` using `create()`/`update()` semantics."""
+        validated_data = dict(self.validated_data)
+        if self.instance is None:
+            self.instance = await get_user_model().objects.acreate_user(**validated_data)
+            return self.instance
+
+        password = validated_data.pop('password', None)
+        for attr, value in validated_data.items():
+            setattr(self.instance, attr, value)
+        if password:
+            await self.instance.aset_password(password)
+        await self.instance.asave()
+        return self.instance
+
+
+class AsyncAuthTokenSerializer(AuthTokenSerializer):
+    """`AuthTokenSerializer` for the async views; authenticates in `ais_valid()`."""
+
+    def validate(self, attrs):
+        # `authenticate()` is sync; see `ais_valid()`.
+        return attrs
+
+    async def ais_valid(self):
+        if not self.is_valid():
+            return False
+
+        user = await aauthenticate(
+            request=self.context.get('request'),
+            username=self.validated_data['email'],
+            password=self.validated_data['password'],
+        )
+        if not user:
+            msg = _('Credentials do NOT match!')
+            self._errors = {
+                api_settings.NON_FIELD_ERRORS_KEY: [ErrorDetail(msg, code='authorization')],
+            }
+            return False
+
+        self.validated_data['user'] = user
+        return True
@@ -0,0 +1,25 @@
+"""
+Signal handlers keeping the user API caches in sync with the database.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import DELETED, get_token_cache, get_user_cache
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_tokens(sender, instance, signal, **kwargs):
+    """Any change to a user (e.g. deactivation) evicts their cached tokens."""
+    version = DELETED if signal is post_delete else instance.updated_at
+    get_token_cache().invalidate_user(instance.pk, version)
+    get_user_cache().delete(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """A deleted token must stop authenticating right away."""
+    get_token_cache().delete(instance.key)
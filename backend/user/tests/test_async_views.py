@@ -0,0 +1,137 @@
+"""
+Test suit for the native async user API views.
+"""
+
+import json
+from unittest.mock import patch
+
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.hashing import HashingPoolSaturated
+from user import async_views
+
+
+class AsyncUserAPITests(TestCase):
+    """Test the async views behave like the DRF ones."""
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.payload = {
+            'email': 'user@example.com',
+            'password': 'Whatever!',
+            'name': 'user-test',
+        }
+
+    async def call(self, view, method='post', data=None, token=None, keyword='Token'):
+        """Call `view` and return (response, decoded JSON body)."""
+        headers = {'Authorization': f'{keyword} {token}'} if token else {}
+        if method == 'get':
+            request = self.factory.get('/', headers=headers)
+        else:
+            request = getattr(self.factory, method)(
+                '/', data=json.dumps(data or {}), content_type='application/json',
+                headers=headers,
+            )
+        res = await view.as_view()(request)
+        return res, json.loads(res.content) if res.content else None
+
+    async def test_create_user_ok(self):
+        res, data = await self.call(async_views.CreateUserView, data=self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('password', data)
+        user = await get_user_model().objects.aget(email=self.payload['email'])
+        self.assertTrue(await user.acheck_password(self.payload['password']))
+
+    async def test_user_with_email_exists_err(self):
+        await get_user_model().objects.acreate_user(**self.payload)
+
+        res, data = await self.call(async_views.CreateUserView, data=self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', data)
+
+    async def test_user_short_password_fail(self):
+        res, _ = await self.call(
+            async_views.CreateUserView, data={**self.payload, 'password': '1234567'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(await get_user_model().objects.aexists())
+
+    async def test_create_token_for_user(self):
+        await get_user_model().objects.acreate_user(**self.payload)
+
+        res, data = await self.call(async_views.CreateTokenView, data=self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(await Token.objects.filter(key=data['token']).aexists())
+
+    @override_settings(AUTH_TOKEN_MODE='signed')
+    async def test_signed_token_login_and_profile(self):
+        await get_user_model().objects.acreate_user(**self.payload)
+
+        _, tokens = await self.call(async_views.CreateTokenView, data=self.payload)
+        res, data = await self.call(
+            async_views.ManageUserView, method='get',
+            token=tokens['access'], keyword='Bearer',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['email'], self.payload['email'])
+
+    async def test_create_token_bad_credentials_fail(self):
+        await get_user_model().objects.acreate_user(**self.payload)
+
+        res, data = await self.call(
+            async_views.CreateTokenView,
+            data={'email': self.payload['email'], 'password': 'WrongPass!'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('token', data)
+
+    async def test_get_user_unauthorized_fail(self):
+        res, _ = await self.call(async_views.ManageUserView, method='get')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    async def test_get_profile_ok(self):
+        user = await get_user_model().objects.acreate_user(**self.payload)
+        token = await Token.objects.acreate(user=user)
+
+        res, data = await self.call(async_views.ManageUserView, method='get', token=token.key)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(data, {'name': user.name, 'email': user.email})
+
+    async def test_update_user_profile_ok(self):
+        user = await get_user_model().objects.acreate_user(**self.payload)
+        token = await Token.objects.acreate(user=user)
+        payload_updated = {'name': 'New Name', 'password': 'AnotherPass!'}
+
+        res, _ = await self.call(
+            async_views.ManageUserView, method='patch', data=payload_updated, token=token.key,
+        )
+        await user.arefresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(user.name, payload_updated['name'])
+        self.assertTrue(await user.acheck_password(payload_updated['password']))
+
+    async def test_post_profile_endpoint_not_allowed(self):
+        res, _ = await self.call(async_views.ManageUserView)
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_create_user_hashing_saturated(self):
+        with patch('core.hashing._arun', side_effect=HashingPoolSaturated):
+            res, _ = await self.call(async_views.CreateUserView, data=self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(await get_user_model().objects.aexists())
@@ -0,0 +1,157 @@
+"""
+Test suit for the cached token authentication.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import get_token_cache
+
+
+ME_URL = reverse('user:me')
+
+SHARED_CACHE = {
+    'BACKEND': 'shared', 'ALIAS': 'default', 'MAX_SIZE': 100, 'TTL': 60,
+}
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token -> user resolution is cached & invalidated."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='Whatever!',
+            name='Test User',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        get_token_cache().clear()
+        # The shared backend's versions of earlier tests' users (same ids).
+        caches[SHARED_CACHE['ALIAS']].clear()
+
+    def test_cache_hit_skips_db(self):
+        """Only the first request looks the token up in the DB."""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+        stats = get_token_cache().stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_invalid_token_fail(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token not-a-real-token')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_deactivated_invalidates(self):
+        """Deactivating a user evicts their cached token right away."""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_updated_invalidates(self):
+        """The cached user never outlives a change to the row."""
+        self.client.get(ME_URL)
+
+        self.user.name = 'Another Name'
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Another Name')
+
+    def test_token_deleted_invalidates(self):
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE=SHARED_CACHE)
+    def test_shared_backend(self):
+        """The shared backend caches & invalidates through the Django cache."""
+        self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(get_token_cache().stats(), {'hits': 1, 'misses': 2})
+
+    def backends(self):
+        """Yield the cache of each backend, in a subtest with a fresh token."""
+        for conf in (settings.TOKEN_AUTH_CACHE, SHARED_CACHE):
+            overridden = override_settings(TOKEN_AUTH_CACHE=conf)
+            with self.subTest(backend=conf['BACKEND']), overridden:
+                Token.objects.filter(user=self.user).delete()
+                self.token = Token.objects.create(user=self.user)
+                yield get_token_cache()
+
+    def load_token(self):
+        """The token as a request would load it on a cache miss."""
+        return Token.objects.select_related('user').get(key=self.token.key)
+
+    def test_user_changed_while_loading(self):
+        """A token loaded before a change & cached after it isn't used."""
+        for cache in self.backends():
+            token = self.load_token()
+            self.user.is_active = False
+            self.user.save()
+            cache.set(token)
+
+            self.assertIsNone(cache.get(token.key))
+            # Loaded after the change, it's used again.
+            cache.set(self.load_token())
+            self.assertIsNotNone(cache.get(token.key))
+            self.user.is_active = True
+            self.user.save()
+
+    def test_token_deleted_while_loading(self):
+        for cache in self.backends():
+            token = self.load_token()
+            self.token.delete()
+            cache.set(token)
+
+            self.assertIsNone(cache.get(token.key))
+
+    @override_settings(TOKEN_AUTH_CACHE=SHARED_CACHE)
+    async def test_shared_backend_async(self):
+        token = await Token.objects.select_related('user').aget(key=self.token.key)
+        cache = get_token_cache()
+        await cache.aset(token)
+        self.assertEqual((await cache.aget(token.key)).user_id, self.user.pk)
+
+        await self.user.asave()
+
+        self.assertIsNone(await cache.aget(token.key))
+
+    @override_settings(TOKEN_AUTH_CACHE=SHARED_CACHE)
+    def test_user_deleted(self):
+        self.client.get(ME_URL)
+
+        get_user_model().objects.get(pk=self.user.pk).delete()
+
+        self.assertIsNone(get_token_cache().get(self.token.key))
@@ -0,0 +1,134 @@
+"""
+Test suit for the batch user creation endpoint.
+"""
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.hashing import HashingPoolSaturated
+
+BATCH_URL = reverse('user:create-batch')
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def make_payloads(count, start=0):
+    return [
+        {'email': f'user{i}@example.com', 'name': f'User {i}', 'password': f'Password-{i}!'}
+        for i in range(start, start + count)
+    ]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, USER_BATCH_MAX_SIZE=20)
+class CreateUserBatchTests(TestCase):
+    """Test creating many users in one request."""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(
+            email='staff@example.com', password='Whatever!', is_staff=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+    def test_create_batch(self):
+        res = self.client.post(BATCH_URL, make_payloads(5), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[2], {
+            'status': 201, 'data': {'email': 'user2@example.com', 'name': 'User 2'},
+        })
+        user = get_user_model().objects.get(email='user4@example.com')
+        self.assertTrue(user.check_password('Password-4!'))
+        self.assertEqual(get_user_model().objects.count(), 6)
+
+    def test_queries_independent_of_batch_size(self):
+        """One uniqueness query & one insert, however many users."""
+        def queries(payloads):
+            with CaptureQueriesContext(connection) as captured:
+                res = self.client.post(BATCH_URL, payloads, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(captured)
+
+        self.assertEqual(queries(make_payloads(2)), queries(make_payloads(20, start=2)))
+
+    def test_partial_failure(self):
+        get_user_model().objects.create_user(email='taken@example.com', password='Whatever!')
+        payloads = make_payloads(2) + [
+            {'email': 'not-an-email', 'password': 'Whatever!'},
+            {'email': 'new@example.com', 'password': 'short'},
+            {'email': 'TAKEN@example.com', 'name': 'Taken', 'password': 'Whatever!'},
+            {'email': 'User0@Example.com', 'name': 'Again', 'password': 'Whatever!'},
+        ]
+
+        res = self.client.post(BATCH_URL, payloads, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in res.data], [201] * 2 + [400] * 4)
+        self.assertIn('email', res.data[2]['errors'])
+        self.assertIn('password', res.data[3]['errors'])
+        # Taken in the DB (any case), then repeated within the batch.
+        self.assertEqual(res.data[4]['errors']['email'][0].code, 'unique')
+        self.assertEqual(res.data[5]['errors']['email'][0].code, 'unique')
+        self.assertEqual(get_user_model().objects.count(), 4)
+
+    def test_email_taken_after_check(self):
+        """A user created since the check fails its item only."""
+        manager = get_user_model().objects
+
+        def racing_taken_emails(emails):
+            taken = type(manager).taken_emails(manager, emails)
+            manager.create_user(email='user1@example.com', password='Whatever!')
+            return taken
+
+        with patch.object(manager, 'taken_emails', side_effect=racing_taken_emails):
+            res = self.client.post(BATCH_URL, make_payloads(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in res.data], [201, 400, 201])
+        self.assertEqual(get_user_model().objects.count(), 4)
+
+    def test_size_limit(self):
+        res = self.client.post(BATCH_URL, make_payloads(21), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['non_field_errors'][0].code, 'max_length')
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_empty_batch(self):
+        res = self.client.post(BATCH_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_not_a_list(self):
+        res = self.client.post(BATCH_URL, make_payloads(1)[0], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_saturated_hashing_pool(self):
+        with patch('core.hashing.make_passwords', side_effect=HashingPoolSaturated(3)):
+            res = self.client.post(BATCH_URL, make_payloads(2), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '3')
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_regular_user_forbidden(self):
+        self.client.force_authenticate(
+            user=get_user_model().objects.create_user(email='me@example.com', password='x'),
+        )
+
+        res = self.client.post(BATCH_URL, make_payloads(1), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_anonymous_unauthorized(self):
+        res = APIClient().post(BATCH_URL, make_payloads(1), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
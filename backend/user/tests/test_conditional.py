@@ -0,0 +1,209 @@
+"""
+Test suit for the ETag / conditional requests of /api/user/me/.
+"""
+
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import (
+    AsyncRequestFactory,
+    TestCase,
+    TransactionTestCase,
+    skipUnlessDBFeature,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import async_views
+from user.authentication import get_token_cache
+from user.serializers import UserSerializer
+
+ME_URL = reverse('user:me')
+
+
+class ConditionalProfileTests(TestCase):
+    """Test `ETag`, `If-None-Match` & `If-Match` on the profile endpoint."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!', name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        get_token_cache().clear()
+
+    def test_get_returns_etag(self):
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['ETag'].startswith('"'))
+
+    def test_not_modified_skips_serializer(self):
+        etag = self.client.get(ME_URL)['ETag']  # Also caches the token.
+
+        with patch('user.serializers.UserSerializer.to_representation') as to_repr, \
+                self.assertNumQueries(1):
+            res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+        to_repr.assert_not_called()
+
+    def test_update_changes_etag(self):
+        etag = self.client.get(ME_URL)['ETag']
+
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+        self.assertNotEqual(res['ETag'], etag)
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'New Name')
+
+    def test_changed_elsewhere_not_304(self):
+        """The user is reloaded, even if the token cache has an older copy."""
+        etag = self.client.get(ME_URL)['ETag']
+        # Saved by another worker: no signal here, so our cached user is stale.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='Elsewhere', updated_at=timezone.now(),
+        )
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'Elsewhere')
+
+    def test_if_match_stale_rejected(self):
+        etag = self.client.get(ME_URL)['ETag']
+        self.client.patch(ME_URL, {'name': 'First Writer'})
+
+        with patch('user.serializers.UserSerializer.to_representation') as to_repr:
+            res = self.client.patch(ME_URL, {'name': 'Second Writer'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        to_repr.assert_not_called()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'First Writer')
+
+    def test_if_match_current_updates(self):
+        etag = self.client.get(ME_URL)['ETag']
+
+        res = self.client.put(
+            ME_URL,
+            {'email': 'user@example.com', 'name': 'New Name', 'password': 'Whatever!'},
+            HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'New Name')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentUpdateTests(TransactionTestCase):
+    """Test `If-Match` updates racing each other (on their own connections)."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!', name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        get_token_cache().clear()
+
+    def client_for(self):
+        return APIClient(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_same_etag_one_wins(self):
+        """The second update waits for the first, then fails its precondition."""
+        etag = self.client_for().get(ME_URL)['ETag']
+        first_saving, release = threading.Event(), threading.Event()
+        update = UserSerializer.update
+
+        def slow_update(serializer, instance, validated_data):
+            # The first request stops between its check & its save.
+            if threading.current_thread().name == 'first':
+                first_saving.set()
+                release.wait(5)
+            return update(serializer, instance, validated_data)
+
+        statuses = {}
+
+        def patch_name(name):
+            try:
+                res = self.client_for().patch(ME_URL, {'name': name}, HTTP_IF_MATCH=etag)
+                statuses[name] = res.status_code
+            finally:
+                connections.close_all()
+
+        with patch.object(UserSerializer, 'update', slow_update):
+            first = threading.Thread(target=patch_name, args=['first'], name='first')
+            first.start()
+            first_saving.wait(5)
+            second = threading.Thread(target=patch_name, args=['second'], name='second')
+            second.start()
+            # Time for the second one to check its ETag (or to wait for the lock).
+            second.join(0.5)
+            release.set()
+            first.join()
+            second.join()
+
+        self.assertEqual(statuses, {
+            'first': status.HTTP_200_OK,
+            'second': status.HTTP_412_PRECONDITION_FAILED,
+        })
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'first')
+
+
+class AsyncConditionalProfileTests(TestCase):
+    """Test the async profile view honours the same headers."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='Whatever!', name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.factory = AsyncRequestFactory()
+
+    async def get_profile(self, **headers):
+        headers['Authorization'] = f'Token {self.token.key}'
+        request = self.factory.get('/', headers=headers)
+        return await async_views.ManageUserView.as_view()(request)
+
+    async def test_not_modified(self):
+        etag = (await self.get_profile())['ETag']
+
+        res = await self.get_profile(**{'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    async def test_if_match_stale_rejected(self):
+        request = self.factory.patch(
+            '/', '{"name": "New Name"}', content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}', 'If-Match': '"stale"'},
+        )
+
+        res = await async_views.ManageUserView.as_view()(request)
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    async def test_if_match_current_updates(self):
+        etag = (await self.get_profile())['ETag']
+        request = self.factory.patch(
+            '/', '{"name": "New Name"}', content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}', 'If-Match': etag},
+        )
+
+        res = await async_views.ManageUserView.as_view()(request)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        await self.user.arefresh_from_db()
+        self.assertEqual(self.user.name, 'New Name')
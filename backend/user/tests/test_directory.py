@@ -0,0 +1,87 @@
+"""
+Test suit for the staff user directory.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+URL = reverse('user:list')
+
+
+def emails(res):
+    """Return the emails of the users listed in `res`."""
+    return [user['email'] for user in res.data['results']]
+
+
+class UserDirectoryTests(TestCase):
+    """Test listing & searching users."""
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(
+            email='staff@example.com', password='Whatever!', name='Staff', is_staff=True,
+        )
+        get_user_model().objects.bulk_create(
+            get_user_model()(email=f'user{i}@example.com', name=f'Name {i}')
+            for i in range(5)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+    def test_regular_user_forbidden(self):
+        user = get_user_model().objects.get(email='user0@example.com')
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cursor_pages_cover_every_user(self):
+        listed = []
+        url = URL + '?page_size=2'
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                res = self.client.get(url)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                listed += emails(res)
+                url = res.data['next']
+
+        expected = get_user_model().objects.order_by('id').values_list('email', flat=True)
+        self.assertEqual(listed, list(expected))
+        sql = ' '.join(query['sql'].upper() for query in queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_search_email_prefix_case_insensitive(self):
+        res = self.client.get(URL, {'search': 'USER3'})
+
+        self.assertEqual(emails(res), ['user3@example.com'])
+
+    def test_search_name_prefix(self):
+        res = self.client.get(URL, {'search': 'staf'})
+
+        self.assertEqual(emails(res), ['staff@example.com'])
+
+    def test_search_is_prefix_only(self):
+        res = self.client.get(URL, {'search': 'example.com'})
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_field_selection(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(URL, {'fields': 'id,email'})
+
+        self.assertEqual(set(res.data['results'][0]), {'id', 'email'})
+        self.assertNotIn('"password"', queries[-1]['sql'])
+
+    def test_unknown_field_rejected(self):
+        res = self.client.get(URL, {'fields': 'email,password'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
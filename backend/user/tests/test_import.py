@@ -0,0 +1,81 @@
+"""
+Test suit for the `import_users` command.
+"""
+
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersCommandTests(TestCase):
+    """Test importing users from CSV & NDJSON files."""
+
+    def import_file(self, content, suffix, **options):
+        out, err = StringIO(), StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as file:
+            file.write(content)
+            file.flush()
+            call_command(
+                'import_users', file.name, workers=0, stdout=out, stderr=err, **options
+            )
+        return out.getvalue(), err.getvalue()
+
+    def test_csv(self):
+        get_user_model().objects.create_user(email='taken@example.com', password='x')
+        content = (
+            'email,name,password\n'
+            'one@example.com,One,Pass-1!\n'
+            'taken@example.com,Taken,Pass-2!\n'
+            'two@example.com,"Two, Jr.",Pass-3!\n'
+        )
+
+        out, err = self.import_file(content, '.csv', batch_size=2)
+
+        self.assertIn('Created 2 user(s)', out)
+        self.assertIn('skipped 1 duplicate(s)', out)
+        # The header is line 1.
+        self.assertIn('Line 3: taken@example.com already exists', err)
+        user = get_user_model().objects.get(email='two@example.com')
+        self.assertEqual(user.name, 'Two, Jr.')
+        self.assertTrue(user.check_password('Pass-3!'))
+
+    def test_ndjson(self):
+        rows = [{'email': f'user{i}@example.com', 'password': 'Whatever!'} for i in range(3)]
+        content = '\n'.join(map(json.dumps, rows)) + '\n{not json}\n'
+
+        out, err = self.import_file(content, '.ndjson')
+
+        self.assertIn('Created 3 user(s)', out)
+        self.assertIn('Line 4: invalid row', err)
+        self.assertEqual(get_user_model().objects.count(), 3)
+
+    def test_ndjson_malformed_rows_skipped(self):
+        content = '\n'.join([
+            '[]',
+            '',
+            '"x"',
+            json.dumps({'email': 'one@example.com', 'password': 123}),
+            json.dumps({'email': ['two@example.com'], 'password': 'Whatever!'}),
+            json.dumps({'email': 'ok@example.com', 'password': 'Whatever!'}),
+        ])
+
+        out, err = self.import_file(content, '.ndjson')
+
+        self.assertIn('Created 1 user(s)', out)
+        self.assertIn('& 4 invalid row(s)', out)
+        # Real line numbers, blank lines included.
+        self.assertIn('Line 1: invalid row, skipped (not an object)', err)
+        self.assertIn('Line 3: invalid row, skipped (not an object)', err)
+        self.assertIn('Line 4: invalid row, skipped (password: not a string)', err)
+        self.assertIn('Line 5: invalid row, skipped (email: not a string)', err)
+        self.assertTrue(get_user_model().objects.filter(email='ok@example.com').exists())
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import_users', '/nonexistent/users.csv')
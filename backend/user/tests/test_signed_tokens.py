@@ -0,0 +1,127 @@
+"""
+Test suit for the signed (stateless) access & refresh tokens.
+"""
+
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.authentication import get_user_cache
+
+
+@override_settings(AUTH_TOKEN_MODE='signed')
+class SignedTokenTests(TestCase):
+    """Test logging in with & using signed tokens."""
+
+    def setUp(self):
+        self.payload = {
+            'email': 'user@example.com',
+            'password': 'Whatever!',
+            'name': 'Test User',
+        }
+        self.user = get_user_model().objects.create_user(**self.payload)
+        self.client = APIClient()
+        get_user_cache().clear()
+
+    def login(self):
+        res = self.client.post(reverse('user:token'), {
+            'email': self.payload['email'], 'password': self.payload['password'],
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def get_profile(self, access):
+        return APIClient().get(reverse('user:me'), HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_login_returns_token_pair(self):
+        data = self.login()
+
+        self.assertEqual(set(data), {'access', 'refresh', 'expires_in'})
+        self.assertNotIn('token', data)
+
+    def test_access_token_skips_db(self):
+        access = self.login()['access']
+        self.get_profile(access)  # Warm the user cache.
+
+        with self.assertNumQueries(0):
+            res = self.get_profile(access)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_tampered_token_rejected(self):
+        access = self.login()['access']
+
+        res = self.get_profile(access[:-1] + ('A' if access[-1] != 'A' else 'B'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_expired_access_token_rejected(self):
+        access = self.login()['access']
+
+        with patch('django.core.signing.time.time', return_value=time.time() + 301):
+            res = self.get_profile(access)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self):
+        access = self.login()['access']
+        self.get_profile(access)
+
+        res = APIClient().patch(
+            reverse('user:me'), {'password': 'AnotherPass!'},
+            HTTP_AUTHORIZATION=f'Bearer {access}',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get_profile(access).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_name_change_keeps_tokens(self):
+        access = self.login()['access']
+
+        self.user.name = 'New Name'
+        self.user.save()
+
+        self.assertEqual(self.get_profile(access).status_code, status.HTTP_200_OK)
+
+    def test_deactivation_revokes_tokens(self):
+        access = self.login()['access']
+        self.get_profile(access)
+
+        self.user.is_active = False
+        self.user.save()
+        self.user.is_active = True
+        self.user.save()
+
+        self.assertEqual(self.get_profile(access).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_issues_new_pair(self):
+        refresh = self.login()['refresh']
+
+        res = self.client.post(reverse('user:token-refresh'), {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_profile(res.data['access']).status_code, status.HTTP_200_OK)
+
+    def test_refresh_after_password_change_fails(self):
+        refresh = self.login()['refresh']
+        self.user.set_password('AnotherPass!')
+        self.user.save()
+
+        res = self.client.post(reverse('user:token-refresh'), {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_access_token_is_not_a_refresh_token(self):
+        access = self.login()['access']
+
+        res = self.client.post(reverse('user:token-refresh'), {'refresh': access})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
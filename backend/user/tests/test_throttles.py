@@ -0,0 +1,100 @@
+"""
+Test suit for the login & signup rate limits.
+"""
+
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.throttling import get_counter_store
+from user import async_views
+
+RATES = {
+    'login_ip': '3/min',
+    'login_email': '2/min',
+    'signup_ip': '3/min',
+    'signup_email': '2/min',
+}
+
+
+@override_settings(
+    REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': RATES},
+    THROTTLE_STORE={'BACKEND': 'local', 'MAX_SIZE': 100},
+)
+class ThrottleTests(TestCase):
+    """Test login & signup get a 429 once over their limits."""
+
+    def setUp(self):
+        self.payload = {'email': 'user@example.com', 'password': 'Whatever!'}
+        get_user_model().objects.create_user(**self.payload)
+        get_counter_store().clear()
+
+    def login(self, email='user@example.com', ip='10.0.0.1'):
+        return APIClient(REMOTE_ADDR=ip).post(
+            reverse('user:token'), {'email': email, 'password': 'WrongPass!'}
+        )
+
+    def test_login_limited_per_email(self):
+        statuses = [self.login(ip=f'10.0.0.{i}').status_code for i in range(3)]
+
+        self.assertEqual(statuses[:2], [status.HTTP_400_BAD_REQUEST] * 2)
+        self.assertEqual(statuses[2], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_limited_per_ip(self):
+        statuses = [self.login(email=f'user{i}@example.com').status_code for i in range(4)]
+
+        self.assertEqual(statuses[3], status.HTTP_429_TOO_MANY_REQUESTS)
+        # Other clients aren't affected.
+        res = self.login(email='other@example.com', ip='10.0.0.2')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retry_after_header(self):
+        for _ in range(2):
+            self.login()
+
+        res = self.login()
+
+        self.assertGreater(int(res['Retry-After']), 0)
+
+    def test_rejection_skips_db_and_hasher(self):
+        for _ in range(2):
+            self.login()
+
+        with patch('core.hashing.make_password') as make_password, \
+                patch('core.hashing.check_password') as check_password, \
+                self.assertNumQueries(0):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        make_password.assert_not_called()
+        check_password.assert_not_called()
+
+    def test_signup_limited_per_email(self):
+        payload = {'email': 'new@example.com', 'password': 'short', 'name': 'New'}
+        responses = [
+            APIClient(REMOTE_ADDR=f'10.0.0.{i}').post(reverse('user:create'), payload)
+            for i in range(3)
+        ]
+
+        self.assertEqual(responses[2].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    async def test_async_login_limited(self):
+        factory = AsyncRequestFactory()
+        body = json.dumps({'email': 'user@example.com', 'password': 'WrongPass!'})
+
+        for _ in range(2):
+            await async_views.CreateTokenView.as_view()(
+                factory.post('/', body, content_type='application/json')
+            )
+        res = await async_views.CreateTokenView.as_view()(
+            factory.post('/', body, content_type='application/json')
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
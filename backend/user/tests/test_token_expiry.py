@@ -0,0 +1,141 @@
+"""
+Test suit for auth token expiry, rotation & purging.
+"""
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import get_token_cache
+
+TTL = 3600
+
+
+def age(token, seconds):
+    """Make `token` look `seconds` old."""
+    Token.objects.filter(pk=token.pk).update(
+        created=timezone.now() - timedelta(seconds=seconds)
+    )
+
+
+@override_settings(AUTH_TOKEN_TTL=TTL)
+class TokenExpiryTests(TestCase):
+    """Test expired tokens stop working & get replaced on login."""
+
+    def setUp(self):
+        self.payload = {'email': 'user@example.com', 'password': 'Whatever!'}
+        self.user = get_user_model().objects.create_user(**self.payload)
+        self.token = Token.objects.create(user=self.user)
+        get_token_cache().clear()
+
+    def get_profile(self):
+        return APIClient().get(
+            reverse('user:me'), HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def test_fresh_token_ok(self):
+        age(self.token, TTL - 60)
+
+        self.assertEqual(self.get_profile().status_code, status.HTTP_200_OK)
+
+    def test_expired_token_rejected(self):
+        age(self.token, TTL + 60)
+
+        res = self.get_profile()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('expired', str(res.data['detail']))
+
+    def test_cached_token_expires(self):
+        self.get_profile()  # Cached from now on.
+        later = timezone.now() + timedelta(seconds=TTL + 60)
+
+        with patch('user.authentication.timezone.now', return_value=later):
+            res = self.get_profile()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_TTL=0)
+    def test_no_ttl_never_expires(self):
+        age(self.token, 10 * 365 * 24 * 3600)
+
+        self.assertEqual(self.get_profile().status_code, status.HTTP_200_OK)
+
+    def test_login_keeps_valid_token(self):
+        res = APIClient().post(reverse('user:token'), self.payload)
+
+        self.assertEqual(res.data['token'], self.token.key)
+
+    def test_login_rotates_expired_token(self):
+        age(self.token, TTL + 60)
+
+        res = APIClient().post(reverse('user:token'), self.payload)
+
+        self.assertNotEqual(res.data['token'], self.token.key)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.token = Token.objects.get(key=res.data['token'])
+        self.assertEqual(self.get_profile().status_code, status.HTTP_200_OK)
+
+
+@override_settings(AUTH_TOKEN_TTL=TTL)
+class PurgeTokensCommandTests(TestCase):
+    """Test `purge_tokens` deletes only expired tokens, batch by batch."""
+
+    def setUp(self):
+        self.expired, self.fresh = [], []
+        for i in range(7):
+            user = get_user_model().objects.create_user(
+                email=f'user{i}@example.com', password='Whatever!'
+            )
+            token = Token.objects.create(user=user)
+            # Every other token has expired, so batches skip over live ones.
+            if i % 2 == 0:
+                age(token, TTL + 60)
+                self.expired.append(token.key)
+            else:
+                self.fresh.append(token.key)
+
+    def purge(self, **options):
+        out = StringIO()
+        with patch('user.management.commands.purge_tokens.time.sleep') as sleep:
+            call_command('purge_tokens', stdout=out, **options)
+        return out.getvalue(), sleep
+
+    def test_only_expired_tokens_deleted(self):
+        out, _ = self.purge()
+
+        remaining = Token.objects.values_list('key', flat=True)
+        self.assertEqual(sorted(remaining), sorted(self.fresh))
+        self.assertIn('Deleted 4 expired token(s) in 1 batch(es).', out)
+
+    def test_batches(self):
+        out, sleep = self.purge(batch_size=3, sleep=0.5)
+
+        self.assertFalse(Token.objects.filter(key__in=self.expired).exists())
+        self.assertIn('in 2 batch(es)', out)
+        # Sleeps between batches, not after the last (short) one.
+        sleep.assert_called_once_with(0.5)
+
+    def test_exact_multiple_of_batch_size(self):
+        out, sleep = self.purge(batch_size=2)
+
+        self.assertFalse(Token.objects.filter(key__in=self.expired).exists())
+        # Two full batches, then an empty one to find out there's nothing left.
+        self.assertIn('in 2 batch(es)', out)
+        self.assertEqual(sleep.call_count, 2)
+
+    @override_settings(AUTH_TOKEN_TTL=0)
+    def test_no_ttl_refused(self):
+        with self.assertRaises(CommandError):
+            self.purge()
@@ -94,6 +94,27 @@ class PublicUserAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('token', res.data)
 
+    def test_create_token_email_case_insensitive(self):
+        """Test users can log in whatever the case of their email."""
+        payload = {'email': 'User@example.com', 'password': 'Whatever!'}
+        create_user(**payload)
+
+        res = self.client.post(URLS['token'], {**payload, 'email': 'user@EXAMPLE.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+
+    def test_create_user_email_taken_other_case_err(self):
+        """Test emails differing only in case count as taken."""
+        create_user(email='user@example.com', password='Whatever!')
+
+        res = self.client.post(URLS['create_user'], {
+            'email': 'USER@example.com', 'password': 'Whatever!', 'name': 'user-test',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
     def test_create_token_bad_credentials_fail(self):
         """Test auth fails if bad credentials sent."""
         payload = {
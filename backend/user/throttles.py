@@ -0,0 +1,25 @@
+"""
+Rate limits for the user API endpoints that hash passwords.
+
+Each request to them costs a full password hash, so they're limited both per
+client IP and per email (against one client, and against many clients going
+after one account). Rates: `REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`.
+"""
+
+from core.throttling import EmailThrottle, IPThrottle
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = 'login_email'
+
+
+class SignupIPThrottle(IPThrottle):
+    scope = 'signup_ip'
+
+
+class SignupEmailThrottle(EmailThrottle):
+    scope = 'signup_email'
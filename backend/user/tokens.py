@@ -0,0 +1,51 @@
+"""
+Stateless signed access & refresh tokens (`AUTH_TOKEN_MODE = 'signed'`).
+
+A token is a `django.core.signing` payload `{'u': user id, 'v': token version}`
+signed (HMAC) with `SECRET_KEY` & timestamped, so checking an access token
+takes no query. `User.token_version` goes up when the password changes or the
+user gets deactivated, which voids every token issued before.
+Refresh tokens are long-lived and always checked against the DB.
+"""
+
+from django.conf import settings
+from django.core import signing
+
+# Different salts: an access token can't be passed off as a refresh token.
+ACCESS_SALT = 'user.tokens.access'
+REFRESH_SALT = 'user.tokens.refresh'
+
+
+class InvalidToken(Exception):
+    """The token is malformed, tampered with or expired."""
+
+
+def _dumps(user, salt):
+    return signing.dumps({'u': user.pk, 'v': user.token_version}, salt=salt)
+
+
+def _loads(token, salt, max_age):
+    try:
+        payload = signing.loads(token, salt=salt, max_age=max_age)
+        return payload['u'], payload['v']
+    except (signing.BadSignature, KeyError, TypeError) as exc:
+        raise InvalidToken(str(exc)) from exc
+
+
+def issue(user):
+    """Return a new access & refresh token for `user` (the login response)."""
+    return {
+        'access': _dumps(user, ACCESS_SALT),
+        'refresh': _dumps(user, REFRESH_SALT),
+        'expires_in': settings.SIGNED_TOKENS['ACCESS_TTL'],
+    }
+
+
+def verify_access(token):
+    """Return `(user id, token version)` of an access token or raise `InvalidToken`."""
+    return _loads(token, ACCESS_SALT, settings.SIGNED_TOKENS['ACCESS_TTL'])
+
+
+def verify_refresh(token):
+    """Return `(user id, token version)` of a refresh token or raise `InvalidToken`."""
+    return _loads(token, REFRESH_SALT, settings.SIGNED_TOKENS['REFRESH_TTL'])
@@ -2,14 +2,24 @@
 URL mappings for the user API.
 """
 
+from django.conf import settings
 from django.urls import path
 
-from user import views
+from user import async_views, views
 
 app_name = 'user'
 
+# `USER_API_ASYNC` swaps in the native async implementations (for ASGI).
+api = async_views if settings.USER_API_ASYNC else views
+
 urlpatterns = [
-    path('create/', views.CreateUserView.as_view(), name='create'),
-    path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me'),
+    path('create/', api.CreateUserView.as_view(), name='create'),
+    path('token/', api.CreateTokenView.as_view(), name='token'),
+    path('me/', api.ManageUserView.as_view(), name='me'),
+    # Signed tokens only (`AUTH_TOKEN_MODE`); a single DB lookup, no async version.
+    path('token/refresh/', views.RefreshTokenView.as_view(), name='token-refresh'),
+    # Staff directory, export & batch creation; DRF-only, whatever `USER_API_ASYNC` says.
+    path('', views.UserDirectoryView.as_view(), name='list'),
+    path('export/', views.UserExportView.as_view(), name='export'),
+    path('create/batch/', views.CreateUserBatchView.as_view(), name='create-batch'),
 ]
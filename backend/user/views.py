@@ -2,27 +2,141 @@
 Views for the user API.
 """
 
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.db import router, transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils.translation import gettext_lazy as _
+
 from rest_framework import (
-    generics,
     authentication,
+    exceptions,
+    fields,
+    filters,
+    generics,
+    pagination,
     permissions,
+    status,
 )
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, inline_serializer
+
+from core import activity, replicas, shards
+from core.hashing import HashingPoolSaturated
+from core.renderers import CSVRenderer, NDJSONRenderer
+from user import export, serializers, throttles, tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    get_or_rotate_token,
+)
+
+
+class HashingUnavailable(exceptions.APIException):
+    """The password hashing pool is saturated."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many password operations in progress, try again later.')
+    default_code = 'hashing_unavailable'
+
+    def __init__(self, wait=None, detail=None, code=None):
+        super().__init__(detail, code)
+        # DRF's exception handler turns `wait` into a `Retry-After` header.
+        self.wait = wait
+
+    @classmethod
+    def from_saturated(cls, exc):
+        return cls(wait=exc.retry_after)
+
+
+class HashingBackpressureMixin:
+    """Answer 503 instead of queueing when the password hashing pool is full."""
+
+    def handle_exception(self, exc):
+        if isinstance(exc, HashingPoolSaturated):
+            exc = HashingUnavailable.from_saturated(exc)
+        return super().handle_exception(exc)
 
-from user import serializers
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
-class CreateUserView(generics.CreateAPIView):
+
+def user_etag(user_id, updated_at):
+    """ETag of a user's profile; a new one whenever the user is saved."""
+    return quote_etag(f'{user_id}-{(updated_at - EPOCH) // timedelta(microseconds=1):x}')
+
+
+class UserETagMixin:
+    """
+    `ETag`, `If-None-Match` & `If-Match` for views of `request.user`.
+    Only conditional requests reload the user (one query, since the
+    authentication may have come from a cache); the ones answered with a 304
+    or 412 skip the serializer. Conditional writes reload it locked
+    (`lock_user()`).
+    """
+
+    @staticmethod
+    def is_conditional(request):
+        return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MATCH' in request.META
+
+    @contextmanager
+    def lock_user(self, request):
+        """
+        Reload `request.user` with its row locked until the block's transaction
+        ends: concurrent updates with the same `If-Match` are checked (& saved)
+        one after the other, so only the first one passes.
+        """
+        user = request.user
+        model = type(user)
+        using = router.db_for_write(model, instance=user)
+        with transaction.atomic(using=using):
+            user.refresh_from_db(
+                using=using, from_queryset=model._base_manager.select_for_update(),
+            )
+            yield
+
+    def check_preconditions(self, request):
+        """Return a 304/412 response if the request's conditions call for one."""
+        etag = user_etag(request.user.pk, request.user.updated_at)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None and response.status_code == status.HTTP_304_NOT_MODIFIED:
+            response['ETag'] = etag
+        return response
+
+    def set_etag(self, request, response):
+        """Tag a successful response with the ETag of the user it returned."""
+        if response.status_code == status.HTTP_200_OK and request.method != 'OPTIONS':
+            response['ETag'] = user_etag(request.user.pk, request.user.updated_at)
+        return response
+
+
+class CreateUserView(HashingBackpressureMixin, generics.CreateAPIView):
     """Create a new user."""
     serializer_class = serializers.UserSerializer
+    # No authentication: throttled requests get their 429 without any query.
+    authentication_classes = []
+    throttle_classes = [throttles.SignupIPThrottle, throttles.SignupEmailThrottle]
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
-    """Manage the authenticated user."""
+class ManageUserView(
+    UserETagMixin, HashingBackpressureMixin, generics.RetrieveUpdateAPIView,
+):
+    """Manage the authenticated user (`If-None-Match`/`If-Match` aware)."""
     serializer_class = serializers.UserSerializer
     # Authentication: tell me who you are.
-    authentication_classes = [authentication.TokenAuthentication]
+    # Cached, so repeated requests with the same token skip the DB lookup;
+    # signed (`Bearer`) tokens are checked without a query at all.
+    authentication_classes = [CachedTokenAuthentication, SignedTokenAuthentication]
     # Authorization: I know you; let me check if you're authorized.
     permission_classes = [permissions.IsAuthenticated]
 
@@ -30,8 +144,234 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         """Returns the currently authenticated user."""
         return self.request.user
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Writes reload the user in `update()`.
+        if self.is_conditional(request) and request.method in permissions.SAFE_METHODS:
+            request.user.refresh_from_db()
+
+    def get(self, request, *args, **kwargs):
+        response = self.check_preconditions(request)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return response
+
+    def update(self, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            return super().update(request, *args, **kwargs)
+        with self.lock_user(request):
+            response = self.check_preconditions(request)
+            if response is None:
+                response = super().update(request, *args, **kwargs)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return self.set_etag(request, response)
+
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(HashingBackpressureMixin, ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = serializers.AuthTokenSerializer
-    renderer_class = api_settings.DEFAULT_RENDERER_CLASSES
+    # `ObtainAuthToken` pins DRF's stdlib JSON renderer & parsers; use ours.
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    # No authentication: throttled requests get their 429 without any query.
+    authentication_classes = []
+    throttle_classes = [throttles.LoginIPThrottle, throttles.LoginEmailThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        # The request itself is anonymous; `ActivityMiddleware` won't see them,
+        # nor pin them to the primary if their token is created.
+        activity.record(user.pk)
+        replicas.note_user(user.pk)
+
+        if settings.AUTH_TOKEN_MODE == 'signed':
+            # Signed access & refresh tokens instead of a `Token` row (see `user.tokens`).
+            return Response(tokens.issue(user))
+        # A new key once the old one has expired (`AUTH_TOKEN_TTL`).
+        return Response({'token': get_or_rotate_token(user).key})
+
+
+class RefreshTokenView(APIView):
+    """Exchange a signed refresh token for a new access & refresh token."""
+    authentication_classes = []
+    serializer_class = serializers.RefreshTokenSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.issue(serializer.validated_data['user']))
+
+
+class UserCursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination on `id` (`WHERE id > last_seen LIMIT n`): a page deep in
+    the table costs the same as the first one, and there's no `COUNT(*)`.
+    With sharding, every page is merged from all the shards.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if shards.enabled():
+            queryset = shards.ShardedQuerySet(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class UserDirectoryView(generics.ListAPIView):
+    """
+    List & search users (staff only).
+    `?search=`: case-insensitive prefix of the email or name.
+    `?fields=id,email`: only return (& fetch) these fields.
+    """
+    serializer_class = serializers.UserDirectorySerializer
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+        authentication.SessionAuthentication,
+    ]
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = UserCursorPagination
+    filter_backends = [filters.SearchFilter]
+    # Prefix matches only, so they can use the `UPPER(...)` indexes on `User`.
+    search_fields = ['^email', '^name']
+    fields_param = 'fields'
+
+    def get_fields(self):
+        """Return the field names asked for with `?fields=`, or None for all."""
+        param = self.request.query_params.get(self.fields_param)
+        if not param:
+            return None
+
+        fields = [name.strip() for name in param.split(',') if name.strip()]
+        unknown = set(fields) - set(self.serializer_class.Meta.fields)
+        if unknown:
+            msg = _('Unknown field(s): %s') % ', '.join(sorted(unknown))
+            raise exceptions.ValidationError({self.fields_param: [msg]})
+        return fields
+
+    def get_queryset(self):
+        queryset = get_user_model().objects.all()
+        fields = self.get_fields()
+        if fields:
+            # Skip the columns nobody asked for (the pk is always loaded).
+            queryset = queryset.only(*fields)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.get_fields()
+        return super().get_serializer(*args, **kwargs)
+
+
+class UserExportView(APIView):
+    """
+    Stream every user (staff only) as NDJSON (default) or CSV (`?format=csv`
+    or `Accept: text/csv`), however many there are.
+    `?fields=id,email`: only export these columns.
+    `?is_active=true` / `?is_staff=false`: filter on these flags.
+    """
+    authentication_classes = UserDirectoryView.authentication_classes
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get_fields(self):
+        try:
+            return export.parse_fields(self.request.query_params.get('fields'))
+        except ValueError as exc:
+            msg = _('Unknown field(s): %s') % exc
+            raise exceptions.ValidationError({'fields': [msg]})
+
+    def get_flag(self, name):
+        """Return the boolean query param `name`, or None if not given."""
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            return fields.BooleanField().to_internal_value(value)
+        except exceptions.ValidationError as exc:
+            raise exceptions.ValidationError({name: exc.detail})
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('fields', str, description='Comma separated columns.'),
+            OpenApiParameter('is_active', bool),
+            OpenApiParameter('is_staff', bool),
+        ],
+        responses={
+            (200, NDJSONRenderer.media_type): OpenApiTypes.STR,
+            (200, CSVRenderer.media_type): OpenApiTypes.STR,
+        },
+    )
+    def get(self, request):
+        export_fields = self.get_fields()
+        queryset = export.export_queryset(
+            export_fields,
+            is_active=self.get_flag('is_active'),
+            is_staff=self.get_flag('is_staff'),
+        )
+        # The rows are read after the middleware returns; pick the database
+        # (e.g. a read replica) while the request's routing still applies.
+        queryset = queryset.using(queryset.db)
+        renderer = request.accepted_renderer
+        # Under ASGI a sync iterator would be read whole before being sent.
+        if isinstance(request._request, ASGIRequest):
+            content = export.astream_users(renderer, queryset, export_fields)
+        else:
+            content = export.stream_users(renderer, queryset, export_fields)
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="users.{renderer.format}"'
+        return response
+
+
+BatchResultSerializer = inline_serializer(
+    name='UserBatchResult',
+    fields={
+        'status': fields.IntegerField(),
+        'data': serializers.UserSerializer(required=False),
+        'errors': fields.DictField(required=False),
+    },
+    many=True,
+)
+
+
+class CreateUserBatchView(HashingBackpressureMixin, generics.GenericAPIView):
+    """
+    Create up to `USER_BATCH_MAX_SIZE` users in one request (staff only), e.g.
+    for provisioning. The body is a list of `UserSerializer` payloads; the
+    response lists, in the same order, each user created (`"status": 201`) or
+    the errors of the ones that weren't (`"status": 400`). It's a 201 if every
+    user was created & a 207 (Multi-Status) otherwise.
+    """
+    serializer_class = serializers.UserBatchItemSerializer
+    authentication_classes = UserDirectoryView.authentication_classes
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(
+            many=True, allow_empty=False, max_length=settings.USER_BATCH_MAX_SIZE,
+        )
+        return super().get_serializer(*args, **kwargs)
+
+    @extend_schema(
+        request=serializers.UserBatchItemSerializer(many=True),
+        responses={201: BatchResultSerializer, 207: BatchResultSerializer},
+    )
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        results = serializer.data
+        all_created = all(result['status'] == status.HTTP_201_CREATED for result in results)
+        return Response(
+            results,
+            status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS,
+        )